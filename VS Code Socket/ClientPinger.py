@@ -14,35 +14,179 @@ Usage:
     1. Ensure the UDP server is running and listening on the specified host and port.
     2. Run this program to send "PING" messages to the server.
     3. The program will display the server's responses and the RTT for each message.
+    4. For pipelined measurement at high probe rates, give a window of outstanding probes:
+           python ClientPinger.py --host 127.0.0.1 --count 100000 --window 64 [--rate 5000] [--size 64]
 
 Requirements:
     - Python 3.x
     - The `socket` library for UDP communication.
+    - Resolver.py (in this directory) for cached host name lookups.
 
 Notes:
     - The server's host and port can be modified in the `ping_server` function call.
     - The program sends 10 "PING" messages to the server, one per second.
     - If no response is received within 1 second, the program assumes packet loss.
+    - Pipelined mode keeps up to `window` probes in flight. Each probe is "PING <seq> <send time in
+      ns>" padded to `size` bytes; the servers echo it (ServerPinger.py as PONG, UDPServer.py
+      uppercased), so replies are matched by sequence number and the RTT comes from the echoed
+      perf_counter_ns timestamp. Replies that arrive out of order, twice, or after their probe
+      timed out are counted separately.
+    - The summary gives loss, min/avg/max/stddev RTT, p50/p90/p99/p99.9 from an HDR-style
+      histogram (see LoadGen.py) and interarrival jitter computed as in RFC 3550 section 6.4.1
+      (J += (|D| - J) / 16, with D the difference between consecutive RTTs in arrival order).
 """
 
 import socket   # Import socket library
 import time # Import time library for timing operations
+import math # Import math library for the RTT standard deviation
+import select   # Import select library to wait for replies while probes are in flight
+import argparse # Import argparse library for command-line options
 
-def ping_server(host, port):    # Function to send ping messages to the server
+from Resolver import shared_resolver    # Cached host name lookups
+from LoadGen import Histogram   # RTT percentiles
+
+# Statistics of a pipelined ping run
+class PingStats:
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.duplicates = 0     # Replies for a probe that was already answered
+        self.reordered = 0      # Replies arriving after a reply to a later probe
+        self.late = 0           # Replies arriving after their probe had timed out
+        self.lost = 0
+        self.jitter = 0.0       # RFC 3550 interarrival jitter estimate, in ns
+        self.last_rtt = None
+        self.rtt_sum = 0
+        self.rtt_squares = 0
+        self.histogram = Histogram()
+
+    def record(self, rtt):
+        self.received += 1
+        self.rtt_sum += rtt
+        self.rtt_squares += rtt * rtt
+        self.histogram.record(rtt)
+        if self.last_rtt is not None:
+            self.jitter += (abs(rtt - self.last_rtt) - self.jitter) / 16
+        self.last_rtt = rtt
+
+    def report(self, host, elapsed):
+        ms = 1e6
+        print(f"\n--- {host} pipelined ping statistics ---")
+        print(f"{self.sent} probes sent in {elapsed:.2f}s ({self.sent / elapsed:,.0f}/s), {self.received} received, "
+              f"{self.lost / max(self.sent, 1) * 100:.2f}% packet loss")
+        print(f"{self.reordered} reordered, {self.duplicates} duplicate(s), {self.late} late")
+        if self.received:
+            mean = self.rtt_sum / self.received
+            stddev = math.sqrt(max(0.0, self.rtt_squares / self.received - mean * mean))
+            h = self.histogram
+            print(f"RTT min/avg/max/stddev = {h.min / ms:.3f}/{mean / ms:.3f}/{h.max / ms:.3f}/{stddev / ms:.3f} ms")
+            print("RTT " + "  ".join(f"p{p:g} {h.percentile(p) / ms:.3f}" for p in (50, 90, 99, 99.9)) + " ms")
+            print(f"Jitter (RFC 3550) = {self.jitter / ms:.3f} ms")
+
+# Send `count` probes keeping up to `window` unanswered at once, optionally limited to `rate` per second
+def ping_pipelined(client_socket, address, count, window, rate=None, timeout=1.0, size=0):
+    stats = PingStats()
+    outstanding = {}        # seq -> send time (ns) of probes still waiting for a reply
+    answered = set()        # seqs already answered (to spot duplicates)
+    expired = set()         # seqs that timed out (to spot late replies)
+    highest = 0             # Highest sequence number answered so far
+    interval = int(1e9 / rate) if rate else 0
+    timeout_ns = int(timeout * 1e9)
+    buffer = bytearray(65536)
+    client_socket.setblocking(False)
+
+    start = next_send = time.perf_counter_ns()
+    seq = 0
+    while seq < count or outstanding:
+        now = time.perf_counter_ns()
+
+        # Fill the window, as fast as allowed by the rate limit
+        while seq < count and len(outstanding) < window and now >= next_send:
+            seq += 1
+            probe = f"PING {seq} {now} ".encode()
+            probe += b"." * (size - len(probe))     # Padding after the fields, which are space-separated
+            try:
+                client_socket.sendto(probe, address)
+            except BlockingIOError:
+                seq -= 1
+                break
+            outstanding[seq] = now
+            stats.sent += 1
+            next_send = (next_send + interval) if interval else now
+            now = time.perf_counter_ns()
+
+        # Give up on probes that have waited longer than the timeout (dicts keep send order)
+        while outstanding:
+            oldest, sent_at = next(iter(outstanding.items()))
+            if now - sent_at < timeout_ns:
+                break
+            del outstanding[oldest]
+            expired.add(oldest)
+            stats.lost += 1
+
+        # Wait for a reply, the next send slot or the next timeout, whichever comes first
+        wake = [next(iter(outstanding.values())) + timeout_ns] if outstanding else []
+        if seq < count and len(outstanding) < window:
+            wake.append(next_send)
+        wait = max(0, min(wake) - now) / 1e9 if wake else 0
+        readable, _, _ = select.select([client_socket], [], [], wait)
+        if not readable:
+            continue
+
+        # Match every queued reply to its probe by sequence number
+        while True:
+            try:
+                length = client_socket.recv_into(buffer)
+            except (BlockingIOError, ConnectionRefusedError):
+                break
+            arrived = time.perf_counter_ns()
+            fields = bytes(buffer[:length]).split(maxsplit=3)
+            try:
+                reply_seq, sent_at = int(fields[1]), int(fields[2])
+            except (IndexError, ValueError):
+                continue    # Not one of our probes
+            if reply_seq in outstanding:
+                del outstanding[reply_seq]
+                answered.add(reply_seq)
+                if reply_seq < highest:
+                    stats.reordered += 1
+                highest = max(highest, reply_seq)
+                stats.record(arrived - sent_at)
+            elif reply_seq in answered:
+                stats.duplicates += 1
+            elif reply_seq in expired:
+                stats.late += 1
+
+    return stats, (time.perf_counter_ns() - start) / 1e9
+
+def ping_server(host, port, count=10, window=None, rate=None, timeout=1.0, size=0):    # Function to send ping messages to the server
     # Create a UDP socket
     try:    
         client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)    # Create a UDP socket
     except socket.error as e:   # Handle socket creation error
         print(f"Error creating socket: {e}")
         return
+    # Resolve the server's name once instead of on every sendto()
+    try:
+        address = (shared_resolver().gethostbyname(host), port)
+    except (socket.gaierror, socket.timeout) as e:
+        print(f"Could not resolve host {host}: {e}")
+        client_socket.close()
+        return
     with client_socket:     # Use the socket in a context manager to ensure it is closed properly
-        client_socket.settimeout(1)  # Set a timeout of 1 second
-        for i in range(10):   # Send 10 ping messages
+        if window:
+            # Pipelined mode: many probes in flight, matched by sequence number
+            stats, elapsed = ping_pipelined(client_socket, address, count, window, rate, timeout, size)
+            stats.report(host, elapsed)
+            return stats
+
+        client_socket.settimeout(timeout)  # Set a timeout (1 second by default)
+        for i in range(count):   # Send count (10 by default) ping messages
             message = f"PING {i+1}".encode()  # Ping message
             start_time = time.time()  # Record the time before sending the message
             
             # Send the ping message to the server
-            client_socket.sendto(message, (host, port))
+            client_socket.sendto(message, address)
             print(f"Sent: {message.decode()}")
             
             try:
@@ -59,5 +203,16 @@ def ping_server(host, port):    # Function to send ping messages to the server
                 print(f"Request {i+1} timed out. Packet lost.")
 
 if __name__ == "__main__":
-    # Client sending pings to localhost on port 12345
-    ping_server("10.0.0.199", 12000)
+    parser = argparse.ArgumentParser(description="UDP pinger")
+    parser.add_argument("--host", default="10.0.0.199", help="server to ping")
+    parser.add_argument("--port", type=int, default=12000, help="server port")
+    parser.add_argument("--count", type=int, default=10, help="probes to send")
+    parser.add_argument("--window", type=int, default=None,
+                        help="probes allowed in flight at once (enables pipelined mode)")
+    parser.add_argument("--rate", type=float, default=None, help="probes per second in pipelined mode (default: no limit)")
+    parser.add_argument("--timeout", type=float, default=1.0, help="seconds before a probe counts as lost")
+    parser.add_argument("--size", type=int, default=0, help="pad pipelined probes to this many bytes")
+    args = parser.parse_args()
+
+    # Client sending pings to the server on port 12000
+    ping_server(args.host, args.port, args.count, args.window, args.rate, args.timeout, args.size)
@@ -0,0 +1,193 @@
+"""
+Program Name: CollapsedForwarding.py
+Description: This module implements collapsed forwarding for WebProxy.py. When several clients ask
+             for the same URL while it is not in the cache (or is stale), only the first one (the
+             leader) fetches it from the origin. The others wait on that fetch and receive the
+             response bytes as the leader relays them, so an expiring popular object causes one
+             upstream request instead of a thundering herd.
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. Create one Collapser per proxy process:
+           collapser = Collapser()
+    2. Before fetching a cacheable GET, call `begin(url, request)`; it returns (flight, is_leader).
+    3. The leader calls `flight.start(response, shareable)` once the response head is known,
+       `flight.publish(data)` for every byte range it relays, and `collapser.end(flight, ok)` when done.
+    4. Followers `join()` the flight, wait for `head()`, check `matches(request)` and then `read()`
+       until it returns None.
+
+Requirements:
+    - Python 3.x
+    - The `threading` library.
+
+Notes:
+    - Followers only use a response the leader marked shareable (the cache's own storability rules)
+      and whose Vary'd request headers match their own; otherwise they fetch for themselves.
+    - A flight buffers the relayed bytes so followers can start from the beginning, but only while
+      it has followers: bytes published with nobody following are not kept, and since a later
+      follower would miss them the flight stops accepting new ones. Most followers arrive while the
+      leader waits for the response head, before anything is published. Once more than
+      `max_buffer` bytes are held, no new followers may join, a follower more than `max_buffer`
+      bytes behind the leader is dropped (its read() raises ConnectionError and its client is
+      disconnected), and bytes every remaining follower has read are released. A stalled follower
+      therefore cannot make a flight hold much more than `max_buffer` bytes.
+    - Only the final response is published. Interim 1xx heads (100 Continue, 103 Early Hints)
+      answer the leader's own request and are sent to its client alone, before `start()`.
+    - If the leader ends without streaming a response (e.g. the origin said 304 and the leader
+      answered from the refreshed cache entry), followers are told to look in the cache again.
+"""
+
+import threading
+
+MAX_BUFFER = 16 * 1024 * 1024   # Relayed bytes a flight holds for its followers
+
+# Flight outcomes
+RUNNING = "running"
+STREAMED = "streamed"           # The leader relayed a complete response
+NOT_STREAMED = "not-streamed"   # The leader finished without a response followers can use
+FAILED = "failed"               # The upstream fetch broke part-way
+
+class Flight:
+    """One in-flight upstream fetch and the followers waiting on it."""
+
+    def __init__(self, key, request, max_buffer=MAX_BUFFER):
+        self.key = key
+        self.request = request          # The leader's request, for Vary matching
+        self.max_buffer = max_buffer
+        self.cond = threading.Condition()
+        self.response = None           # Response head once the leader has it
+        self.shareable = False
+        self.buffer = bytearray()       # Relayed bytes from offset `base` onwards
+        self.base = 0
+        self.end = 0                    # Total bytes relayed so far
+        self.readers = {}               # token -> offset of the next byte that follower needs
+        self.dropped = set()            # Tokens of followers that fell too far behind
+        self.joinable = True
+        self.outcome = RUNNING
+
+    # Leader side
+
+    def start(self, response, shareable):
+        with self.cond:
+            self.response = response
+            self.shareable = shareable
+            self.cond.notify_all()
+
+    def publish(self, data):
+        with self.cond:
+            self.end += len(data)
+            if not self.readers:
+                # Nobody to keep these bytes for, and a follower joining later would miss them
+                self.joinable = False
+                self.buffer.clear()
+                self.base = self.end
+                return
+            self.buffer += data
+            if self.end - self.base > self.max_buffer:
+                # Too much to keep for latecomers: keep only what current followers still need, and
+                # give up on followers so slow that they would need more than max_buffer bytes kept
+                self.joinable = False
+                oldest = self.end - self.max_buffer
+                for token in [token for token, offset in self.readers.items() if offset < oldest]:
+                    del self.readers[token]
+                    self.dropped.add(token)
+                low = min(self.readers.values(), default=self.end)
+                del self.buffer[:low - self.base]
+                self.base = low
+            self.cond.notify_all()
+
+    def has_followers(self):
+        with self.cond:
+            return bool(self.readers)
+
+    def finish(self, outcome):
+        with self.cond:
+            self.outcome = outcome
+            self.joinable = False
+            self.cond.notify_all()
+
+    # Follower side
+
+    def join(self):
+        """Register a follower; returns a token, or None if the flight no longer accepts followers."""
+        with self.cond:
+            if not self.joinable:
+                return None
+            token = object()
+            self.readers[token] = self.base
+            return token
+
+    def leave(self, token):
+        with self.cond:
+            self.readers.pop(token, None)
+            self.dropped.discard(token)
+
+    def head(self):
+        """Wait for the response head; returns None if the flight ended without a usable one."""
+        with self.cond:
+            while self.response is None and self.outcome == RUNNING:
+                self.cond.wait()
+            if self.response is None or not self.shareable:
+                return None
+            return self.response
+
+    def matches(self, request):
+        """True if the response may answer this request as well (Vary'd headers are equal)."""
+        vary = self.response.headers.get("vary", "")
+        for name in (token.strip().lower() for token in vary.split(",")):
+            if not name:
+                continue
+            if name == "*" or request.headers.get(name) != self.request.headers.get(name):
+                return False
+        return True
+
+    def read(self, token):
+        """Return the next relayed bytes for this follower, or None once the response is complete."""
+        with self.cond:
+            while token not in self.dropped and self.readers[token] == self.end and self.outcome == RUNNING:
+                self.cond.wait()
+            if token in self.dropped:
+                raise ConnectionError("fell too far behind the shared upstream fetch")
+            offset = self.readers[token]
+            if offset == self.end:
+                if self.outcome != STREAMED:
+                    raise ConnectionError("the shared upstream fetch failed")
+                return None
+            data = bytes(memoryview(self.buffer)[offset - self.base:])
+            self.readers[token] = self.end
+            return data
+
+class Collapser:
+    """Registry of in-flight fetches keyed by URL."""
+
+    def __init__(self, max_buffer=MAX_BUFFER):
+        self.max_buffer = max_buffer
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.counters = {"leaders": 0, "followers": 0}
+
+    def begin(self, key, request):
+        """Return (flight, True) to lead a new fetch, or (flight, False) to follow one in progress."""
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None and flight.joinable:
+                self.counters["followers"] += 1
+                return flight, False
+            flight = self.flights[key] = Flight(key, request, self.max_buffer)
+            self.counters["leaders"] += 1
+            return flight, True
+
+    def end(self, flight, outcome):
+        """Called by the leader when its fetch is over; later requests no longer join this flight."""
+        with self.lock:
+            if self.flights.get(flight.key) is flight:
+                del self.flights[flight.key]
+        flight.finish(outcome)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats.update(in_flight=len(self.flights))
+            return stats
@@ -0,0 +1,410 @@
+"""
+Program Name: HTTPParser.py
+Description: This module implements an incremental HTTP/1.x request parser shared by WebServer.py
+             and WebProxy.py. Bytes are fed in as they arrive from the socket, in any segmentation,
+             and complete requests come out as HTTPRequest objects. It handles request heads split
+             across reads, pipelined requests, header size limits, and Content-Length and chunked
+             message bodies. For responses it provides a head parser and a BodyFramer that finds
+             the end of a body while the proxy relays it untouched.
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. Create one parser per client connection:
+           parser = HTTPParser()
+    2. Feed it every chunk received from the socket and collect the finished requests:
+           parser.feed(data)
+           request = parser.next_request()   # None until a complete request has arrived
+    3. Run this module directly to benchmark parse throughput:
+           python HTTPParser.py
+
+Requirements:
+    - Python 3.x
+
+Notes:
+    - The parser works on a bytearray buffer and memoryview slices; header values are decoded only
+      once a head is complete, never while waiting for more data.
+    - Malformed or oversized input raises HTTPParseError carrying the HTTP status code to answer with.
+    - Chunked bodies are de-chunked; `HTTPRequest.to_bytes()` re-frames a request for forwarding.
+    - BodyFramer only counts bytes (Content-Length, chunked, or until EOF); the caller relays the
+      original bytes, chunk framing included.
+"""
+
+import time
+
+MAX_HEADER_SIZE = 65536         # Largest request line + headers accepted
+MAX_BODY_SIZE = 16 * 1024 * 1024    # Largest request body accepted
+MAX_CHUNK_LINE = 1024           # Largest chunk-size line (size + extensions) accepted
+
+class HTTPParseError(Exception):
+    """Raised when the input is not a valid or acceptable HTTP request."""
+
+    def __init__(self, status, reason):
+        super().__init__(f"{status} {reason}")
+        self.status = status    # HTTP status code to send back (400, 413, 431, 501, ...)
+        self.reason = reason
+
+class HTTPRequest:
+    """A parsed HTTP request."""
+
+    def __init__(self, method, target, version, headers, head, body=b"", chunked=False):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers      # Lower-cased header names; repeated headers joined with ", "
+        self.head = head            # Raw request line and headers, including the blank line
+        self.body = body            # Message body with any chunked framing removed
+        self.chunked = chunked
+
+    def header(self, name, default=None):
+        return self.headers.get(name.lower(), default)
+
+    @property
+    def keep_alive(self):
+        """Whether the client allows the connection to stay open after this request."""
+        tokens = [token.strip().lower() for token in self.headers.get("connection", "").split(",")]
+        if self.version == "HTTP/1.1":
+            return "close" not in tokens
+        return "keep-alive" in tokens
+
+    def to_bytes(self):
+        """Serialize the request for forwarding, re-framing a chunked body as a single chunk."""
+        if not self.chunked:
+            return self.head + self.body
+        if not self.body:
+            return self.head + b"0\r\n\r\n"
+        return self.head + b"%x\r\n" % len(self.body) + self.body + b"\r\n0\r\n\r\n"
+
+class HTTPResponse:
+    """A parsed HTTP response head."""
+
+    def __init__(self, version, status, reason, headers, head):
+        self.version = version
+        self.status = status        # Integer status code
+        self.reason = reason
+        self.headers = headers      # Lower-cased header names; repeated headers joined with ", "
+        self.head = head            # Raw status line and headers, including the blank line
+
+    def header(self, name, default=None):
+        return self.headers.get(name.lower(), default)
+
+    @property
+    def keep_alive(self):
+        """Whether the server allows the connection to be reused after this response."""
+        tokens = [token.strip().lower() for token in self.headers.get("connection", "").split(",")]
+        if self.version == "HTTP/1.1":
+            return "close" not in tokens
+        return "keep-alive" in tokens
+
+# Parse "Name: value" lines into a dict with lower-cased names
+def parse_header_lines(lines):
+    headers = {}
+    for line in lines:
+        name, sep, value = line.partition(b":")
+        if not sep or not name or name != name.strip():
+            raise HTTPParseError(400, "Bad Request")
+        name = name.decode('iso-8859-1').lower()
+        value = value.strip().decode('iso-8859-1')
+        headers[name] = headers[name] + ", " + value if name in headers else value
+    return headers
+
+# Parse a complete response head (status line, headers and the blank line)
+def parse_response_head(head):
+    head = bytes(head)
+    lines = head.rstrip(b"\r\n").split(b"\r\n")
+    parts = lines[0].split(None, 2)
+    if len(parts) < 2 or not parts[0].startswith(b"HTTP/1.") or not parts[1].isdigit():
+        raise HTTPParseError(502, "Bad Gateway")
+    reason = parts[2].decode('iso-8859-1') if len(parts) > 2 else ""
+    try:
+        headers = parse_header_lines(lines[1:])
+    except HTTPParseError:
+        raise HTTPParseError(502, "Bad Gateway")
+    return HTTPResponse(parts[0].decode('iso-8859-1'), int(parts[1]), reason, headers, head)
+
+# Body framing modes
+NO_BODY = "none"
+LENGTH = "length"
+CHUNKED = "chunked"
+UNTIL_EOF = "eof"
+
+class BodyFramer:
+    """Tracks where a response body ends while its bytes are relayed verbatim, without copying them."""
+
+    def __init__(self, request_method, response):
+        self.done = False
+        self.remaining = 0
+        self.line = bytearray()     # Partial chunk-size or trailer line
+        self.chunk_state = CHUNK_SIZE
+        transfer_encoding = response.headers.get("transfer-encoding")
+        if request_method == "HEAD" or response.status < 200 or response.status in (204, 304):
+            self.mode = NO_BODY
+        elif transfer_encoding is not None and transfer_encoding.split(",")[-1].strip().lower() == "chunked":
+            self.mode = CHUNKED
+        elif transfer_encoding is None and "content-length" in response.headers:
+            value = response.headers["content-length"]
+            if not (value.isascii() and value.isdigit()):   # str.isdigit() also accepts e.g. "\xb2"
+                raise HTTPParseError(502, "Bad Gateway")
+            self.mode = LENGTH
+            self.remaining = int(value)
+        else:
+            self.mode = UNTIL_EOF
+        self.done = self.mode == NO_BODY or (self.mode == LENGTH and self.remaining == 0)
+
+    def consume(self, view):
+        """Return how many leading bytes of view belong to this body; sets done at its end."""
+        if self.done:
+            return 0
+        if self.mode == UNTIL_EOF:
+            return len(view)
+        if self.mode == LENGTH:
+            used = min(len(view), self.remaining)
+            self.remaining -= used
+            self.done = self.remaining == 0
+            return used
+        return self._consume_chunked(view)
+
+    def _consume_chunked(self, view):
+        pos = 0
+        size = len(view)
+        while pos < size and not self.done:
+            if self.chunk_state == CHUNK_DATA:
+                # Chunk data plus its trailing CRLF are skipped without looking at them
+                step = min(size - pos, self.remaining)
+                pos += step
+                self.remaining -= step
+                if self.remaining == 0:
+                    self.chunk_state = CHUNK_SIZE
+                continue
+            # Size and trailer lines are short: collect them byte-wise until the line feed
+            newline = bytes(view[pos:pos + MAX_CHUNK_LINE]).find(b"\n")
+            if newline < 0:
+                self.line += view[pos:size]
+                if len(self.line) > MAX_CHUNK_LINE:
+                    raise HTTPParseError(502, "Bad Gateway")
+                return size
+            self.line += view[pos:pos + newline]
+            pos += newline + 1
+            line = bytes(self.line).strip()
+            self.line.clear()
+            if self.chunk_state == CHUNK_SIZE:
+                if not line:
+                    continue    # CRLF that ended the previous chunk's data
+                try:
+                    chunk = int(line.split(b";", 1)[0], 16)
+                except ValueError:
+                    raise HTTPParseError(502, "Bad Gateway")
+                if chunk == 0:
+                    self.chunk_state = CHUNK_TRAILER
+                else:
+                    self.remaining = chunk
+                    self.chunk_state = CHUNK_DATA
+            elif not line:      # Empty line after the last chunk's trailers ends the message
+                self.done = True
+        return pos
+
+# Parser states
+HEAD = 0
+BODY = 1
+CHUNK_SIZE = 2
+CHUNK_DATA = 3
+CHUNK_TRAILER = 4
+
+class HTTPParser:
+    """Incremental parser turning a byte stream into HTTPRequest objects."""
+
+    def __init__(self, max_header_size=MAX_HEADER_SIZE, max_body_size=MAX_BODY_SIZE):
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        self.buffer = bytearray()
+        self.pos = 0            # Offset of the first unconsumed byte in buffer
+        self.scan = 0           # Offset where the search for the end of the head resumes
+        self.state = HEAD
+        self.request = None     # Request whose body is being read
+        self.body = None
+        self.remaining = 0      # Body or chunk bytes still expected
+
+    def feed(self, data):
+        """Append bytes received from the socket."""
+        # Compact once the consumed prefix dominates, so pipelined input is not copied per request
+        if self.pos and self.pos >= len(self.buffer) // 2:
+            del self.buffer[:self.pos]
+            self.scan -= self.pos
+            self.pos = 0
+        self.buffer += data
+
+    def pending(self):
+        """Number of buffered bytes not yet consumed by a complete request."""
+        return len(self.buffer) - self.pos
+
+    def take_pending(self):
+        """Remove and return the buffered bytes not consumed by a request (e.g. tunnel data after CONNECT)."""
+        data = bytes(memoryview(self.buffer)[self.pos:])
+        del self.buffer[:]
+        self.pos = self.scan = 0
+        return data
+
+    def next_request(self):
+        """Return the next complete HTTPRequest, or None if more data is needed."""
+        while True:
+            if self.state == HEAD:
+                if not self._parse_head():
+                    return None
+                continue
+            if self.state == CHUNK_SIZE:
+                if not self._parse_chunk_size():
+                    return None
+                continue
+            if self.state == CHUNK_DATA:
+                # Chunk data followed by its CRLF
+                if len(self.buffer) - self.pos < self.remaining + 2:
+                    return None
+                end = self.pos + self.remaining
+                if self.buffer[end:end + 2] != b"\r\n":
+                    raise HTTPParseError(400, "Bad Request")
+                self.body += memoryview(self.buffer)[self.pos:end]
+                self.pos = end + 2
+                self.state = CHUNK_SIZE
+                continue
+            if self.state == CHUNK_TRAILER:
+                if not self._skip_trailers():
+                    return None
+            elif not self._read_body(self.remaining):   # BODY
+                return None
+
+            # Body complete: hand the request over and get ready for the next one
+            request = self.request
+            request.body = bytes(self.body) if self.body else b""
+            self.remaining = 0
+            self.request = None
+            self.body = None
+            self.scan = self.pos
+            self.state = HEAD
+            return request
+
+    def _parse_head(self):
+        end = self.buffer.find(b"\r\n\r\n", max(self.scan, self.pos))
+        if end < 0:
+            if len(self.buffer) - self.pos > self.max_header_size:
+                raise HTTPParseError(431, "Request Header Fields Too Large")
+            self.scan = max(self.pos, len(self.buffer) - 3)
+            return False
+        if end + 4 - self.pos > self.max_header_size:
+            raise HTTPParseError(431, "Request Header Fields Too Large")
+
+        head = bytes(memoryview(self.buffer)[self.pos:end + 4])
+        self.pos = end + 4
+        lines = head[:-4].split(b"\r\n")
+        # Tolerate empty lines before the request line (RFC 9112 section 2.2)
+        while lines and not lines[0]:
+            lines.pop(0)
+        if not lines:
+            raise HTTPParseError(400, "Bad Request")
+        parts = lines[0].split()
+        if len(parts) != 3 or not parts[2].startswith(b"HTTP/1."):
+            raise HTTPParseError(400, "Bad Request")
+        method, target, version = (part.decode('iso-8859-1') for part in parts)
+
+        headers = parse_header_lines(lines[1:])
+        self.request = HTTPRequest(method, target, version, headers, head)
+        self.body = bytearray()
+        transfer_encoding = headers.get("transfer-encoding")
+        if transfer_encoding is not None:
+            if transfer_encoding.split(",")[-1].strip().lower() != "chunked":
+                raise HTTPParseError(501, "Not Implemented")
+            self.request.chunked = True
+            self.state = CHUNK_SIZE
+        elif "content-length" in headers:
+            value = headers["content-length"]
+            if not (value.isascii() and value.isdigit()):   # str.isdigit() also accepts e.g. "\xb2"
+                raise HTTPParseError(400, "Bad Request")
+            self.remaining = int(value)
+            if self.remaining > self.max_body_size:
+                raise HTTPParseError(413, "Content Too Large")
+            self.state = BODY
+        else:
+            self.state = BODY    # No body
+        return True
+
+    def _read_body(self, length):
+        if len(self.buffer) - self.pos < length:
+            return False
+        self.body += memoryview(self.buffer)[self.pos:self.pos + length]
+        self.pos += length
+        return True
+
+    def _parse_chunk_size(self):
+        end = self.buffer.find(b"\r\n", self.pos)
+        if end < 0:
+            if len(self.buffer) - self.pos > MAX_CHUNK_LINE:
+                raise HTTPParseError(400, "Bad Request")
+            return False
+        size = bytes(self.buffer[self.pos:end]).split(b";", 1)[0].strip()
+        try:
+            self.remaining = int(size, 16)
+        except ValueError:
+            raise HTTPParseError(400, "Bad Request")
+        self.pos = end + 2
+        if len(self.body) + self.remaining > self.max_body_size:
+            raise HTTPParseError(413, "Content Too Large")
+        self.state = CHUNK_DATA if self.remaining else CHUNK_TRAILER
+        return True
+
+    def _skip_trailers(self):
+        # Trailer fields are discarded; the message ends at the first empty line
+        while True:
+            end = self.buffer.find(b"\r\n", self.pos)
+            if end < 0:
+                if len(self.buffer) - self.pos > self.max_header_size:
+                    raise HTTPParseError(431, "Request Header Fields Too Large")
+                return False
+            empty = end == self.pos
+            self.pos = end + 2
+            if empty:
+                return True
+
+# Time how long the parser takes to consume the given stream fed in pieces of `step` bytes
+def benchmark(name, stream, count, step=None, rounds=5):
+    best = float('inf')
+    for _ in range(rounds):
+        parser = HTTPParser()
+        parsed = 0
+        start = time.perf_counter()
+        if step is None:
+            parser.feed(stream)
+            while parser.next_request() is not None:
+                parsed += 1
+        else:
+            view = memoryview(stream)
+            for offset in range(0, len(stream), step):
+                parser.feed(view[offset:offset + step])
+                while parser.next_request() is not None:
+                    parsed += 1
+        best = min(best, time.perf_counter() - start)
+        assert parsed == count, (name, parsed, count)
+    print(f"{name:<34} {count / best:>12,.0f} req/s {len(stream) / best / 1e6:>10.1f} MB/s")
+
+if __name__ == "__main__":
+    typical = (b"GET /index.html HTTP/1.1\r\n"
+               b"Host: localhost:8080\r\n"
+               b"User-Agent: Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0\r\n"
+               b"Accept: text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8\r\n"
+               b"Accept-Language: en-US,en;q=0.5\r\n"
+               b"Accept-Encoding: gzip, deflate, br\r\n"
+               b"Connection: keep-alive\r\n"
+               b"If-None-Match: \"18df8dd036cee8f0-123\"\r\n"
+               b"\r\n")
+    minimal = b"GET / HTTP/1.1\r\nHost: a\r\n\r\n"
+    posted = b"POST /form HTTP/1.1\r\nHost: a\r\nContent-Length: 1024\r\n\r\n" + b"x" * 1024
+    chunked = (b"POST /upload HTTP/1.1\r\nHost: a\r\nTransfer-Encoding: chunked\r\n\r\n"
+               + (b"100\r\n" + b"y" * 256 + b"\r\n") * 2 + b"0\r\n\r\n")
+
+    count = 20000
+    print(f"{'workload':<34} {'requests':>16} {'throughput':>15}")
+    benchmark("minimal GET, pipelined", minimal * count, count)
+    benchmark("browser GET, pipelined", typical * count, count)
+    benchmark("browser GET, 1460-byte segments", typical * count, count, step=1460)
+    benchmark("browser GET, 7-byte segments", typical * 2000, 2000, step=7)
+    benchmark("POST 1 KiB Content-Length body", posted * count, count)
+    benchmark("POST 512 B chunked body", chunked * count, count)
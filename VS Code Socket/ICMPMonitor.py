@@ -0,0 +1,266 @@
+"""
+Program Name: ICMPMonitor.py
+Description: This program pings one or more hosts continuously, for as long as it is left running,
+             and prints a summary for every host at a fixed interval. Statistics are kept in
+             streaming form (running mean and variance, min/max, an exponentially weighted moving
+             average and a latency histogram for percentiles) together with a fixed-size ring buffer
+             of the most recent samples, so memory stays constant no matter how long it runs.
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. Run this program with the hosts to watch:
+           python ICMPMonitor.py 10.0.0.1 example.com [--interval 1] [--report 60] [--history 300]
+                                 [--backend auto|dgram|raw]
+    2. Every `report` seconds one line per host is printed with the probes sent and lost in that
+       period and the RTT statistics since the start. Stop it with Ctrl+C (or SIGTERM) to get a
+       final summary.
+
+Requirements:
+    - Python 3.x
+    - Either Linux ping sockets enabled for the user's group (net.ipv4.ping_group_range), or
+      administrative/root privileges to create raw sockets.
+    - ICMPPingerfinal.py, ICMPSweep.py, InternetChecksum.py, LoadGen.py, PingSocket.py, Resolver.py
+      and Scheduler.py (in this directory).
+
+Notes:
+    - Mean and variance use Welford's algorithm, which is numerically stable over billions of samples.
+    - The EWMA weights each new RTT by `alpha` (default 1/8, as TCP's SRTT does), so it follows
+      recent changes while the mean describes the whole run.
+    - Percentiles come from LoadGen's log-linear histogram with 128 sub-buckets per power of two
+      (within 1% of the true value); its size depends only on the range of RTTs seen.
+    - The ring buffer is an array of doubles holding the last `history` RTTs; lost probes are
+      stored as NaN so the history shows when the losses happened.
+    - All hosts share one ICMP socket and one receive loop, as in ICMPSweep.py. The socket comes
+      from PingSocket.py: an unprivileged datagram socket where the system allows it, else a raw
+      socket. A datagram socket has a single Echo identifier chosen by the kernel, so probes are
+      numbered from one sequence counter shared by all hosts (wrapping around at 65536), and it
+      does not receive Destination Unreachable/Time Exceeded errors, so those probes count as lost.
+    - RTTs use the socket's kernel receive timestamps where available.
+    - Probe sends, reply timeouts and summaries are timers in one Scheduler (see Scheduler.py);
+      each summary ends with the scheduler's lag, i.e. how late probes went out.
+"""
+
+import os
+import sys
+import math
+import time
+import array
+import select
+import signal
+import socket
+import struct
+import argparse
+
+from ICMPPingerfinal import ICMP_ECHO_REPLY, ICMP_HEADER_SIZE
+from PingSocket import PingSocket
+from ICMPSweep import createProbe, quotedProbe, expandTargets, ICMP_DEST_UNREACHABLE, ICMP_TIME_EXCEEDED, RECV_BUFFER
+from LoadGen import Histogram
+from Scheduler import Scheduler
+
+INTERVAL = 1.0          # Seconds between probes to the same host
+TIMEOUT = 2.0           # Seconds before a probe counts as lost
+REPORT = 60.0           # Seconds between summaries
+HISTORY = 300           # Recent samples kept per host
+ALPHA = 0.125           # EWMA weight of the newest sample
+SKETCH_BITS = 7         # Histogram sub-bucket bits: 128 per power of two, about 1% precision
+
+# Fixed-size history of the most recent samples
+class RingBuffer:
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError("a ring buffer holds at least one sample")
+        self.samples = array.array("d", [math.nan]) * size
+        self.next = 0           # Slot the next sample goes into
+        self.count = 0          # Samples stored so far, up to size
+
+    def append(self, value):
+        self.samples[self.next] = value
+        self.next = (self.next + 1) % len(self.samples)
+        self.count = min(self.count + 1, len(self.samples))
+
+    def recent(self):
+        """Return the stored samples, oldest first."""
+        if self.count < len(self.samples):
+            return self.samples[:self.count]
+        return self.samples[self.next:] + self.samples[:self.next]
+
+# Constant-memory RTT statistics for one host
+class StreamingStats:
+    def __init__(self, alpha=ALPHA, history=HISTORY):
+        self.alpha = alpha
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0           # Sum of squared differences from the mean (Welford)
+        self.min = math.inf
+        self.max = 0.0
+        self.ewma = None
+        self.sketch = Histogram(SKETCH_BITS)    # RTTs in microseconds
+        self.history = RingBuffer(history)
+
+    def add(self, rtt):
+        self.count += 1
+        delta = rtt - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (rtt - self.mean)
+        self.min = min(self.min, rtt)
+        self.max = max(self.max, rtt)
+        self.ewma = rtt if self.ewma is None else self.ewma + self.alpha * (rtt - self.ewma)
+        self.sketch.record(int(rtt * 1000))
+        self.history.append(rtt)
+
+    def lost(self):
+        self.history.append(math.nan)
+
+    def stddev(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def percentile(self, percent):
+        return self.sketch.percentile(percent) / 1000
+
+# One monitored host
+class Target:
+    def __init__(self, name, address, ident, history):
+        self.name = name
+        self.address = address
+        self.ident = ident
+        self.seq = 0
+        self.sent = self.received = 0
+        self.periodSent = self.periodReceived = 0
+        self.errors = 0
+        self.stats = StreamingStats(history=history)
+
+    def line(self):
+        # Replies to probes sent late in the previous period count in this one, so clamp at zero
+        periodLoss = max(0, self.periodSent - self.periodReceived) / self.periodSent * 100 if self.periodSent else 0.0
+        loss = (self.sent - self.received) / self.sent * 100 if self.sent else 0.0
+        label = self.address if self.name == self.address else f"{self.name} ({self.address})"
+        text = f"{label:<32} {self.periodSent:>5} sent {periodLoss:5.1f}% loss (total {loss:.2f}%)"
+        stats = self.stats
+        if stats.count:
+            text += (f"  rtt min/avg/max/sd {stats.min:.2f}/{stats.mean:.2f}/{stats.max:.2f}/{stats.stddev():.2f}"
+                     f"  ewma {stats.ewma:.2f}  p50/p90/p99 {stats.percentile(50):.2f}/{stats.percentile(90):.2f}/"
+                     f"{stats.percentile(99):.2f} ms")
+        if self.errors:
+            text += f"  {self.errors} ICMP error(s)"
+        self.periodSent = self.periodReceived = 0
+        return text
+
+def report(targets, started, scheduler):
+    print(f"--- {time.strftime('%Y-%m-%d %H:%M:%S')} ({time.monotonic() - started:.0f}s) ---")
+    for target in targets:
+        print(target.line())
+    print(scheduler.describe())
+    sys.stdout.flush()
+
+def monitor(targets, interval=INTERVAL, timeout=TIMEOUT, reportEvery=REPORT, history=HISTORY, backend="auto"):
+    """Ping (name, address) targets every `interval` seconds until interrupted, reporting periodically.
+
+    backend picks the ICMP socket as in PingSocket.py; "raw" needs root.
+    """
+    try:
+        icmpSocket = PingSocket(backend)
+    except PermissionError as e:
+        print(f"{e}: enable ping sockets (net.ipv4.ping_group_range) or run this as root.")
+        sys.exit(1)
+    try:
+        icmpSocket.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER)
+    except OSError:
+        pass
+    icmpSocket.sock.setblocking(False)
+    print(f"Monitoring {len(targets)} host(s) ({icmpSocket.describe()})")
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))    # Stop like Ctrl+C
+
+    # A raw socket lets every host have its own identifier; a datagram socket has just the kernel's
+    base = os.getpid() & 0xFFFF
+    hosts = [Target(name, address, icmpSocket.ident if icmpSocket.kind == "dgram" else (base + i) & 0xFFFF, history)
+             for i, (name, address) in enumerate(targets)]
+    outstanding = {}        # (identifier, sequence) -> (Target, send time on the socket's clock, timeout Timer)
+    scheduler = Scheduler()
+    started = time.monotonic()
+    seq = 0                 # Shared by all hosts so (identifier, sequence) stays unique on a datagram socket
+
+    def expire(key):
+        host = outstanding.pop(key)[0]
+        host.stats.lost()
+
+    def sendProbe(host):
+        nonlocal seq
+        seq = host.seq = (seq + 1) & 0xFFFF
+        key = (host.ident, seq)
+        if key in outstanding:      # Sequence numbers wrapped while this one was still out
+            scheduler.cancel(outstanding[key][2])
+            expire(key)
+        try:
+            sentAt = icmpSocket.send(createProbe(host.ident, seq), (host.address, 1))
+        except OSError as e:
+            print(f"Failed to send to {host.address}: {e}")
+            host.stats.lost()
+        else:
+            outstanding[key] = (host, sentAt, scheduler.call_later(timeout, expire, key))
+        host.sent += 1
+        host.periodSent += 1
+
+    # One periodic send timer per host, spread evenly over the interval, plus the report timer
+    start = time.perf_counter_ns()
+    for i, host in enumerate(hosts):
+        scheduler.every(interval, sendProbe, host, start=start + int(interval * 1e9) * i // len(hosts))
+    scheduler.every(reportEvery, report, hosts, started, scheduler, start=start + int(reportEvery * 1e9))
+
+    try:
+        while True:
+            ready, _, _ = select.select([icmpSocket], [], [], scheduler.next_timeout())
+            while ready:
+                try:
+                    icmp, addr, arrived = icmpSocket.receive()     # Starts at the ICMP header
+                except BlockingIOError:
+                    break
+                if len(icmp) < ICMP_HEADER_SIZE:
+                    continue
+                icmpType = icmp[0]
+                if icmpType == ICMP_ECHO_REPLY:
+                    probe = outstanding.pop(struct.unpack("!HH", icmp[4:8]), None)
+                    if probe is not None:
+                        host, sentAt, timer = probe
+                        scheduler.cancel(timer)
+                        host.received += 1
+                        host.periodReceived += 1
+                        host.stats.add((arrived - sentAt) / 1e6)
+                elif icmpType in (ICMP_DEST_UNREACHABLE, ICMP_TIME_EXCEEDED):
+                    key = quotedProbe(icmp)
+                    probe = outstanding.pop(key, None) if key else None
+                    if probe is not None:
+                        scheduler.cancel(probe[2])
+                        probe[0].errors += 1
+                        probe[0].stats.lost()
+            scheduler.run_due()     # After the replies, so their arrival times are taken first
+    except (KeyboardInterrupt, SystemExit):
+        print("\nMonitoring stopped.")
+        report(hosts, started, scheduler)
+    finally:
+        icmpSocket.close()
+    return hosts
+
+# argparse type for --history: the ring buffer needs room for at least one sample
+def historySize(text):
+    size = int(text)
+    if size < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {size}")
+    return size
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Continuously ping hosts and report streaming RTT statistics")
+    parser.add_argument("targets", nargs="+", help="host names, addresses or CIDR ranges")
+    parser.add_argument("--interval", type=float, default=INTERVAL, help="seconds between probes to each host")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds before a probe counts as lost")
+    parser.add_argument("--report", type=float, default=REPORT, help="seconds between summaries")
+    parser.add_argument("--history", type=historySize, default=HISTORY, help="recent RTT samples kept per host (at least 1)")
+    parser.add_argument("--backend", choices=("auto", "dgram", "raw"), default="auto",
+                        help="ICMP socket: unprivileged datagram, raw (root), or whichever is available")
+    args = parser.parse_args()
+
+    targets = expandTargets(args.targets)
+    if not targets:
+        sys.exit(1)
+    monitor(targets, args.interval, args.timeout, args.report, args.history, args.backend)
@@ -17,11 +17,20 @@ Usage:
 
 Requirements:
     - Python 3.x
-    - Administrative/root privileges to create raw sockets.
+    - Either Linux ping sockets enabled for the user's group (net.ipv4.ping_group_range), or
+      administrative/root privileges to create raw sockets.
     - The `socket`, `os`, `struct`, `time`, `select`, and `sys` libraries for ICMP communication.
+    - Resolver.py (in this directory) for cached host name lookups.
+    - InternetChecksum.py (in this directory) for the ICMP checksum.
+    - Scheduler.py (in this directory) for pacing the probes one second apart.
+    - PingSocket.py (in this directory) for the ICMP socket.
 
 Notes:
-    - The program uses raw sockets, which require administrative/root privileges to run.
+    - The program uses an unprivileged ICMP datagram socket where the system allows it and a raw
+      socket (administrative/root privileges) otherwise; pass backend="dgram" or "raw" to ping()
+      to force one.
+    - Where the kernel supports it, RTTs are measured from kernel receive timestamps
+      (SO_TIMESTAMPNS) rather than from when Python read the reply.
     - The host to ping can be modified in the `hostPing` variable in the `__main__` block.
     - This program is for educational purposes and is not intended for production use.
 """
@@ -33,21 +42,16 @@ import time
 import select
 import sys          #import necessary libraries
 
+from Resolver import shared_resolver    # Cached host name lookups
+from InternetChecksum import checksum   # RFC 1071 checksum of the ICMP message
+from Scheduler import sleep_until       # Drift-free pacing between probes
+from PingSocket import PingSocket       # Datagram or raw ICMP socket with kernel timestamps
+
 # ICMP Constants
 ICMP_ECHO_REQUEST = 8   # Type for ICMP Echo Request
 ICMP_ECHO_REPLY = 0     # Type for ICMP Echo Reply
 ICMP_HEADER_SIZE = 8    # Header size for ICMP
 
-# Create checksum function for ICMP packet
-def checksum(data):
-    total = 0
-    # Sum the 16-bit values of the packet
-    for i in range(0, len(data), 2):
-        total += (data[i] << 8) + (data[i + 1])     # Shift and add each 16-bit block
-        total = (total & 0xFFFF) + (total >> 16)
-    # Return the complement of the checksum
-    return ~total & 0xFFFF
-
 # Create ICMP Echo Request packet with timestamp and return the packet
 def createPacket(id, seq):
     header = struct.pack("bbHHh", ICMP_ECHO_REQUEST, 0, 0, id, seq)  # Create header with type, code, checksum, ID, sequence
@@ -60,41 +64,44 @@ def createPacket(id, seq):
     return packet
 
 # Receive the ICMP Echo Reply and calculate the RTT
-def receivePing(icmpSocket, id, seq, timeout):
-    startTime = time.time() # Record the start time
+def receivePing(icmpSocket, id, seq, timeout, sentAt):
+    deadline = time.monotonic() + timeout   # Give up this long after the request was sent
     while True:                     # Loop until a response is received or timeout
-        ready = select.select([icmpSocket], [], [], timeout)    # read from the socket
+        ready = select.select([icmpSocket], [], [], max(0, deadline - time.monotonic()))    # read from the socket
         # Check if the socket is ready to read
         if ready[0] == []:
             return None  # Timeout if no response
-        packet, addr = icmpSocket.recvfrom(1024)    # Receive the response
+        packet, addr, arrived = icmpSocket.receive()    # Receive the response (ICMP message and arrival time)
         print(f"Received raw packet: {packet}")
-        icmpHeader = packet[20:28]  # Extract ICMP header from the response
+        icmpHeader = packet[:ICMP_HEADER_SIZE]  # Extract ICMP header from the response
+        if len(icmpHeader) < ICMP_HEADER_SIZE:
+            continue
         type, code, checksum, pid, seqReceived = struct.unpack("bbHHh", icmpHeader) # Unpack the header
         print(f"Received packet: type={type}, code={code}, checksum={checksum}, pid={pid}, seq={seqReceived}")
-        if type == ICMP_ECHO_REPLY and pid == id and seqReceived == seq:    # Check if the packet is an Echo Reply and matches the ID and sequence
-            endTime = time.time()   # Record the end time
-            rtt = (endTime - startTime) * 1000  # RTT in milliseconds
+        # Datagram sockets only receive their own replies, with the identifier chosen by the kernel
+        idMatches = icmpSocket.kind == "dgram" or pid == id
+        if type == ICMP_ECHO_REPLY and idMatches and seqReceived == seq:    # Check if the packet is an Echo Reply and matches the ID and sequence
+            rtt = (arrived - sentAt) / 1e6  # RTT in milliseconds
             return rtt
     return None     # Return None if no response is received
 
 # Main Ping function
-def ping(host, timeout=1, count=10):
-    # Create a raw socket for ICMP
-    try:    #try to create a raw socket
-        icmpSocket = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
-        print("Socket created successfully.")
+def ping(host, timeout=1, count=10, backend="auto"):
+    # Create an ICMP socket: unprivileged datagram socket if allowed, raw socket otherwise
+    try:    #try to create the socket
+        icmpSocket = PingSocket(backend)
+        print(f"Socket created successfully ({icmpSocket.describe()}).")
     except PermissionError:
-        print("Permission denied: You need to run this as root or with administrative privileges.")     # Check for permission error
+        print("Permission denied: enable ping sockets (net.ipv4.ping_group_range) or run this as root.")     # Check for permission error
         sys.exit(1)
     except Exception as e:
         print(f"Failed to create socket: {e}")      # Check for other socket creation errors
         sys.exit(1)
 
     try:    #try to resolve the host
-        destIp = socket.gethostbyname(host)
+        destIp = shared_resolver().gethostbyname(host)
         print(f"Resolved {host} to {destIp}")
-    except socket.gaierror:
+    except (socket.gaierror, socket.timeout):
         print(f"Could not resolve host: {host}")
         sys.exit(1)
 
@@ -104,19 +111,20 @@ def ping(host, timeout=1, count=10):
     lostPackets = 0     # Counter for lost packets
     minRtt, maxRtt, totalRtt = float('inf'), 0, 0       # Initialize min, max, and total RTT
 
+    startTime = time.perf_counter_ns()  # Probes go out on a fixed one-second grid from here
     for i in range(count):
-        time.sleep(1)
+        sleep_until(startTime + (i + 1) * 1_000_000_000)   # No drift from the time spent in each ping
         packetId = (os.getpid() & 0xFFFF) + i  # Ensure packet ID is unique for each packet
         packet = createPacket(packetId, i + 1)
         try:
-            icmpSocket.sendto(packet, (destIp, 1))  # Send the packet
+            sentAt = icmpSocket.send(packet, (destIp, 1))  # Send the packet and note when
             print(f"Sent packet with ID {packetId} and sequence {i + 1}")
         except Exception as e:
             print(f"Failed to send packet: {e}")        # Check for send errors
             lostPackets += 1
             continue
 
-        rtt = receivePing(icmpSocket, packetId, i + 1, timeout)     # Wait for a response
+        rtt = receivePing(icmpSocket, packetId, i + 1, timeout, sentAt)     # Wait for a response
 
         if rtt is None:     # If no response, increment lost packets
             lostPackets += 1
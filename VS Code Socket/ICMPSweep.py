@@ -0,0 +1,235 @@
+"""
+Program Name: ICMPSweep.py
+Description: This program pings many hosts at once, such as a list of servers or every address in a
+             CIDR range. All Echo Requests go out through one raw ICMP socket at a configurable rate,
+             and one receive loop matches every reply to its probe by the (identifier, sequence) pair
+             in a dict of outstanding probes, so sweeping a fleet takes about as long as pinging one
+             host instead of hosts x count seconds.
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. Run this program with the targets to sweep (host names, addresses or CIDR ranges):
+           python ICMPSweep.py 10.0.0.0/24 example.com 192.168.1.10 [--count 3] [--rate 1000]
+    2. The program prints one line of statistics per host (sent, received, loss, RTT min/avg/max)
+       and a summary of how many hosts answered.
+
+Requirements:
+    - Python 3.x
+    - Administrative/root privileges to create raw sockets.
+    - ICMPPingerfinal.py, InternetChecksum.py, Resolver.py and Scheduler.py (in this directory).
+
+Notes:
+    - Every target gets its own ICMP identifier and each of its probes a sequence number, so a reply
+      is looked up in the outstanding-probe dict in O(1) no matter how many hosts are swept.
+      Replies to other programs' pings, which a raw socket also receives, are ignored.
+    - Round r of probes is due `interval` seconds after round r - 1. Sends are spaced to at most
+      `rate` probes per second overall so a large range does not flood the network or overflow
+      the receive buffer. Sends and reply timeouts are timers in a Scheduler (see Scheduler.py),
+      whose lag shows how closely the sweep kept to that pace.
+    - Destination Unreachable and Time Exceeded errors quoting one of our probes are counted
+      per host.
+    - Host names are resolved in parallel through the shared resolver before the sweep starts.
+"""
+
+import os
+import sys
+import time
+import select
+import socket
+import struct
+import argparse
+import ipaddress
+
+from ICMPPingerfinal import ICMP_ECHO_REQUEST, ICMP_ECHO_REPLY, ICMP_HEADER_SIZE
+from Resolver import shared_resolver
+from InternetChecksum import checksum
+from Scheduler import Scheduler
+
+ICMP_DEST_UNREACHABLE = 3   # Type for ICMP Destination Unreachable
+ICMP_TIME_EXCEEDED = 11     # Type for ICMP Time Exceeded
+
+RATE = 1000             # Probes per second over all hosts
+INTERVAL = 1.0          # Seconds between successive probes to the same host
+TIMEOUT = 1.0           # Seconds to wait for each reply
+RECV_BUFFER = 4 * 1024 * 1024   # Requested SO_RCVBUF so reply bursts are not dropped
+PAYLOAD = b"ICMPSweep" + bytes(47)  # 56 bytes of payload, like the classic ping
+
+# Per-host results of a sweep
+class HostStats:
+    def __init__(self, name, address, ident):
+        self.name = name
+        self.address = address
+        self.ident = ident
+        self.sent = 0
+        self.received = 0
+        self.errors = 0         # Unreachable / time exceeded reports for our probes
+        self.rtts = []          # Milliseconds
+
+    def line(self):
+        loss = (self.sent - self.received) / self.sent * 100 if self.sent else 100.0
+        label = self.address if self.name == self.address else f"{self.name} ({self.address})"
+        text = f"{label:<40} {self.sent:>4} sent {self.received:>4} received {loss:6.1f}% loss"
+        if self.rtts:
+            text += f"  rtt min/avg/max = {min(self.rtts):.2f}/{sum(self.rtts) / len(self.rtts):.2f}/{max(self.rtts):.2f} ms"
+        if self.errors:
+            text += f"  {self.errors} ICMP error(s)"
+        return text
+
+# Build an Echo Request with the given identifier and sequence number
+def createProbe(ident, seq):
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksumValue = checksum(header + PAYLOAD)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksumValue, ident, seq) + PAYLOAD
+
+# Expand the command-line targets into (name, address) pairs: CIDR ranges become their host
+# addresses and names are resolved concurrently
+def expandTargets(targets):
+    expanded = []
+    pending = []
+    for target in targets:
+        if "/" in target:
+            network = ipaddress.ip_network(target, strict=False)
+            hosts = list(network.hosts()) or [network.network_address]
+            expanded.extend((str(address), str(address)) for address in hosts)
+        else:
+            pending.append((target, shared_resolver().resolve_async(target)))
+    for name, future in pending:
+        try:
+            expanded.append((name, future.result()[0]))
+        except (socket.gaierror, OSError) as e:
+            print(f"Could not resolve host {name}: {e}")
+    return expanded
+
+# Find the (identifier, sequence) of the Echo Request quoted in an ICMP error message
+def quotedProbe(icmp):
+    inner = icmp[ICMP_HEADER_SIZE:]
+    if len(inner) < 20:
+        return None
+    innerHeaderLength = (inner[0] & 0x0F) * 4
+    quoted = inner[innerHeaderLength:innerHeaderLength + ICMP_HEADER_SIZE]
+    if inner[9] != socket.IPPROTO_ICMP or len(quoted) < ICMP_HEADER_SIZE or quoted[0] != ICMP_ECHO_REQUEST:
+        return None
+    return struct.unpack("!HH", quoted[4:8])
+
+def sweep(targets, count=1, rate=RATE, interval=INTERVAL, timeout=TIMEOUT, scheduler=None):
+    """Ping every target `count` times over one raw socket and return the list of HostStats."""
+    try:
+        icmpSocket = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+    except PermissionError:
+        print("Permission denied: You need to run this as root or with administrative privileges.")
+        sys.exit(1)
+    try:
+        icmpSocket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER)
+    except OSError:
+        pass
+    icmpSocket.setblocking(False)
+
+    # One identifier per host, so (identifier, sequence) names a probe uniquely
+    base = os.getpid() & 0xFFFF
+    hosts = [HostStats(name, address, (base + i) & 0xFFFF) for i, (name, address) in enumerate(targets)]
+    if len(hosts) > 0x10000:
+        raise ValueError("at most 65536 hosts can be swept at once")
+
+    scheduler = Scheduler() if scheduler is None else scheduler
+    outstanding = {}        # (identifier, sequence) -> (HostStats, send time in ns, timeout Timer)
+    gap = int(1e9 / rate) if rate else 0
+    start = time.perf_counter_ns()
+    total = len(hosts) * count
+    sent = 0
+
+    def expire(key):
+        del outstanding[key]
+
+    # Due time of the next probe: round r starts `interval` seconds after round r - 1, and probes
+    # are at least `gap` apart
+    def nextDue(previous):
+        return max(previous + gap, start + int(sent // len(hosts) * interval * 1e9))
+
+    # Send every probe that is due in one go (at high rates several are), then re-arm for the next
+    def sendDue(due):
+        nonlocal sent
+        now = time.perf_counter_ns()
+        while sent < total and due <= now:
+            probeRound, index = divmod(sent, len(hosts))
+            host = hosts[index]
+            seq = probeRound + 1
+            try:
+                icmpSocket.sendto(createProbe(host.ident, seq), (host.address, 1))
+            except BlockingIOError:
+                scheduler.call_later(0.0001, sendDue, due)  # Send buffer full: try again shortly
+                return
+            except OSError as e:
+                print(f"Failed to send to {host.address}: {e}")
+            else:
+                key = (host.ident, seq)
+                outstanding[key] = (host, time.perf_counter_ns(), scheduler.call_later(timeout, expire, key))
+                host.sent += 1
+            sent += 1
+            due = nextDue(due)
+            now = time.perf_counter_ns()
+        if sent < total:
+            scheduler.call_at(max(due, now), sendDue, due)
+
+    scheduler.call_at(start, sendDue, start)
+    try:
+        while sent < total or outstanding:
+            ready, _, _ = select.select([icmpSocket], [], [], scheduler.next_timeout())
+
+            # Drain every queued packet and match it against the outstanding probes
+            while ready:
+                try:
+                    packet, addr = icmpSocket.recvfrom(2048)
+                except BlockingIOError:
+                    break
+                arrived = time.perf_counter_ns()
+                icmp = packet[(packet[0] & 0x0F) * 4:]     # Skip the IP header (IHL words)
+                if len(icmp) < ICMP_HEADER_SIZE:
+                    continue
+                icmpType = icmp[0]
+                if icmpType == ICMP_ECHO_REPLY:
+                    key = struct.unpack("!HH", icmp[4:8])
+                    probe = outstanding.pop(key, None)
+                    if probe is not None:
+                        host, sentAt, timer = probe
+                        scheduler.cancel(timer)
+                        host.received += 1
+                        host.rtts.append((arrived - sentAt) / 1e6)
+                elif icmpType in (ICMP_DEST_UNREACHABLE, ICMP_TIME_EXCEEDED):
+                    key = quotedProbe(icmp)
+                    probe = outstanding.pop(key, None) if key else None
+                    if probe is not None:
+                        scheduler.cancel(probe[2])
+                        probe[0].errors += 1
+            scheduler.run_due()     # After the replies, so their arrival times are taken first
+    finally:
+        icmpSocket.close()
+    return hosts
+
+def printReport(hosts, elapsed):
+    for host in sorted(hosts, key=lambda host: socket.inet_aton(host.address)):
+        print(host.line())
+    alive = sum(1 for host in hosts if host.received)
+    probes = sum(host.sent for host in hosts)
+    print("\n--- sweep statistics ---")
+    print(f"{len(hosts)} hosts, {alive} answered, {probes} probes in {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ping many hosts or CIDR ranges in parallel")
+    parser.add_argument("targets", nargs="+", help="host names, addresses or CIDR ranges")
+    parser.add_argument("--count", type=int, default=1, help="probes per host")
+    parser.add_argument("--rate", type=float, default=RATE, help="probes per second over all hosts")
+    parser.add_argument("--interval", type=float, default=INTERVAL, help="seconds between probes to the same host")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds to wait for each reply")
+    parser.add_argument("--up", action="store_true", help="only list hosts that answered")
+    args = parser.parse_args()
+
+    targets = expandTargets(args.targets)
+    started = time.perf_counter()
+    scheduler = Scheduler()
+    results = sweep(targets, args.count, args.rate, args.interval, args.timeout, scheduler)
+    if args.up:
+        results = [host for host in results if host.received]
+    printReport(results, time.perf_counter() - started)
+    print(scheduler.describe())
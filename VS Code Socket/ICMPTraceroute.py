@@ -0,0 +1,190 @@
+"""
+Program Name: ICMPTraceroute.py
+Description: This program implements an ICMP traceroute. It sends ICMP Echo Requests with increasing
+             TTLs and reports the routers that answer with Time Exceeded, hop by hop, up to the
+             destination. Probes for every TTL are sent at once instead of one hop at a time, and
+             each reply is matched to its probe through the Echo header quoted inside the ICMP error,
+             so a 30-hop trace takes about one timeout instead of up to 30.
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. Run this program with the host to trace:
+           python ICMPTraceroute.py example.com [--max-hops 30] [--probes 3] [--timeout 2]
+    2. The program prints one line per hop with the address(es) that answered, how many of the
+       probes were answered and the RTT min/avg/max.
+
+Requirements:
+    - Python 3.x
+    - Administrative/root privileges to create raw sockets.
+    - ICMPPingerfinal.py, ICMPSweep.py, InternetChecksum.py and Resolver.py (in this directory).
+
+Notes:
+    - Probe n of hop t is sent with TTL t and sequence number (t - 1) * probes + n + 1 under this
+      process's identifier, so the sequence number alone names the hop and probe.
+    - The path ends at the first hop where the destination replies (Echo Reply) or a router
+      reports it unreachable; hops beyond it are not printed.
+    - Probes are spaced to at most `rate` per second, since routers commonly rate-limit the
+      Time Exceeded messages they generate.
+    - A hop that does not answer any of its probes is shown as "*".
+"""
+
+import os
+import sys
+import time
+import select
+import socket
+import struct
+import argparse
+
+from ICMPPingerfinal import ICMP_ECHO_REPLY, ICMP_HEADER_SIZE
+from ICMPSweep import createProbe, quotedProbe, ICMP_DEST_UNREACHABLE, ICMP_TIME_EXCEEDED
+from Resolver import shared_resolver
+
+MAX_HOPS = 30           # Highest TTL probed
+PROBES = 3              # Probes per hop
+TIMEOUT = 2.0           # Seconds to wait for replies after the last probe is sent
+RATE = 1000             # Probes per second
+
+# Replies collected for one TTL
+class Hop:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.sent = 0
+        self.addresses = []     # Responders in the order they answered (load-balanced paths differ)
+        self.rtts = []          # Milliseconds
+        self.reached = False    # The destination itself answered (or reported itself unreachable)
+        self.unreachable = None # ICMP code of a Destination Unreachable, if any
+
+    def line(self):
+        if not self.rtts:
+            return f"{self.ttl:>3}  *"
+        text = f"{self.ttl:>3}  {', '.join(self.addresses):<32} {len(self.rtts)}/{self.sent}"
+        text += f"  rtt min/avg/max = {min(self.rtts):.2f}/{sum(self.rtts) / len(self.rtts):.2f}/{max(self.rtts):.2f} ms"
+        if self.unreachable is not None:
+            text += f"  !unreachable (code {self.unreachable})"
+        return text
+
+def traceroute(destIp, maxHops=MAX_HOPS, probes=PROBES, timeout=TIMEOUT, rate=RATE):
+    """Probe every TTL from 1 to maxHops concurrently and return the list of Hops up to the destination."""
+    if not 1 <= maxHops <= 255:
+        raise ValueError("maxHops must be between 1 and 255")
+    if probes < 1 or maxHops * probes > 0xFFFF:
+        raise ValueError("probes must be at least 1, and maxHops * probes at most 65535 (16-bit sequence numbers)")
+    try:
+        icmpSocket = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+    except PermissionError:
+        print("Permission denied: You need to run this as root or with administrative privileges.")
+        sys.exit(1)
+    icmpSocket.setblocking(False)
+
+    ident = os.getpid() & 0xFFFF
+    hops = [Hop(ttl) for ttl in range(1, maxHops + 1)]
+    outstanding = {}        # sequence number -> (Hop, send time in ns)
+    gap = int(1e9 / rate) if rate else 0
+    total = maxHops * probes
+    sent = 0
+    nextSend = time.perf_counter_ns()
+    deadline = None         # Set once the last probe is out
+    reachedAt = None        # Lowest TTL at which the destination answered
+
+    try:
+        while True:
+            now = time.perf_counter_ns()
+
+            # Send probes round-robin over the TTLs (every hop gets its first probe before any gets a
+            # second), skipping TTLs already known to be past the destination
+            while sent < total and nextSend <= now:
+                probe, index = divmod(sent, maxHops)
+                hop = hops[index]
+                sent += 1
+                if reachedAt is not None and hop.ttl > reachedAt:
+                    continue
+                seq = index * probes + probe + 1
+                icmpSocket.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, hop.ttl)
+                try:
+                    icmpSocket.sendto(createProbe(ident, seq), (destIp, 1))
+                except OSError as e:
+                    print(f"Failed to send probe with TTL {hop.ttl}: {e}")
+                    continue
+                outstanding[seq] = (hop, time.perf_counter_ns())
+                hop.sent += 1
+                nextSend = max(nextSend + gap, now) if gap else now
+            if sent == total and deadline is None:
+                deadline = time.perf_counter_ns() + int(timeout * 1e9)
+
+            # Done once every probe that matters has been answered, or the wait is over
+            if deadline is not None:
+                pending = [hop for hop, _ in outstanding.values() if reachedAt is None or hop.ttl <= reachedAt]
+                if not pending or now >= deadline:
+                    break
+
+            wakeUp = nextSend if sent < total else deadline
+            ready, _, _ = select.select([icmpSocket], [], [], max(0, wakeUp - now) / 1e9)
+            if not ready:
+                continue
+
+            # Drain the socket, matching each reply to its probe by sequence number
+            while True:
+                try:
+                    packet, addr = icmpSocket.recvfrom(2048)
+                except BlockingIOError:
+                    break
+                arrived = time.perf_counter_ns()
+                icmp = packet[(packet[0] & 0x0F) * 4:]     # Skip the IP header (IHL words)
+                if len(icmp) < ICMP_HEADER_SIZE:
+                    continue
+                icmpType, code = icmp[0], icmp[1]
+                if icmpType == ICMP_ECHO_REPLY:
+                    key = struct.unpack("!HH", icmp[4:8])
+                elif icmpType in (ICMP_TIME_EXCEEDED, ICMP_DEST_UNREACHABLE):
+                    key = quotedProbe(icmp)
+                else:
+                    continue
+                if key is None or key[0] != ident or key[1] not in outstanding:
+                    continue
+                hop, sentAt = outstanding.pop(key[1])
+                hop.rtts.append((arrived - sentAt) / 1e6)
+                if addr[0] not in hop.addresses:
+                    hop.addresses.append(addr[0])
+                if icmpType != ICMP_TIME_EXCEEDED:
+                    hop.reached = True
+                    if icmpType == ICMP_DEST_UNREACHABLE:
+                        hop.unreachable = code
+                    if reachedAt is None or hop.ttl < reachedAt:
+                        reachedAt = hop.ttl
+    finally:
+        icmpSocket.close()
+    return hops[:reachedAt] if reachedAt is not None else hops
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ICMP traceroute that probes all TTLs in parallel")
+    parser.add_argument("host", help="destination host name or address")
+    parser.add_argument("--max-hops", type=int, default=MAX_HOPS, help="highest TTL to probe")
+    parser.add_argument("--probes", type=int, default=PROBES, help="probes per hop")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds to wait after the last probe")
+    parser.add_argument("--rate", type=float, default=RATE, help="probes per second")
+    args = parser.parse_args()
+    if not 1 <= args.max_hops <= 255:
+        parser.error("--max-hops must be between 1 and 255")
+    if args.probes < 1:
+        parser.error("--probes must be at least 1")
+    if args.max_hops * args.probes > 0xFFFF:
+        parser.error(f"--max-hops x --probes must be at most 65535 (one 16-bit sequence number per probe), "
+                     f"not {args.max_hops * args.probes}")
+
+    try:
+        destIp = shared_resolver().gethostbyname(args.host)
+    except (socket.gaierror, socket.timeout):
+        print(f"Could not resolve host: {args.host}")
+        sys.exit(1)
+
+    print(f"traceroute to {args.host} ({destIp}), {args.max_hops} hops max, {args.probes} probes per hop")
+    started = time.perf_counter()
+    hops = traceroute(destIp, args.max_hops, args.probes, args.timeout, args.rate)
+    for hop in hops:
+        print(hop.line())
+    if not hops or not hops[-1].reached:
+        print(f"Destination not reached within {args.max_hops} hops")
+    print(f"Trace finished in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,142 @@
+"""
+Program Name: InternetChecksum.py
+Description: This module implements the Internet checksum (RFC 1071) used by the ICMP tools in this
+             directory. It works on bytes, bytearray or memoryview objects of any length, sums the
+             16-bit words in bulk instead of one Python loop iteration per word, and can update an
+             existing checksum when a header field is rewritten without re-reading the packet
+             (RFC 1624).
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. Compute the checksum of a packet built with its checksum field set to zero, and pack it in
+       network byte order:
+           value = checksum(header + payload)
+           header = struct.pack("!BBHHH", type, code, value, ident, seq)
+    2. After changing one 16-bit field (e.g. the sequence number) in a packet whose checksum is
+       `value`, get the new checksum without summing the payload again:
+           value = update(value, struct.pack("!H", oldSeq), struct.pack("!H", newSeq))
+    3. Run this module directly to compare the implementations across payload sizes:
+           python InternetChecksum.py [--sizes 64,1500,65507]
+
+Requirements:
+    - Python 3.x
+    - The `array`, `sys` and `timeit` libraries.
+    - NumPy is used when it is installed; it is not required.
+
+Notes:
+    - Checksums are returned as integers in host form, to be packed with "!H" (or with "H" after
+      socket.htons). A valid packet, including its checksum field, sums to 0 (see `verify`).
+    - Odd-length data is treated as if padded with one zero byte, as RFC 1071 requires.
+    - The default implementation reads the whole buffer as one big-endian integer and reduces it
+      modulo 0xFFFF: since 2**16 = 1 (mod 0xFFFF), that is exactly the one's complement sum of the
+      words, and CPython does both steps in C.
+"""
+
+import sys
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# One's complement sums: each returns the 16-bit end-around-carry sum of the big-endian words of data
+
+def _sum_reference(data):
+    # Word-by-word loop, kept as the readable reference and for the benchmark
+    total = 0
+    length = len(data) - len(data) % 2
+    for i in range(0, length, 2):
+        total += (data[i] << 8) | data[i + 1]
+    if length < len(data):
+        total += data[length] << 8      # Odd trailing byte, zero padded
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return total
+
+def _sum_bigint(data):
+    if not data:
+        return 0
+    if len(data) % 2:
+        value = int.from_bytes(data, "big") << 8    # Zero pad the odd trailing byte
+    else:
+        value = int.from_bytes(data, "big")
+    total = value % 0xFFFF
+    # A non-zero sum congruent to 0 is 0xFFFF ("negative zero") in one's complement arithmetic
+    return 0xFFFF if total == 0 and value else total
+
+def _sum_array(data):
+    words = array.array("H")
+    length = len(data) - len(data) % 2
+    words.frombytes(memoryview(data)[:length])
+    if sys.byteorder == "little":
+        words.byteswap()
+    total = sum(words)
+    if length < len(data):
+        total += data[length] << 8
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return total
+
+def _sum_numpy(data):
+    length = len(data) - len(data) % 2
+    total = int(numpy.frombuffer(data, dtype=">u2", count=length // 2).sum(dtype=numpy.uint64))
+    if length < len(data):
+        total += data[length] << 8
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return total
+
+IMPLEMENTATIONS = {"bigint": _sum_bigint, "array": _sum_array, "reference": _sum_reference}
+if numpy is not None:
+    IMPLEMENTATIONS["numpy"] = _sum_numpy
+
+_sum = _sum_bigint
+
+def checksum(data):
+    """Return the Internet checksum of data (bytes-like) as an integer to pack in network order."""
+    return ~_sum(data) & 0xFFFF
+
+def verify(data):
+    """True if data, checksum field included, has a valid Internet checksum."""
+    return _sum(data) in (0, 0xFFFF)
+
+def update(old_checksum, old, new):
+    """Return the checksum after the bytes `old` of a packet were replaced by `new` (RFC 1624, eqn. 3).
+
+    old and new must have the same even length and start at an even offset in the packet.
+    """
+    if len(old) != len(new) or len(old) % 2:
+        raise ValueError("old and new must be the same even number of bytes")
+    # HC' = ~(~HC + ~m + m'); one's complement negation distributes over the sum of the words
+    total = (~old_checksum & 0xFFFF) + (~_sum(old) & 0xFFFF) + _sum(new)
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+def benchmark(sizes=(20, 64, 576, 1500, 9000, 65507), seconds=0.2):
+    import os
+    import timeit
+    names = list(IMPLEMENTATIONS)
+    print(f"{'bytes':>8} " + " ".join(f"{name + ' (us)':>16}" for name in names))
+    for size in sizes:
+        data = os.urandom(size)
+        expected = _sum_reference(data)
+        row = []
+        for name in names:
+            function = IMPLEMENTATIONS[name]
+            assert function(data) == expected, name
+            timer = timeit.Timer(lambda: function(data))
+            loops, elapsed = timer.autorange()
+            loops = max(loops, int(loops * seconds / max(elapsed, 1e-9)))
+            row.append(min(timer.repeat(3, loops)) / loops * 1e6)
+        print(f"{size:>8} " + " ".join(f"{value:>16.2f}" for value in row))
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the Internet checksum implementations")
+    parser.add_argument("--sizes", default="20,64,576,1500,9000,65507", help="comma-separated data sizes in bytes")
+    args = parser.parse_args()
+    benchmark([int(size) for size in args.sizes.split(",")])
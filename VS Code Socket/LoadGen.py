@@ -0,0 +1,298 @@
+"""
+Program Name: LoadGen.py
+Description: This module implements the load generator behind the --benchmark mode of TCPClient.py and
+             UDPClient.py. It drives the echo/uppercase servers in this directory with many concurrent
+             connections (TCP) or flows (UDP), either closed-loop (each one sends its next request as
+             soon as the previous reply is in) or at a fixed total request rate, and reports throughput
+             and latency percentiles from an HDR-style histogram.
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. From the client programs:
+           python TCPClient.py --benchmark --host 127.0.0.1 --connections 16 --duration 10 --sizes 64,4096
+           python UDPClient.py --benchmark --host 127.0.0.1 --connections 8 --rate 20000 --sizes 512
+    2. From Python:
+           result = run_benchmark("tcp", "127.0.0.1", 12000, connections=16, duration=10.0, size=64)
+           print_result(result)
+
+Requirements:
+    - Python 3.x
+    - The `socket`, `threading`, `time`, `math` and `json` libraries.
+
+Notes:
+    - Latencies are recorded in nanoseconds (time.perf_counter_ns) in a log-linear histogram with
+      2048 sub-buckets per power of two, so every percentile is within 0.05% of the true value,
+      whatever the range.
+    - In fixed-rate mode each connection has a send schedule, and latency is measured from when a
+      request was due rather than when it was actually sent. A stalled server therefore shows up in
+      the tail percentiles instead of silently lowering the offered load (coordinated omission).
+    - A UDP request that gets no reply within --timeout seconds counts as lost, not as a latency sample.
+      Each datagram is "PING" and a 10-digit sequence number followed by the payload (payloads under
+      14 bytes grow to 14). UDPServer.py echoes it uppercased, which leaves it unchanged, and
+      ServerPinger.py answers "PONG" plus everything after "PING", so in both replies the number
+      sits at bytes 4-13. Only the reply carrying the current number completes a request. A late
+      reply to an earlier, already lost request is counted as stale and discarded, so it cannot be
+      mistaken for the current reply and give a too-short latency.
+    - The servers must send one reply per request: TCP replies are read until as many bytes as were
+      sent have come back; a UDP reply must keep bytes 4-13 of the request (the sequence number).
+    - --json prints one machine-readable line per run for regression tracking.
+"""
+
+import json
+import math
+import socket
+import threading
+import time
+
+SUB_BUCKET_BITS = 11            # 2048 sub-buckets per power of two (about 3 significant digits)
+DEFAULT_DURATION = 10.0         # Seconds each run lasts
+DEFAULT_TIMEOUT = 1.0           # Seconds to wait for a reply before a request counts as lost
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+UDP_TAG = b"PING"               # Starts every UDP request, so ServerPinger echoes the rest after PONG
+SEQ_DIGITS = 10                 # Decimal digits of the sequence number that follows the tag
+SEQ_END = len(UDP_TAG) + SEQ_DIGITS
+
+class Histogram:
+    """Log-linear latency histogram in the style of HdrHistogram, for non-negative integer values."""
+
+    def __init__(self, sub_bucket_bits=SUB_BUCKET_BITS):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_buckets = 1 << sub_bucket_bits
+        self.counts = {}                # bucket index -> count (sparse; few buckets are used)
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self.sum = 0
+
+    def _index(self, value):
+        # Values below 2 * sub_buckets map one to one; above that, each power of two is cut into
+        # sub_buckets equal slices
+        magnitude = max(0, value.bit_length() - self.sub_bucket_bits - 1)
+        return (magnitude << self.sub_bucket_bits) + (value >> magnitude)
+
+    def _value_at(self, index):
+        # Highest value that maps to this bucket
+        if index < 2 * self.sub_buckets:
+            return index
+        magnitude = (index >> self.sub_bucket_bits) - 1
+        sub = index - (magnitude << self.sub_bucket_bits)
+        return ((sub + 1) << magnitude) - 1
+
+    def record(self, value):
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent):
+        if not self.total:
+            return 0
+        rank = max(1, math.ceil(self.total * percent / 100.0))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._value_at(index), self.max)
+        return self.max
+
+    def mean(self):
+        return self.sum / self.total if self.total else 0.0
+
+class Flow:
+    """One benchmark connection (TCP) or socket (UDP) and its results."""
+
+    def __init__(self):
+        self.histogram = Histogram()
+        self.completed = 0
+        self.lost = 0
+        self.stale = 0                  # UDP replies to earlier requests, discarded
+        self.errors = 0
+        self.bytes = 0
+
+# Pacing: in closed-loop mode (interval None) the next request goes out as soon as the reply is in;
+# otherwise requests are due every `interval` ns and latency counts from the due time
+def _sleep_until(moment):
+    delay = moment - time.perf_counter_ns()
+    if delay > 0:
+        time.sleep(delay / 1e9)
+
+def _pace(next_due, interval):
+    now = time.perf_counter_ns()
+    if interval is None:
+        return now
+    if next_due > now:
+        time.sleep((next_due - now) / 1e9)
+    return next_due
+
+def _tcp_flow(flow, host, port, payload, interval, start, deadline, timeout):
+    try:
+        sock = socket.create_connection((host, port), timeout=timeout)
+    except OSError:
+        flow.errors += 1
+        return
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    buffer = bytearray(max(len(payload), 65536))
+    view = memoryview(buffer)
+    next_due = start
+    _sleep_until(start)
+    try:
+        while True:
+            sent_at = _pace(next_due, interval)
+            if sent_at >= deadline:
+                break
+            sock.sendall(payload)
+            received = 0
+            while received < len(payload):
+                count = sock.recv_into(view[:len(payload) - received])
+                if count == 0:
+                    raise ConnectionError("server closed the connection")
+                received += count
+            flow.histogram.record(time.perf_counter_ns() - sent_at)
+            flow.completed += 1
+            flow.bytes += len(payload)
+            if interval is not None:
+                next_due += interval
+    except (ConnectionError, OSError):
+        flow.errors += 1
+    finally:
+        sock.close()
+
+# Wait up to `timeout` seconds for the reply carrying sequence number `seq`; replies to earlier
+# requests that arrive first are counted and discarded. Raises socket.timeout if it does not come.
+def _udp_reply(flow, sock, buffer, seq, timeout):
+    give_up = time.perf_counter_ns() + int(timeout * 1e9)
+    sock.settimeout(timeout)
+    while True:
+        received = sock.recv_into(buffer)
+        if received >= SEQ_END and buffer[len(UDP_TAG):SEQ_END] == seq:
+            return
+        flow.stale += 1
+        remaining = give_up - time.perf_counter_ns()
+        if remaining <= 0:
+            raise socket.timeout("no reply to the current request")
+        sock.settimeout(remaining / 1e9)
+
+def _udp_flow(flow, host, port, payload, interval, start, deadline, timeout):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.connect((host, port))      # Connected UDP: the kernel filters replies from other peers
+    sock.settimeout(timeout)
+    buffer = bytearray(65536)
+    body = payload[SEQ_END:]
+    seq = 0
+    next_due = start
+    _sleep_until(start)
+    try:
+        while True:
+            sent_at = _pace(next_due, interval)
+            if sent_at >= deadline:
+                break
+            seq += 1
+            request = UDP_TAG + b"%0*d" % (SEQ_DIGITS, seq % 10 ** SEQ_DIGITS) + body
+            try:
+                sock.send(request)
+                _udp_reply(flow, sock, buffer, request[len(UDP_TAG):SEQ_END], timeout)
+            except socket.timeout:
+                flow.lost += 1
+            except ConnectionRefusedError:
+                flow.errors += 1
+                time.sleep(timeout)     # Nothing is listening; do not spin
+            else:
+                flow.histogram.record(time.perf_counter_ns() - sent_at)
+                flow.completed += 1
+                flow.bytes += len(request)
+            if interval is not None:
+                next_due += interval
+    finally:
+        sock.close()
+
+def run_benchmark(protocol, host, port, connections=1, duration=DEFAULT_DURATION, size=64, rate=None,
+                  timeout=DEFAULT_TIMEOUT):
+    """Run one benchmark and return a dict with throughput and latency results.
+
+    rate is the total requests per second over all connections, or None for closed-loop pacing.
+    """
+    target = _tcp_flow if protocol == "tcp" else _udp_flow
+    payload = (b"abcdefghijklmnopqrstuvwxyz" * (size // 26 + 1))[:size]
+    interval = None if not rate else round(1e9 * connections / rate)
+    flows = [Flow() for _ in range(connections)]
+    start = time.perf_counter_ns() + 50_000_000     # Give every thread time to connect first
+    deadline = start + int(duration * 1e9)
+    threads = []
+    for i, flow in enumerate(flows):
+        # Stagger the schedules so fixed-rate requests are spread evenly, not sent in bursts
+        offset = 0 if interval is None else interval * i // connections
+        thread = threading.Thread(target=target, args=(flow, host, port, payload, interval, start + offset,
+                                                       deadline, timeout), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    elapsed = max(1e-9, (min(time.perf_counter_ns(), deadline + int(timeout * 1e9)) - start) / 1e9)
+
+    histogram = Histogram()
+    for flow in flows:
+        histogram.merge(flow.histogram)
+    completed = sum(flow.completed for flow in flows)
+    return {
+        "protocol": protocol, "host": host, "port": port, "connections": connections, "size": size,
+        "rate": rate, "duration": round(elapsed, 3),
+        "completed": completed,
+        "lost": sum(flow.lost for flow in flows),
+        "stale": sum(flow.stale for flow in flows),
+        "errors": sum(flow.errors for flow in flows),
+        "requests_per_sec": round(completed / elapsed, 1),
+        "mb_per_sec": round(2 * sum(flow.bytes for flow in flows) / elapsed / 1e6, 3),   # Both directions
+        "latency_us": {
+            "min": round((histogram.min or 0) / 1000, 1),
+            "mean": round(histogram.mean() / 1000, 1),
+            **{f"p{percent:g}": round(histogram.percentile(percent) / 1000, 1) for percent in PERCENTILES},
+            "max": round(histogram.max / 1000, 1),
+        },
+    }
+
+def print_result(result, as_json=False):
+    if as_json:
+        print(json.dumps(result))
+        return
+    pacing = "closed loop" if not result["rate"] else f"{result['rate']:,.0f} req/s offered"
+    print(f"{result['protocol'].upper()} {result['host']}:{result['port']}  {result['connections']} connection(s), "
+          f"{result['size']} B payload, {pacing}, {result['duration']:.1f}s")
+    print(f"  {result['completed']:,} requests  {result['requests_per_sec']:,.0f} req/s  "
+          f"{result['mb_per_sec']:.2f} MB/s  lost {result['lost']}  stale {result['stale']}  errors {result['errors']}")
+    latency = result["latency_us"]
+    print("  latency (us): " + "  ".join(f"{name} {value:,.1f}" for name, value in latency.items()))
+
+def add_benchmark_arguments(parser, default_port):
+    """Add the --benchmark options shared by TCPClient.py and UDPClient.py to an ArgumentParser."""
+    parser.add_argument("--benchmark", action="store_true", help="run a load test instead of one interactive message")
+    parser.add_argument("--host", default="127.0.0.1", help="server to benchmark")
+    parser.add_argument("--port", type=int, default=default_port, help="server port")
+    parser.add_argument("--connections", type=int, default=1, help="concurrent connections / flows")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="total requests per second (default: closed loop, as fast as replies allow)")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="seconds per run")
+    parser.add_argument("--sizes", default="64", help="comma-separated payload sizes in bytes, one run each")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="seconds before a request is lost")
+    parser.add_argument("--json", action="store_true", help="print one JSON line per run")
+
+def run_from_args(protocol, args):
+    """Run one benchmark per payload size from parsed --benchmark arguments."""
+    for size in (int(value) for value in args.sizes.split(",")):
+        result = run_benchmark(protocol, args.host, args.port, args.connections, args.duration, size,
+                               args.rate, args.timeout)
+        print_result(result, args.json)
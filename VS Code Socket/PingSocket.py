@@ -0,0 +1,123 @@
+"""
+Program Name: PingSocket.py
+Description: This module picks the socket ICMPPingerfinal.py sends its Echo Requests through. On
+             Linux it prefers an unprivileged ICMP datagram ("ping") socket, which needs no root,
+             and falls back to a raw socket otherwise. Where the kernel supports it, every received
+             reply carries a kernel receive timestamp (SO_TIMESTAMPNS, read with recvmsg), so the
+             RTT does not include the time Python took to wake up and read the packet.
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. Open a socket ("auto" tries the datagram backend first, then raw):
+           pingSocket = PingSocket("auto")
+    2. Send a packet and keep the send time, then read replies with their arrival times:
+           sentAt = pingSocket.send(packet, (destIp, 1))
+           icmp, addr, arrived = pingSocket.receive()
+           rtt = (arrived - sentAt) / 1e6     # milliseconds
+    3. The socket can be passed to select() directly.
+
+Requirements:
+    - Python 3.x
+    - The `socket`, `struct`, `sys` and `time` libraries.
+    - For the datagram backend: Linux with the caller's group in net.ipv4.ping_group_range, e.g.
+          sysctl -w net.ipv4.ping_group_range="0 2147483647"
+    - For the raw backend: administrative/root privileges.
+
+Notes:
+    - With the datagram backend the kernel chooses the Echo identifier (the socket's "port") and
+      fills in the checksum, and it only delivers replies to this socket's own requests. Received
+      packets start at the ICMP header on both backends (the raw backend strips the IP header).
+    - Kernel timestamps are on the wall clock (CLOCK_REALTIME), so when they are enabled send and
+      receive times both come from time.time_ns(); otherwise both come from time.perf_counter_ns().
+      Either way, subtract a send time from a receive time of the same socket.
+    - Python does not export SO_TIMESTAMPNS; the Linux value (35, also the control message type)
+      is used when the constant is missing.
+"""
+
+import socket
+import struct
+import sys
+import time
+
+BACKENDS = {"auto": ("dgram", "raw"), "dgram": ("dgram",), "raw": ("raw",)}
+SO_TIMESTAMPNS = getattr(socket, "SO_TIMESTAMPNS", 35 if sys.platform.startswith("linux") else None)
+TIMESPEC = struct.Struct("@ll")     # struct timespec: seconds and nanoseconds
+RECV_SIZE = 2048
+
+class PingSocket:
+    """An ICMP socket of the best available kind, with kernel receive timestamps when possible."""
+
+    def __init__(self, backend="auto", timestamps=True):
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown backend {backend!r}; use one of {', '.join(BACKENDS)}")
+        error = None
+        for kind in BACKENDS[backend]:
+            socketType = socket.SOCK_DGRAM if kind == "dgram" else socket.SOCK_RAW
+            try:
+                self.sock = socket.socket(socket.AF_INET, socketType, socket.IPPROTO_ICMP)
+            except OSError as e:    # EACCES/EPERM without privileges; EPROTONOSUPPORT off Linux
+                error = e
+                continue
+            self.kind = kind
+            break
+        else:
+            raise PermissionError(f"no ICMP socket available ({backend} backend): {error}")
+
+        if self.kind == "dgram":
+            self.sock.bind(("0.0.0.0", 0))      # Makes the kernel choose our Echo identifier now
+        self.timestamps = False
+        if timestamps and SO_TIMESTAMPNS is not None:
+            try:
+                self.sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+                self.timestamps = True
+            except OSError:
+                pass
+        self.clock = time.time_ns if self.timestamps else time.perf_counter_ns
+
+    @property
+    def ident(self):
+        """The Echo identifier the kernel puts in our requests (datagram backend), or None."""
+        return self.sock.getsockname()[1] if self.kind == "dgram" else None
+
+    def describe(self):
+        return (f"{'unprivileged datagram' if self.kind == 'dgram' else 'raw'} ICMP socket, "
+                f"{'kernel' if self.timestamps else 'user-space'} receive timestamps")
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def send(self, packet, address):
+        """Send packet to address and return the send time on this socket's clock."""
+        # Read the clock first: on loopback and veth the reply can be timestamped before sendto returns
+        sentAt = self.clock()
+        self.sock.sendto(packet, address)
+        return sentAt
+
+    def receive(self, size=RECV_SIZE):
+        """Read one packet; returns (ICMP message, source address, arrival time on this socket's clock)."""
+        if self.timestamps:
+            packet, ancillary, flags, addr = self.sock.recvmsg(size, socket.CMSG_SPACE(TIMESPEC.size))
+            arrived = None
+            for level, kind, data in ancillary:
+                if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS and len(data) >= TIMESPEC.size:
+                    seconds, nanoseconds = TIMESPEC.unpack_from(data)
+                    arrived = seconds * 1_000_000_000 + nanoseconds
+            if arrived is None:
+                arrived = self.clock()
+        else:
+            packet, addr = self.sock.recvfrom(size)
+            arrived = self.clock()
+        if self.kind == "raw":
+            packet = packet[(packet[0] & 0x0F) * 4:]   # Skip the IP header (IHL words)
+        return packet, addr, arrived
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,208 @@
+"""
+Program Name: Prefork.py
+Description: This module implements a prefork supervisor shared by WebServer.py and WebProxy.py.
+             The supervisor forks N worker processes that each serve the same listening port, so the
+             servers scale across CPU cores instead of being capped at one core by the GIL. Crashed
+             workers are restarted, SIGHUP gracefully replaces every worker, and SIGTERM/SIGINT
+             drain the workers and exit.
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. Give the supervisor a function that creates the listening socket and a function that serves
+       it until a stop event is set:
+           supervisor = Supervisor(create_socket, serve, processes=4)
+           supervisor.run()
+    2. `create_socket(reuse_port)` must return a bound, listening socket. `serve(sock, stop_event)`
+       must return once `stop_event` is set and in-flight work has drained.
+    3. Signals sent to the supervisor:
+           SIGHUP           start a new set of workers, then drain and retire the old ones
+           SIGTERM/SIGINT   drain all workers and exit
+
+Requirements:
+    - Python 3.x on a Unix-like system (uses `os.fork`).
+    - The `os`, `signal`, `socket` and `threading` libraries.
+
+Notes:
+    - Where the kernel supports SO_REUSEPORT, every worker binds its own socket and the kernel
+      load-balances new connections between them. Otherwise the supervisor binds one socket and the
+      workers inherit it across fork.
+    - A worker that dies unexpectedly is replaced; restarts of a crash-looping slot are spaced out
+      by RESTART_BACKOFF seconds so a broken worker cannot spin the CPU.
+    - Workers still running DRAIN_TIMEOUT + KILL_GRACE seconds after being told to stop are killed.
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import threading
+import traceback
+
+DRAIN_TIMEOUT = 10.0    # Seconds a worker may spend finishing in-flight requests after SIGTERM
+KILL_GRACE = 5.0        # Extra seconds before a worker that ignored SIGTERM is killed
+RESTART_BACKOFF = 1.0   # Minimum seconds between restarts of a worker that keeps crashing
+POLL_INTERVAL = 0.2     # Seconds between checks for exited workers
+
+# True if this platform can give each worker its own socket on the same port
+def reuse_port_supported():
+    return hasattr(socket, "SO_REUSEPORT") and hasattr(os, "fork")
+
+# Create, bind and listen on a TCP socket, optionally with SO_REUSEPORT
+def create_listener(host, port, backlog, reuse_port=False):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+class Worker:
+    """Bookkeeping for one forked worker process."""
+
+    def __init__(self, pid, slot, generation):
+        self.pid = pid
+        self.slot = slot                # Position 0..N-1, reused when the worker is replaced
+        self.generation = generation    # Bumped on every SIGHUP reload
+        self.started = time.monotonic()
+        self.stopping_since = None      # When SIGTERM was sent, if it was
+
+class Supervisor:
+    """Forks worker processes that serve one listening port and keeps them running."""
+
+    def __init__(self, create_socket, serve, processes, reuse_port=None, drain_timeout=DRAIN_TIMEOUT):
+        self.create_socket = create_socket
+        self.serve = serve
+        self.processes = max(1, processes)
+        self.reuse_port = reuse_port_supported() if reuse_port is None else reuse_port
+        self.drain_timeout = drain_timeout
+        self.shared_socket = None       # Inherited by workers when SO_REUSEPORT is not used
+        self.workers = {}               # pid -> Worker
+        self.generation = 0
+        self.last_crash = {}            # slot -> time of the last unexpected exit
+        self.restarts = 0
+        self.reload_requested = False
+        self.shutdown_requested = False
+
+    def run(self):
+        if not self.reuse_port:
+            self.shared_socket = self.create_socket(False)
+        signal.signal(signal.SIGHUP, self._on_reload)
+        signal.signal(signal.SIGTERM, self._on_shutdown)
+        signal.signal(signal.SIGINT, self._on_shutdown)
+
+        mode = "SO_REUSEPORT" if self.reuse_port else "inherited socket"
+        print(f"Supervisor {os.getpid()} starting {self.processes} worker process(es) ({mode})")
+        for slot in range(self.processes):
+            self._spawn(slot)
+
+        try:
+            while True:
+                if self.shutdown_requested:
+                    self._shutdown()
+                    return
+                if self.reload_requested:
+                    self.reload_requested = False
+                    self._reload()
+                self._reap()
+                self._kill_stragglers()
+                time.sleep(POLL_INTERVAL)
+        finally:
+            if self.shared_socket is not None:
+                self.shared_socket.close()
+
+    def _on_reload(self, signum, frame):
+        self.reload_requested = True
+
+    def _on_shutdown(self, signum, frame):
+        self.shutdown_requested = True
+
+    def _spawn(self, slot):
+        pid = os.fork()
+        if pid == 0:
+            self._worker_main()     # Never returns
+        self.workers[pid] = Worker(pid, slot, self.generation)
+
+    def _worker_main(self):
+        # Runs in the child: serve until told to stop, then exit without running parent cleanup
+        status = 0
+        try:
+            stop_event = threading.Event()
+
+            def stop(signum, frame):
+                stop_event.set()
+
+            signal.signal(signal.SIGTERM, stop)
+            signal.signal(signal.SIGINT, stop)
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            sock = self.shared_socket if self.shared_socket is not None else self.create_socket(True)
+            self.serve(sock, stop_event)
+        except BaseException:
+            traceback.print_exc()
+            status = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(status)
+
+    def _reap(self):
+        # Collect exited workers and replace the ones that were not asked to stop
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None or worker.stopping_since is not None or self.shutdown_requested:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            print(f"Worker {pid} (slot {worker.slot}) exited unexpectedly with status {code}; restarting")
+            now = time.monotonic()
+            last = self.last_crash.get(worker.slot)
+            if last is not None and now - last < RESTART_BACKOFF:
+                time.sleep(RESTART_BACKOFF - (now - last))
+            self.last_crash[worker.slot] = time.monotonic()
+            self.restarts += 1
+            self._spawn(worker.slot)
+
+    def _stop(self, worker):
+        if worker.stopping_since is None:
+            worker.stopping_since = time.monotonic()
+            try:
+                os.kill(worker.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _kill_stragglers(self):
+        deadline = time.monotonic() - self.drain_timeout - KILL_GRACE
+        for worker in list(self.workers.values()):
+            if worker.stopping_since is not None and worker.stopping_since < deadline:
+                try:
+                    os.kill(worker.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def _reload(self):
+        # Bring up the new generation first so the port never goes unserved, then drain the old one
+        old = list(self.workers.values())
+        self.generation += 1
+        print(f"Reloading: starting generation {self.generation}, draining {len(old)} old worker(s)")
+        for slot in range(self.processes):
+            self._spawn(slot)
+        for worker in old:
+            self._stop(worker)
+
+    def _shutdown(self):
+        print("Supervisor shutting down; draining workers...")
+        for worker in list(self.workers.values()):
+            self._stop(worker)
+        while self.workers:
+            self._reap()
+            self._kill_stragglers()
+            time.sleep(POLL_INTERVAL)
+        print(f"All workers exited ({self.restarts} restart(s) during this run)")
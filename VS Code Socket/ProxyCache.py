@@ -0,0 +1,520 @@
+"""
+Program Name: ProxyCache.py
+Description: This module implements the HTTP cache used by WebProxy.py. Responses are stored according
+             to their Cache-Control, Expires and Vary headers in a two-tier store: a byte-bounded
+             in-memory LRU of response bodies in front of an optional on-disk tier of content-addressed
+             body files plus a JSON index that survives restarts. Stale entries can be served while
+             they are revalidated in the background (stale-while-revalidate, RFC 5861).
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. Create the cache once per proxy process:
+           cache = ProxyCache(directory="proxy-cache", memory_bytes=64 * 1024 * 1024)
+    2. Before forwarding a GET, call `lookup(request, url)`; it returns the matching entry and one of
+       FRESH, STALE_WHILE_REVALIDATE, STALE or MISS.
+    3. After relaying a response, call `store(request, url, response, body)`; after a 304 from the
+       origin, call `refresh(entry, response)`.
+    4. Call `close()` on shutdown to flush the disk index.
+
+Requirements:
+    - Python 3.x
+    - The `os`, `json`, `hashlib`, `threading` and `email.utils` libraries.
+
+Notes:
+    - This is a shared cache: `private` and `no-store` responses, responses to requests carrying
+      Authorization (unless marked public, s-maxage or must-revalidate) and `Vary: *` responses are
+      never stored.
+    - Freshness uses s-maxage, then max-age, then Expires - Date, then the usual 10% of the time since
+      Last-Modified (capped at one day). Age follows RFC 9111 section 4.2.3.
+    - Bodies are stored exactly as they were relayed (chunk framing included) together with the
+      original response head, so a hit replays the origin's bytes with an Age header added.
+    - Disk objects are named by the SHA-256 of the body, so identical bodies are stored once. The
+      index is rewritten atomically; when several processes share the directory, each flush merges
+      with the index on disk under an flock.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+try:
+    import fcntl
+except ImportError:     # Not available on Windows; index merges are then unlocked
+    fcntl = None
+
+MEMORY_BYTES = 64 * 1024 * 1024     # Bodies kept in RAM
+DISK_BYTES = 1024 * 1024 * 1024     # Bodies kept on disk (when a directory is configured)
+MAX_OBJECT_SIZE = 16 * 1024 * 1024  # Larger responses are relayed but never stored
+HEURISTIC_FRACTION = 0.1            # Share of (Date - Last-Modified) used as heuristic lifetime
+HEURISTIC_MAX = 86400.0             # Cap on heuristic freshness, in seconds
+INDEX_FLUSH_INTERVAL = 5.0          # Seconds between index writes while entries change
+
+# Lookup results
+FRESH = "fresh"
+STALE_WHILE_REVALIDATE = "stale-while-revalidate"
+STALE = "stale"
+MISS = "miss"
+
+# Statuses that may be cached without explicit freshness information (RFC 9110 section 15.1)
+HEURISTIC_STATUSES = {200, 203, 204, 206, 300, 301, 308, 404, 405, 410, 414, 501}
+# Header lines never replayed from the cache
+HOP_BY_HOP = {b"connection", b"keep-alive", b"proxy-connection", b"proxy-authenticate", b"te",
+              b"trailer", b"upgrade", b"age"}
+
+# Parse a Cache-Control header into {directive: value or True}
+def parse_cache_control(value):
+    directives = {}
+    for item in (value or "").split(","):
+        name, sep, argument = item.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip().strip('"') if sep else True
+    return directives
+
+# Read an integer number of seconds from a directive, or None
+def directive_seconds(directives, name):
+    value = directives.get(name)
+    if value is None or value is True:
+        return None
+    try:
+        return max(0, int(value))
+    except ValueError:
+        return None
+
+# Parse an HTTP date into a POSIX timestamp, or None if it is malformed
+def http_date(value):
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+class CacheEntry:
+    """Metadata of one stored response (one URL + one set of Vary header values)."""
+
+    def __init__(self, key, url, vary, head, digest, size, status, etag, last_modified,
+                 response_time, initial_age, lifetime, stale_while_revalidate, must_revalidate):
+        self.key = key
+        self.url = url
+        self.vary = vary                    # {lower-cased request header name: value}
+        self.head = head                    # Raw response head bytes
+        self.digest = digest                # SHA-256 of the body; names the disk object
+        self.size = size
+        self.status = status
+        self.etag = etag
+        self.last_modified = last_modified
+        self.response_time = response_time  # When the response (or last 304) arrived
+        self.initial_age = initial_age      # corrected_initial_age of RFC 9111 section 4.2.3
+        self.lifetime = lifetime            # Freshness lifetime in seconds
+        self.stale_while_revalidate = stale_while_revalidate
+        self.must_revalidate = must_revalidate
+        self.last_access = time.time()
+        self.revalidating = False
+
+    def age(self, now):
+        return self.initial_age + max(0.0, now - self.response_time)
+
+    def to_json(self):
+        data = {name: getattr(self, name) for name in (
+            "url", "vary", "digest", "size", "status", "etag", "last_modified", "response_time",
+            "initial_age", "lifetime", "stale_while_revalidate", "must_revalidate", "last_access")}
+        data["head"] = self.head.decode('iso-8859-1')
+        return data
+
+    @classmethod
+    def from_json(cls, key, data):
+        entry = cls(key, data["url"], data["vary"], data["head"].encode('iso-8859-1'), data["digest"],
+                    data["size"], data["status"], data["etag"], data["last_modified"],
+                    data["response_time"], data["initial_age"], data["lifetime"],
+                    data["stale_while_revalidate"], data["must_revalidate"])
+        entry.last_access = data.get("last_access", entry.response_time)
+        return entry
+
+class ProxyCache:
+    """Shared HTTP cache with a memory tier and an optional persistent disk tier."""
+
+    def __init__(self, directory=None, memory_bytes=MEMORY_BYTES, disk_bytes=DISK_BYTES,
+                 max_object_size=MAX_OBJECT_SIZE, default_stale_while_revalidate=0):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.max_object_size = max_object_size
+        self.default_stale_while_revalidate = default_stale_while_revalidate
+        self.entries = OrderedDict()        # key -> CacheEntry, least recently used first
+        self.by_url = {}                    # url -> set of keys (one per Vary variant)
+        self.bodies = OrderedDict()         # digest -> body bytes held in memory, LRU order
+        self.memory_used = 0
+        self.disk_used = 0
+        self.refs = {}                      # digest -> number of entries using that body
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.last_flush = time.monotonic()
+        self.counters = {"hits": 0, "stale_hits": 0, "revalidated": 0, "misses": 0, "stores": 0,
+                         "memory_evictions": 0, "disk_evictions": 0}
+        if directory is not None:
+            os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+            self._load_index()
+
+    # Lookup
+
+    def lookup(self, request, url):
+        """Find the stored response matching this request; returns (entry, state)."""
+        request_cc = parse_cache_control(request.headers.get("cache-control"))
+        if "cache-control" not in request.headers and request.headers.get("pragma", "").lower() == "no-cache":
+            request_cc["no-cache"] = True   # HTTP/1.0 clients
+        if "no-store" in request_cc:
+            with self.lock:
+                self.counters["misses"] += 1
+            return None, MISS
+        now = time.time()
+        with self.lock:
+            entry = self._match(request, url)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None, MISS
+            self.entries.move_to_end(entry.key)
+            entry.last_access = now
+            age = entry.age(now)
+            max_age = directive_seconds(request_cc, "max-age")
+            fresh = age < entry.lifetime and (max_age is None or age <= max_age)
+            if "no-cache" in request_cc:
+                fresh = False
+            if fresh:
+                self.counters["hits"] += 1
+                return entry, FRESH
+            if (not entry.must_revalidate and "no-cache" not in request_cc
+                    and age < entry.lifetime + entry.stale_while_revalidate):
+                self.counters["stale_hits"] += 1
+                return entry, STALE_WHILE_REVALIDATE
+            return entry, STALE
+
+    def _match(self, request, url):
+        for key in self.by_url.get(url, ()):
+            entry = self.entries[key]
+            if all(request.headers.get(name, "") == value for name, value in entry.vary.items()):
+                return entry
+        return None
+
+    def read_body(self, entry):
+        """Return the stored body, or None if it has gone missing (the entry is then dropped)."""
+        with self.lock:
+            body = self.bodies.get(entry.digest)
+            if body is not None:
+                self.bodies.move_to_end(entry.digest)
+                return body
+        if self.directory is None:
+            return None
+        try:
+            with open(self._object_path(entry.digest), 'rb') as file:
+                body = file.read()
+        except OSError:
+            body = None
+        with self.lock:
+            if body is None or len(body) != entry.size:
+                if self.entries.get(entry.key) is entry:
+                    self._remove(entry.key)
+                return None
+            self._remember_body(entry.digest, body)
+        return body
+
+    def replay_head(self, entry):
+        """Return the stored response head with hop-by-hop headers removed and Age added."""
+        lines = entry.head.rstrip(b"\r\n").split(b"\r\n")
+        kept = [lines[0]] + [line for line in lines[1:]
+                             if line.partition(b":")[0].strip().lower() not in HOP_BY_HOP]
+        kept.append(b"Age: %d" % int(entry.age(time.time())))
+        return b"\r\n".join(kept) + b"\r\n\r\n"
+
+    def conditional_headers(self, entry):
+        """Validators to send upstream when revalidating an entry.
+
+        A validator the entry lacks maps to None (drop the client's field): a 304 must be about
+        the stored response, not about whatever copy the client holds.
+        """
+        return {"If-None-Match": entry.etag or None, "If-Modified-Since": entry.last_modified or None}
+
+    def begin_revalidation(self, entry):
+        """Claim the background revalidation of an entry; False if one is already running."""
+        with self.lock:
+            if entry.revalidating:
+                return False
+            entry.revalidating = True
+            return True
+
+    def end_revalidation(self, entry):
+        with self.lock:
+            entry.revalidating = False
+
+    # Storing
+
+    def storable(self, request, response):
+        """Decide whether a response to this request may be kept in a shared cache."""
+        # A 304 (e.g. to the client's own If-None-Match) or an interim 1xx is not a representation
+        # and must never be replayed as one; 304s only freshen existing entries through refresh()
+        if request.method != "GET" or response.status == 206 or response.status == 304 or response.status < 200:
+            return False
+        request_cc = parse_cache_control(request.headers.get("cache-control"))
+        response_cc = parse_cache_control(response.headers.get("cache-control"))
+        if "no-store" in request_cc or "no-store" in response_cc or "private" in response_cc:
+            return False
+        if response.headers.get("vary", "").strip() == "*":
+            return False
+        if "authorization" in request.headers and not (
+                "public" in response_cc or "s-maxage" in response_cc or "must-revalidate" in response_cc):
+            return False
+        return True
+
+    def store(self, request, url, response, body):
+        """Store a relayed response; returns the new entry, or None if it is not cacheable."""
+        if body is None or len(body) > self.max_object_size or not self.storable(request, response):
+            return None
+        now = time.time()
+        headers = response.headers
+        response_cc = parse_cache_control(headers.get("cache-control"))
+        date = http_date(headers.get("date")) or now
+        lifetime = self._lifetime(response, response_cc, date)
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        if lifetime <= 0 and not etag and not last_modified:
+            return None     # Could never be served or revalidated
+        try:
+            age_header = max(0, int(headers.get("age", "0")))
+        except ValueError:
+            age_header = 0
+        initial_age = max(max(0.0, now - date), float(age_header))
+
+        vary = {}
+        for name in headers.get("vary", "").split(","):
+            name = name.strip().lower()
+            if name:
+                vary[name] = request.headers.get(name, "")
+        key = url + "\n" + json.dumps(sorted(vary.items()))
+        swr = directive_seconds(response_cc, "stale-while-revalidate")
+        must_revalidate = "must-revalidate" in response_cc or "proxy-revalidate" in response_cc \
+            or "no-cache" in response_cc
+        digest = hashlib.sha256(body).hexdigest()
+        entry = CacheEntry(key, url, vary, bytes(response.head), digest, len(body), response.status,
+                           etag, last_modified, now, initial_age, lifetime,
+                           self.default_stale_while_revalidate if swr is None else swr, must_revalidate)
+
+        if self.directory is not None:
+            self._write_object(digest, body)
+        with self.lock:
+            # Reference the new body before the old entry lets go of its own, so re-storing an
+            # unchanged body (the same digest) never drops its refcount to 0 and unlinks the file
+            if self.directory is not None and self.refs.get(digest, 0) == 0 \
+                    and not os.path.exists(self._object_path(digest)):
+                self._write_object(digest, body)    # Removed by another store since we wrote it
+            self._add_ref(digest, len(body))
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = entry
+            self.by_url.setdefault(url, set()).add(key)
+            self._remember_body(digest, body)
+            self.counters["stores"] += 1
+            self._evict_disk()
+            self._mark_dirty()
+        return entry
+
+    def refresh(self, entry, response):
+        """Apply a 304 Not Modified from the origin: update headers and restart freshness."""
+        now = time.time()
+        headers = response.headers
+        response_cc = parse_cache_control(headers.get("cache-control") or self._stored_header(entry, b"cache-control"))
+        date = http_date(headers.get("date")) or now
+        with self.lock:
+            if "cache-control" in headers or "expires" in headers:
+                entry.lifetime = self._lifetime(response, response_cc, date)
+            entry.head = self._merge_head(entry.head, response.head)
+            entry.etag = headers.get("etag", entry.etag)
+            entry.last_modified = headers.get("last-modified", entry.last_modified)
+            entry.response_time = now
+            entry.initial_age = max(0.0, now - date)
+            self.counters["revalidated"] += 1
+            self._mark_dirty()
+
+    def invalidate(self, url):
+        """Drop every variant of a URL (after an unsafe method such as POST succeeded on it)."""
+        with self.lock:
+            for key in list(self.by_url.get(url, ())):
+                self._remove(key)
+            self._mark_dirty()
+
+    def _lifetime(self, response, response_cc, date):
+        if "no-cache" in response_cc:
+            return 0.0
+        for name in ("s-maxage", "max-age"):
+            seconds = directive_seconds(response_cc, name)
+            if seconds is not None:
+                return float(seconds)
+        if "expires" in response.headers:
+            expires = http_date(response.headers["expires"])
+            return max(0.0, expires - date) if expires is not None else 0.0
+        last_modified = http_date(response.headers.get("last-modified"))
+        if response.status in HEURISTIC_STATUSES and last_modified is not None:
+            return min(HEURISTIC_MAX, max(0.0, (date - last_modified) * HEURISTIC_FRACTION))
+        return 0.0
+
+    def _stored_header(self, entry, name):
+        for line in entry.head.split(b"\r\n")[1:]:
+            field, _, value = line.partition(b":")
+            if field.strip().lower() == name:
+                return value.strip().decode('iso-8859-1')
+        return None
+
+    @staticmethod
+    def _merge_head(head, update):
+        # Headers in a 304 replace the stored ones of the same name (RFC 9111 section 3.2)
+        updated = {}
+        for line in update.rstrip(b"\r\n").split(b"\r\n")[1:]:
+            name = line.partition(b":")[0].strip().lower()
+            if name and name not in HOP_BY_HOP and name != b"content-length":
+                updated.setdefault(name, []).append(line)
+        lines = head.rstrip(b"\r\n").split(b"\r\n")
+        merged = [lines[0]] + [line for line in lines[1:] if line.partition(b":")[0].strip().lower() not in updated]
+        for group in updated.values():
+            merged.extend(group)
+        return b"\r\n".join(merged) + b"\r\n\r\n"
+
+    # Storage tiers (callers hold self.lock)
+
+    def _remember_body(self, digest, body):
+        if len(body) > self.memory_bytes:
+            return
+        if digest in self.bodies:
+            self.bodies.move_to_end(digest)
+            return
+        self.bodies[digest] = body
+        self.memory_used += len(body)
+        while self.memory_used > self.memory_bytes:
+            old_digest, old_body = self.bodies.popitem(last=False)
+            self.memory_used -= len(old_body)
+            self.counters["memory_evictions"] += 1
+            if self.directory is None:
+                # Memory is the only tier: entries whose body is gone are useless
+                for key in [key for key, entry in self.entries.items() if entry.digest == old_digest]:
+                    self._remove(key)
+
+    def _add_ref(self, digest, size):
+        if self.refs.get(digest, 0) == 0 and self.directory is not None:
+            self.disk_used += size
+        self.refs[digest] = self.refs.get(digest, 0) + 1
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        keys = self.by_url.get(entry.url)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_url[entry.url]
+        self.refs[entry.digest] -= 1
+        if self.refs[entry.digest] == 0:
+            del self.refs[entry.digest]
+            body = self.bodies.pop(entry.digest, None)
+            if body is not None:
+                self.memory_used -= len(body)
+            if self.directory is not None:
+                self.disk_used -= entry.size
+                try:
+                    os.remove(self._object_path(entry.digest))
+                except OSError:
+                    pass
+        self.dirty = True
+
+    def _evict_disk(self):
+        if self.directory is None:
+            return
+        while self.disk_used > self.disk_bytes and len(self.entries) > 1:
+            self._remove(next(iter(self.entries)))
+            self.counters["disk_evictions"] += 1
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    def _write_object(self, digest, body):
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return      # Content-addressed: the same body is already on disk
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp, 'wb') as file:
+            file.write(body)
+        os.replace(temp, path)
+
+    # Persistent index
+
+    def _index_path(self):
+        return os.path.join(self.directory, "index.json")
+
+    def _read_index_file(self):
+        try:
+            with open(self._index_path(), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _load_index(self):
+        index = self._read_index_file()
+        with self.lock:
+            for key, data in sorted(index.items(), key=lambda item: item[1].get("last_access", 0)):
+                try:
+                    entry = CacheEntry.from_json(key, data)
+                except (KeyError, TypeError):
+                    continue
+                if not os.path.exists(self._object_path(entry.digest)):
+                    continue
+                self.entries[key] = entry
+                self.by_url.setdefault(entry.url, set()).add(key)
+                self._add_ref(entry.digest, entry.size)
+            self._evict_disk()
+
+    def _mark_dirty(self):
+        self.dirty = True
+        if self.directory is not None and time.monotonic() - self.last_flush >= INDEX_FLUSH_INTERVAL:
+            self._flush_locked()
+
+    def flush(self):
+        """Write the index to disk now."""
+        if self.directory is None:
+            return
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self.last_flush = time.monotonic()
+        if not self.dirty:
+            return
+        self.dirty = False
+        lock_file = open(os.path.join(self.directory, "index.lock"), 'a')
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Keep entries other processes added since we loaded, unless we hold a newer copy
+            index = self._read_index_file()
+            for key, data in list(index.items()):
+                if key not in self.entries and not os.path.exists(self._object_path(data.get("digest", ""))):
+                    del index[key]
+            for key, entry in self.entries.items():
+                index[key] = entry.to_json()
+            temp = f"{self._index_path()}.{os.getpid()}.tmp"
+            with open(temp, 'w', encoding='utf-8') as file:
+                json.dump(index, file)
+            os.replace(temp, self._index_path())
+        finally:
+            lock_file.close()
+
+    def close(self):
+        self.flush()
+
+    def stats(self):
+        """Return a snapshot of the cache counters and tier sizes."""
+        with self.lock:
+            stats = dict(self.counters)
+            stats.update(entries=len(self.entries), memory_bytes=self.memory_used, disk_bytes=self.disk_used)
+            return stats
@@ -0,0 +1,177 @@
+"""
+Program Name: Resolver.py
+Description: This module implements the caching name resolver shared by WebProxy.py and the ping
+             programs. Lookups run in a small thread pool so a slow DNS server never blocks the caller's
+             thread for longer than it is willing to wait, concurrent lookups of the same name share one
+             query, and answers (including failures) are cached for a limited time.
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. Use the process-wide resolver, or create your own:
+           resolver = shared_resolver()
+           resolver = Resolver(ttl=60.0, negative_ttl=10.0, workers=4)
+    2. Resolve a name to its IPv4 addresses, or just the first one:
+           addresses = resolver.resolve("example.com", timeout=5.0)
+           address = resolver.gethostbyname("example.com")
+    3. Event-loop code calls `resolve_async(host)` and is handed a concurrent.futures.Future.
+    4. Call `stats()` to read the cache counters.
+
+Requirements:
+    - Python 3.x
+    - The `socket`, `time`, `threading` and `concurrent.futures` libraries.
+
+Notes:
+    - Names are resolved with the operating system's getaddrinfo(), so /etc/hosts and the system
+      DNS configuration apply. getaddrinfo() does not report the records' TTLs, so answers are
+      kept for `ttl` seconds and failures ("name not known") for `negative_ttl` seconds; an
+      answer is never kept longer than that.
+    - Failed lookups are re-raised to every caller as socket.gaierror (or the OSError getaddrinfo()
+      raised); names that cannot be encoded at all fail the same way. A caller whose timeout
+      expires gets socket.timeout while the query keeps running and still fills the cache.
+    - IP address literals are returned immediately without touching the cache or the pool.
+    - The cache holds at most `max_entries` names; the entries closest to expiry are dropped first.
+    - All methods are thread-safe.
+"""
+
+import socket
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeout
+
+TTL = 60.0              # Seconds a successful answer is cached
+NEGATIVE_TTL = 10.0     # Seconds a failed lookup is cached
+WORKERS = 4             # Threads running getaddrinfo() at the same time
+MAX_ENTRIES = 1024      # Names kept in the cache
+RESOLVE_TIMEOUT = 10.0  # Seconds resolve() waits by default
+
+class CachedAnswer:
+    """Addresses for one name, or the error its lookup failed with, plus when it expires."""
+
+    def __init__(self, addresses, error, expires):
+        self.addresses = addresses
+        self.error = error
+        self.expires = expires
+
+# Return the address itself if host is an IPv4 address literal, else None
+def address_literal(host):
+    try:
+        socket.inet_pton(socket.AF_INET, host)
+    except (OSError, TypeError):
+        return None
+    return host
+
+class Resolver:
+    """Thread-pool resolver with a positive and negative answer cache and coalesced lookups."""
+
+    def __init__(self, ttl=TTL, negative_ttl=NEGATIVE_TTL, workers=WORKERS, max_entries=MAX_ENTRIES):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.cache = {}                 # host -> CachedAnswer
+        self.pending = {}               # host -> Future of the lookup in progress
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="resolver")
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "negative_hits": 0, "misses": 0, "coalesced": 0,
+                         "lookups": 0, "failures": 0, "timeouts": 0}
+
+    def resolve_async(self, host):
+        """Return a Future for the IPv4 addresses of host; cached answers come back already completed."""
+        literal = address_literal(host)
+        if literal is not None:
+            return self._completed([literal], None)
+        key = host.lower()
+        with self.lock:
+            answer = self.cache.get(key)
+            if answer is not None and answer.expires > time.monotonic():
+                self.counters["negative_hits" if answer.error else "hits"] += 1
+                return self._completed(answer.addresses, answer.error)
+            future = self.pending.get(key)
+            if future is not None:
+                self.counters["coalesced"] += 1
+                return future
+            self.counters["misses"] += 1
+            future = self.pool.submit(self._lookup, key)
+            self.pending[key] = future
+        return future
+
+    def resolve(self, host, timeout=RESOLVE_TIMEOUT):
+        """Return the list of IPv4 addresses for host, waiting at most timeout seconds."""
+        future = self.resolve_async(host)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            with self.lock:
+                self.counters["timeouts"] += 1
+            raise socket.timeout(f"resolving {host} timed out after {timeout}s") from None
+
+    def gethostbyname(self, host, timeout=RESOLVE_TIMEOUT):
+        """Drop-in replacement for socket.gethostbyname() backed by the cache."""
+        return self.resolve(host, timeout)[0]
+
+    def stats(self):
+        """Return a snapshot of the resolver counters."""
+        with self.lock:
+            stats = dict(self.counters)
+            stats.update(entries=len(self.cache), pending=len(self.pending))
+            return stats
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+
+    @staticmethod
+    def _completed(addresses, error):
+        future = Future()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(addresses)
+        return future
+
+    def _lookup(self, key):
+        # Runs in a pool thread; the answer is cached before the waiting callers are woken
+        try:
+            infos = socket.getaddrinfo(key, None, socket.AF_INET, socket.SOCK_STREAM)
+            addresses = list(dict.fromkeys(info[4][0] for info in infos))
+            error = None
+        except OSError as e:
+            addresses, error = None, e
+        except ValueError as e:
+            # A name the IDNA codec cannot encode (UnicodeError), e.g. a label over 63 characters,
+            # is just as unresolvable as an unknown one, and callers only expect OSError
+            addresses, error = None, socket.gaierror(socket.EAI_NONAME, f"invalid host name {key!r}: {e}")
+        now = time.monotonic()
+        with self.lock:
+            try:
+                self.counters["lookups"] += 1
+                if error is not None:
+                    self.counters["failures"] += 1
+                self.cache[key] = CachedAnswer(addresses, error, now + (self.negative_ttl if error else self.ttl))
+                if len(self.cache) > self.max_entries:
+                    self._evict(now)
+            finally:
+                del self.pending[key]   # Whatever happens, later callers must not wait on this lookup
+        if error is not None:
+            raise error
+        return addresses
+
+    def _evict(self, now):
+        # Drop expired answers first, then the ones that would expire soonest (caller holds self.lock)
+        for key in [key for key, answer in self.cache.items() if answer.expires <= now]:
+            del self.cache[key]
+        if len(self.cache) > self.max_entries:
+            ordered = sorted(self.cache, key=lambda key: self.cache[key].expires)
+            for key in ordered[:len(self.cache) - self.max_entries]:
+                del self.cache[key]
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_resolver():
+    """Return the process-wide Resolver, creating it on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Resolver()
+        return _shared
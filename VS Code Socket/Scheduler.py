@@ -0,0 +1,199 @@
+"""
+Program Name: Scheduler.py
+Description: This module implements the timer scheduler used by the ICMP tools to pace probes and
+             expire the ones that get no reply. Deadlines are absolute times on the monotonic
+             nanosecond clock (time.perf_counter_ns) kept in a binary heap, so one loop can keep
+             thousands of send deadlines and reply timeouts without drift, and every timer records
+             how late it actually fired (scheduling lag) in a latency histogram.
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. Schedule callbacks, then let the event loop wait on its sockets with the scheduler's timeout:
+           scheduler = Scheduler()
+           scheduler.every(1.0, send_probe, host)
+           timer = scheduler.call_later(2.0, expire, key)     # timer.cancel() when the reply arrives
+           while True:
+               ready, _, _ = select.select([sock], [], [], scheduler.next_timeout())
+               scheduler.run_due()
+               ...
+    2. `scheduler.stats()` returns the number of timers fired and the lag percentiles in microseconds.
+    3. Code without an event loop can pace itself with sleep_until(deadline_ns).
+
+Requirements:
+    - Python 3.x
+    - The `heapq` and `time` libraries.
+    - LoadGen.py (in this directory) for the lag histogram.
+
+Notes:
+    - select() and time.sleep() may wake up a millisecond or more late. next_timeout() therefore
+      returns early by `spin` nanoseconds (default 200 us) and then 0 until the deadline, so the
+      loop polls its sockets for the last stretch and timers fire within a few microseconds.
+    - Cancelling a timer (timer.cancel(), scheduler.cancel(timer) or a Periodic's cancel()) only
+      marks it and counts it in the scheduler; cancelled entries are dropped when they reach the
+      top of the heap, or all at once when they make up more than half of it.
+    - Periodic timers stay on a fixed grid (start + n * interval). When the loop falls more than a
+      whole interval behind, the missed ticks are skipped and counted rather than run in a burst.
+"""
+
+import heapq
+import time
+
+from LoadGen import Histogram
+
+SPIN = 200_000          # Nanoseconds before a deadline at which waiting turns into polling
+
+class Timer:
+    """A scheduled callback; cancel() prevents it from running."""
+
+    __slots__ = ("deadline", "callback", "args", "cancelled", "scheduler")
+
+    def __init__(self, deadline, callback, args, scheduler=None):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self.scheduler = scheduler      # Told about the cancellation, which it counts
+
+    def cancel(self):
+        if self.cancelled:
+            return
+        self.cancelled = True
+        if self.scheduler is not None:
+            self.scheduler._timer_cancelled()
+
+class Periodic:
+    """Handle for a series of timers created by Scheduler.every()."""
+
+    def __init__(self, scheduler, interval, callback, args):
+        self.scheduler = scheduler
+        self.interval = interval
+        self.callback = callback
+        self.args = args
+        self.timer = None
+        self.skipped = 0        # Ticks dropped because the loop was more than one interval late
+
+    def _fire(self):
+        deadline = self.timer.deadline
+        now = time.perf_counter_ns()
+        next_deadline = deadline + self.interval
+        if next_deadline <= now:
+            missed = (now - deadline) // self.interval
+            self.skipped += missed
+            next_deadline += missed * self.interval
+        self.timer = self.scheduler.call_at(next_deadline, self._fire)
+        self.callback(*self.args)
+
+    def cancel(self):
+        if self.timer is not None:
+            self.timer.cancel()
+
+class Scheduler:
+    """Heap of timers on the perf_counter_ns clock, run from the caller's event loop."""
+
+    def __init__(self, spin=SPIN):
+        self.spin = spin
+        self.heap = []          # (deadline, sequence, Timer); the sequence keeps equal deadlines FIFO
+        self.sequence = 0
+        self.cancelled = 0      # Cancelled entries still in the heap
+        self.fired = 0
+        self.lag = Histogram()  # Nanoseconds between each deadline and the moment its callback ran
+
+    def call_at(self, deadline, callback, *args):
+        """Run callback(*args) at the perf_counter_ns time `deadline`."""
+        timer = Timer(deadline, callback, args, self)
+        heapq.heappush(self.heap, (deadline, self.sequence, timer))
+        self.sequence += 1
+        return timer
+
+    def call_later(self, delay, callback, *args):
+        """Run callback(*args) in `delay` seconds."""
+        return self.call_at(time.perf_counter_ns() + int(delay * 1e9), callback, *args)
+
+    def every(self, interval, callback, *args, start=None):
+        """Run callback(*args) every `interval` seconds, first at `start` (perf_counter_ns, default now)."""
+        periodic = Periodic(self, int(interval * 1e9), callback, args)
+        periodic.timer = self.call_at(time.perf_counter_ns() if start is None else start, periodic._fire)
+        return periodic
+
+    def cancel(self, timer):
+        """Same as timer.cancel()."""
+        timer.cancel()
+
+    def _timer_cancelled(self):
+        # Called by Timer.cancel() for a timer still in the heap, so every way of cancelling is counted
+        self.cancelled += 1
+        if self.cancelled > 64 and self.cancelled * 2 > len(self.heap):
+            # In place: run_due() may be iterating over this very list when a callback cancels
+            self.heap[:] = [entry for entry in self.heap if not entry[2].cancelled]
+            heapq.heapify(self.heap)
+            self.cancelled = 0
+
+    def _discard_cancelled(self):
+        heap = self.heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+            self.cancelled = max(0, self.cancelled - 1)
+
+    def next_deadline(self):
+        """Deadline of the earliest pending timer, or None."""
+        self._discard_cancelled()
+        return self.heap[0][0] if self.heap else None
+
+    def next_timeout(self, limit=None):
+        """Seconds the event loop may block before the next timer is due (None: no timers, no limit)."""
+        deadline = self.next_deadline()
+        if deadline is None:
+            return limit
+        remaining = deadline - time.perf_counter_ns()
+        timeout = 0 if remaining <= self.spin else (remaining - self.spin) / 1e9
+        return timeout if limit is None else min(timeout, limit)
+
+    def run_due(self):
+        """Run every timer whose deadline has passed; returns how many ran."""
+        heap = self.heap
+        count = 0
+        now = time.perf_counter_ns()
+        while heap and heap[0][0] <= now:
+            deadline, _, timer = heapq.heappop(heap)
+            if timer.cancelled:
+                self.cancelled = max(0, self.cancelled - 1)
+                continue
+            timer.cancelled = True      # Fired timers cannot be cancelled again
+            self.lag.record(now - deadline)
+            timer.callback(*timer.args)
+            count += 1
+            now = time.perf_counter_ns()
+        self.fired += count
+        return count
+
+    def pending(self):
+        return len(self.heap) - self.cancelled
+
+    def stats(self):
+        lag = self.lag
+        return {
+            "fired": self.fired,
+            "pending": self.pending(),
+            "lag_us": {
+                "mean": round(lag.mean() / 1000, 1),
+                "p50": round(lag.percentile(50) / 1000, 1),
+                "p99": round(lag.percentile(99) / 1000, 1),
+                "max": round(lag.max / 1000, 1),
+            },
+        }
+
+    def describe(self):
+        stats = self.stats()
+        lag = stats["lag_us"]
+        return (f"scheduler: {stats['fired']:,} timers fired, lag mean {lag['mean']} us, "
+                f"p50 {lag['p50']} us, p99 {lag['p99']} us, max {lag['max']} us")
+
+def sleep_until(deadline, spin=SPIN):
+    """Block until the perf_counter_ns time `deadline`: sleep most of the way, then spin."""
+    remaining = deadline - time.perf_counter_ns()
+    if remaining > spin:
+        time.sleep((remaining - spin) / 1e9)
+    while time.perf_counter_ns() < deadline:
+        pass
@@ -13,20 +13,34 @@ Usage:
     1. Run this program to start the UDP server.
     2. The server will listen on the specified host and port for incoming "ping" messages.
     3. When a "ping" message is received, the server will respond with a "PONG" message.
+    4. Call `start_server(host, port, processes=N)` to run N worker processes sharing the port.
 
 Requirements:
     - Python 3.x
     - The `socket` library for UDP communication.
+    - UDPEngine.py and Prefork.py (in this directory).
 
 Notes:
     - The server listens on the specified host and port defined in the `host` and `port` variables.
+    - Pings are answered by the batched loop in UDPEngine.py, which prints the packets/s rate every
+      `report_interval` seconds. Printing every ping (verbose=True) uses the simple one-datagram
+      loop instead and limits the rate to what the terminal can keep up with.
+    - A ping carrying more than the word PING (e.g. "PING 7 123456789") is answered with PONG and the
+      same trailing text, so pipelined clients can match replies to probes.
     - This program runs indefinitely until manually stopped.
     - Ensure the client program is configured to send messages to the correct host and port.
 """
 
 import socket   # Import socket library
 
-def start_server(host, port):   # Function to start the UDP server
+from UDPEngine import serve, pong, BATCH, REPORT_INTERVAL  # Batched datagram loop
+
+def start_server(host, port, processes=1, verbose=False, batch=BATCH, report_interval=REPORT_INTERVAL):   # Function to start the UDP server
+    if not verbose:
+        print(f"Server listening on {host}:{port}...")  # Print a message indicating the server is ready
+        serve(host, port, pong, processes, batch, report_interval)
+        return
+
     # Create a UDP socket
     with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as server_socket:     
         server_socket.bind((host, port))    # Bind the socket to the specified host and port
@@ -37,8 +51,8 @@ def start_server(host, port):   # Function to start the UDP server
             message, client_address = server_socket.recvfrom(1024)
             print(f"Received ping from {client_address}: {message.decode()}")
 
-            # Send back a pong message to the client
-            server_socket.sendto(b"PONG", client_address)
+            # Send back a pong message to the client, echoing the probe's sequence number and timestamp
+            server_socket.sendto(pong(message, len(message)), client_address)
 
 if __name__ == "__main__":
     # Server listening on localhost and port 12345
@@ -0,0 +1,151 @@
+"""
+Program Name: StaticCache.py
+Description: This module implements a bounded in-memory cache of static file bodies for WebServer.py.
+             Entries are kept in least-recently-used order and evicted once the total cached size
+             exceeds the configured byte budget. Each entry also stores the prebuilt response header
+             block so a cache hit needs no system calls at all.
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. Create a cache and share it between the server's worker threads:
+           cache = StaticCache(max_bytes=64 * 1024 * 1024, max_file_size=1024 * 1024)
+    2. Call `lookup(path)` before touching the filesystem and `store(...)` after reading a file.
+    3. Call `stats()` to read the hit, miss and eviction counters.
+
+Requirements:
+    - Python 3.x
+    - The `os`, `threading` and `collections` libraries.
+
+Notes:
+    - Keys are normalized request paths (`os.path.normpath`), which needs no system calls.
+    - An entry is revalidated with `os.stat` at most once per `check_interval` seconds; if the file's
+      modification time or size changed, or the file is gone, the entry is dropped and the lookup
+      counts as a miss.
+    - Encoded variants of an entry (gzip, deflate) are stored with it via `add_variant`, count
+      against the same byte budget and are dropped together with the entry.
+    - All methods are thread-safe.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+class CacheEntry:
+    """A cached file body together with the metadata used to revalidate it."""
+
+    def __init__(self, key, body, header, mtime_ns, size):
+        self.key = key
+        self.body = body            # Complete file contents
+        self.header = header        # Prebuilt 200 header lines (without Connection and the blank line)
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.checked_at = time.monotonic()
+        self.variants = {}          # Encoded bodies (e.g. "gzip") as (body, header) pairs
+
+    def cost(self):
+        return len(self.body) + sum(len(body) for body, header in self.variants.values())
+
+class StaticCache:
+    """Byte-bounded LRU cache of small static files."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_file_size=1024 * 1024, check_interval=1.0):
+        self.max_bytes = max_bytes              # Total bytes of file bodies kept in memory
+        self.max_file_size = max_file_size      # Larger files are never cached
+        self.check_interval = check_interval    # Seconds between mtime/size revalidations
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(path):
+        return os.path.normpath(path)
+
+    def accepts(self, size):
+        """Return True if a file of this size may be cached."""
+        return size <= self.max_file_size and size <= self.max_bytes
+
+    def lookup(self, path):
+        """Return the fresh CacheEntry for path, or None on a miss."""
+        key = self.key(path)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            now = time.monotonic()
+            if now - entry.checked_at < self.check_interval:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        # Revalidate outside the lock so a slow stat() does not stall the other workers
+        try:
+            st = os.stat(key)
+            fresh = st.st_mtime_ns == entry.mtime_ns and st.st_size == entry.size
+        except OSError:
+            fresh = False
+        with self.lock:
+            if fresh:
+                entry.checked_at = now
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if self.entries.get(key) is entry:
+                self._remove(key)
+                self.invalidations += 1
+            self.misses += 1
+            return None
+
+    def store(self, path, body, header, st):
+        """Cache a file body read from disk; st is the os.stat_result taken when it was opened."""
+        if not self.accepts(len(body)):
+            return None
+        key = self.key(path)
+        entry = CacheEntry(key, body, header, st.st_mtime_ns, st.st_size)
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = entry
+            self.current_bytes += len(body)
+            self._evict()
+        return entry
+
+    def add_variant(self, entry, name, body, header):
+        """Attach an encoded representation to a cached entry, charging it to the byte budget."""
+        with self.lock:
+            if name in entry.variants:
+                return
+            entry.variants[name] = (body, header)
+            if self.entries.get(entry.key) is entry:
+                self.current_bytes += len(body)
+                self._evict()
+
+    def stats(self):
+        """Return a snapshot of the cache counters."""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self.entries),
+                "bytes": self.current_bytes,
+            }
+
+    def _evict(self):
+        # Evict least recently used entries until the byte budget is met again
+        while self.current_bytes > self.max_bytes and len(self.entries) > 1:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.current_bytes -= entry.cost()
@@ -14,6 +14,8 @@ Usage:
     1. Ensure the TCP server is running and listening on the specified IP and port.
     2. Run this program and input a message when prompted.
     3. The program will send the message to the server and display the server's response.
+    4. Or load-test the server instead (see LoadGen.py for all options):
+           python TCPClient.py --benchmark --host 127.0.0.1 --connections 16 [--rate N] [--sizes 64,4096]
 
 Requirements:
     - Python 3.x
@@ -22,12 +24,25 @@ Requirements:
 Notes:
     - The server IP and port can be modified in the `serverName` and `serverPort` variables.
     - This program demonstrates a simple request-response interaction over TCP.
+    - Benchmark mode reports requests/s, MB/s and p50/p90/p99/p99.9 latency for closed-loop or
+      fixed-rate load from N concurrent connections.
 """
 
 from socket import *    # Import socket library
+import argparse     # Import argparse library for command-line options
+
+from LoadGen import add_benchmark_arguments, run_from_args     # Load generator for --benchmark
 
 serverName = 'hostname' # Server IP address (replace with actual server IP)
 serverPort = 12000  # Server port number
+
+parser = argparse.ArgumentParser(description="TCP uppercase client")
+add_benchmark_arguments(parser, serverPort)
+args = parser.parse_args()
+if args.benchmark:
+    run_from_args("tcp", args)  # Drive the server with concurrent connections and report latency
+    raise SystemExit
+
 clientSocket = socket(AF_INET, SOCK_STREAM) # Create a TCP socket
 clientSocket.connect((serverName, serverPort))  # Connect to the server
 sentence = input('Input lowercase sentence:')   # Prompt user for input
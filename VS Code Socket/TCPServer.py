@@ -12,32 +12,95 @@ Course: COSC 370 - Computer Networks
 Instructor: Dr. Enyue Lu
 
 Usage:
-    1. Run this program to start the TCP server.
+    1. Run this program to start the TCP server:
+           python TCPServer.py [--port PORT] [--max-connections N] [--chunk-size BYTES]
     2. The server will listen on the specified port for incoming client connections.
-    3. When a client sends a message, the server will process it and send the response back.
+    3. Everything a client sends is uppercased and streamed back on the same connection until the
+       client closes its side.
 
 Requirements:
     - Python 3.x
-    - The `socket` library for TCP communication.
+    - The `socket` and `asyncio` libraries for TCP communication.
 
 Notes:
     - The server listens on all available network interfaces (IP address `''`) and the specified port.
-    - The port number can be modified in the `serverPort` variable.
-    - This program runs indefinitely until manually stopped.
+    - The port number can be modified in the `serverPort` variable or with --port.
+    - Connections are served concurrently by an asyncio event loop, so a slow client no longer
+      blocks the others. Each connection is read in chunks of at most --chunk-size bytes, and each
+      chunk is uppercased and written back before the next read. Waiting for the write buffer to
+      drain gives per-connection backpressure, so memory stays bounded however much a client sends.
+    - Uppercasing works on bytes (ASCII letters only), so a multi-byte UTF-8 character split across
+      two chunks is never corrupted.
+    - At most --max-connections clients are served at once; connections beyond that are closed
+      immediately.
+    - When a connection closes, the server prints how many bytes it echoed and the throughput.
+    - This program runs indefinitely until manually stopped (Ctrl-C).
 """
 
-from socket import *    # Import socket library
+import asyncio  # Import asyncio library for concurrent connections
+import argparse     # Import argparse library for command-line options
+import socket   # Import socket library
+import time     # Import time library for throughput reports
 
 serverPort = 12000  # Server port number
-serverSocket = socket(AF_INET, SOCK_STREAM) # Create a TCP socket
-serverSocket.bind(('', serverPort)) # Bind the socket to the server address and port
-serverSocket.listen(1)  # Listen for incoming connections
-
-print('The server is ready to receive') # Print a message indicating the server is ready
-
-while True:  # Infinite loop to keep the server running 
-    connectionSocket, addr = serverSocket.accept()  # Accept a connection from a client
-    sentence = connectionSocket.recv(1024).decode() # Receive message from client
-    capitalizedSentence = sentence.upper()      # Convert the message to uppercase
-    connectionSocket.send(capitalizedSentence.encode()) # Send the modified message back to the client
-    connectionSocket.close()    # Close the connection with the client
+CHUNK_SIZE = 64 * 1024  # Bytes read, uppercased and written back per step
+MAX_CONNECTIONS = 1024  # Clients served at the same time
+BACKLOG = 128   # Length of the kernel accept queue
+
+activeConnections = 0   # Connections currently being served
+
+# Uppercase everything one client sends until it closes its side of the connection
+async def handleConnection(reader, writer, chunkSize):
+    global activeConnections
+    addr = writer.get_extra_info('peername')
+    sock = writer.get_extra_info('socket')
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)     # Small replies go out at once
+
+    start = time.monotonic()
+    total = 0
+    try:
+        while True:
+            chunk = await reader.read(chunkSize)    # Receive the next piece of the stream
+            if not chunk:
+                break
+            writer.write(chunk.upper())     # Convert to uppercase and send it back
+            await writer.drain()    # Wait if the client is not keeping up
+            total += len(chunk)
+        if writer.can_write_eof():
+            writer.write_eof()  # Tell the client the reply stream is complete
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        activeConnections -= 1
+        writer.close()
+        elapsed = time.monotonic() - start
+        print(f"{addr}: {total} bytes in {elapsed:.2f}s ({total / max(elapsed, 1e-9) / 1e6:.1f} MB/s), "
+              f"{activeConnections} connection(s) still open")
+
+# Accept connections up to the limit and serve them concurrently
+async def serve(port, maxConnections, chunkSize):
+    async def onConnect(reader, writer):
+        global activeConnections
+        if activeConnections >= maxConnections:
+            print(f"Refusing {writer.get_extra_info('peername')}: {maxConnections} connections already open")
+            writer.close()
+            return
+        activeConnections += 1
+        await handleConnection(reader, writer, chunkSize)
+
+    server = await asyncio.start_server(onConnect, '', port, backlog=BACKLOG, limit=chunkSize)
+    print('The server is ready to receive') # Print a message indicating the server is ready
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent TCP uppercase server")
+    parser.add_argument("--port", type=int, default=serverPort, help="port to listen on")
+    parser.add_argument("--max-connections", type=int, default=MAX_CONNECTIONS, help="clients served at the same time")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="bytes uppercased per read")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.port, args.max_connections, args.chunk_size))
+    except KeyboardInterrupt:
+        pass
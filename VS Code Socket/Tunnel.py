@@ -0,0 +1,209 @@
+"""
+Program Name: Tunnel.py
+Description: This module implements the full-duplex byte pump WebProxy.py uses for CONNECT tunnels
+             (HTTPS through the proxy). One thread moves bytes in both directions between two sockets,
+             driven by a selector, through two large buffers that are reused for every read. When one
+             side finishes sending, the other side is told with a half-close so protocols that rely on
+             it (TLS close_notify followed by FIN) keep working.
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. Connect to the target, answer the client's CONNECT, then pump until both sides are done:
+           sent_up, sent_down = pump(client_socket, server_socket)
+    2. Run this module directly to benchmark tunnel throughput against a local echo server:
+           python Tunnel.py [--megabytes N] [--buffer BYTES]
+
+Requirements:
+    - Python 3.x
+    - The `socket`, `selectors`, `threading` and `time` libraries.
+
+Notes:
+    - Both sockets are switched to non-blocking mode. Each direction reads only while its buffered
+      bytes have been written out, so a slow receiver applies backpressure to the sender instead
+      of making the proxy buffer without limit.
+    - EOF from one side is propagated with shutdown(SHUT_WR) on the other; the tunnel ends once
+      both directions have seen EOF, on a reset, or after `idle_timeout` seconds without traffic.
+    - Each pumping thread keeps its pair of buffers in thread-local storage, so a worker thread
+      allocates them once no matter how many tunnels it serves.
+"""
+
+import socket
+import selectors
+import threading
+import time
+
+BUFFER_SIZE = 256 * 1024    # Bytes read per recv_into() in each direction
+IDLE_TIMEOUT = 300.0        # Seconds a tunnel may go without traffic before it is closed
+
+_local = threading.local()
+
+def _buffers(size):
+    buffers = getattr(_local, "buffers", None)
+    if buffers is None or len(buffers[0]) != size:
+        buffers = _local.buffers = (bytearray(size), bytearray(size))
+    return buffers
+
+class _Direction:
+    """Bytes flowing from one socket to the other."""
+
+    def __init__(self, source, sink, buffer):
+        self.source = source
+        self.sink = sink
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+        self.pending = None     # Slice of the buffer read but not yet written
+        self.eof = False        # Source has finished sending and the sink was half-closed
+        self.total = 0
+
+    def wants_read(self):
+        return not self.eof and self.pending is None
+
+    def read(self):
+        try:
+            received = self.source.recv_into(self.buffer)
+        except BlockingIOError:
+            return
+        if received == 0:
+            self.eof = True
+            try:
+                self.sink.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+            return
+        self.pending = self.view[:received]
+        self.write()    # Usually the sink can take it all right away
+
+    def write(self):
+        try:
+            sent = self.sink.send(self.pending)
+        except BlockingIOError:
+            return
+        self.total += sent
+        self.pending = self.pending[sent:] if sent < len(self.pending) else None
+
+def pump(a, b, buffer_size=BUFFER_SIZE, idle_timeout=IDLE_TIMEOUT):
+    """Relay bytes between sockets a and b until both directions are closed.
+
+    Returns (bytes sent from a to b, bytes sent from b to a). Neither socket is closed.
+    """
+    first, second = _buffers(buffer_size)
+    directions = (_Direction(a, b, first), _Direction(b, a, second))
+    a.setblocking(False)
+    b.setblocking(False)
+    selector = selectors.DefaultSelector()
+    registered = {}
+    try:
+        while not all(direction.eof and direction.pending is None for direction in directions):
+            # Each socket is read by one direction and written by the other
+            for sock in (a, b):
+                events = 0
+                for direction in directions:
+                    if direction.source is sock and direction.wants_read():
+                        events |= selectors.EVENT_READ
+                    if direction.sink is sock and direction.pending is not None:
+                        events |= selectors.EVENT_WRITE
+                if events == registered.get(sock, 0):
+                    continue
+                if not events:
+                    selector.unregister(sock)
+                elif sock in registered and registered[sock]:
+                    selector.modify(sock, events)
+                else:
+                    selector.register(sock, events)
+                registered[sock] = events
+
+            ready = selector.select(idle_timeout)
+            if not ready:
+                break   # Idle for too long
+            for key, mask in ready:
+                for direction in directions:
+                    if mask & selectors.EVENT_WRITE and direction.sink is key.fileobj and direction.pending is not None:
+                        direction.write()
+                    if mask & selectors.EVENT_READ and direction.source is key.fileobj and direction.wants_read():
+                        direction.read()
+    except (ConnectionError, OSError):
+        pass    # A reset on either side ends the tunnel
+    finally:
+        selector.close()
+    return directions[0].total, directions[1].total
+
+# Local echo server standing in for a TLS origin: returns every byte it receives
+def _echo_server(listener):
+    def echo(conn):
+        with conn:
+            buffer = bytearray(BUFFER_SIZE)
+            while True:
+                received = conn.recv_into(buffer)
+                if received == 0:
+                    conn.shutdown(socket.SHUT_WR)
+                    return
+                conn.sendall(memoryview(buffer)[:received])
+    while True:
+        try:
+            conn, _ = listener.accept()
+        except OSError:
+            return
+        threading.Thread(target=echo, args=(conn,), daemon=True).start()
+
+# Tunnel in front of the echo server: every accepted connection is pumped to a fresh echo connection
+def _tunnel_server(listener, target, buffer_size):
+    def serve(conn):
+        with conn, socket.create_connection(target) as upstream:
+            pump(conn, upstream, buffer_size)
+    while True:
+        try:
+            conn, _ = listener.accept()
+        except OSError:
+            return
+        threading.Thread(target=serve, args=(conn,), daemon=True).start()
+
+# Stream `total` bytes through address and read the echo back; returns MB/s one way
+def _measure(address, total, chunk=64 * 1024):
+    payload = bytes(chunk)
+    with socket.create_connection(address) as sock:
+        start = time.perf_counter()
+
+        def send():
+            left = total
+            while left:
+                left -= sock.send(payload[:min(chunk, left)])
+            sock.shutdown(socket.SHUT_WR)
+
+        sender = threading.Thread(target=send)
+        sender.start()
+        buffer = bytearray(BUFFER_SIZE)
+        received = 0
+        while True:
+            count = sock.recv_into(buffer)
+            if count == 0:
+                break
+            received += count
+        sender.join()
+        elapsed = time.perf_counter() - start
+    assert received == total, (received, total)
+    return total / elapsed / 1e6
+
+def benchmark(megabytes=256, buffer_size=BUFFER_SIZE, rounds=3):
+    echo = socket.create_server(("127.0.0.1", 0))
+    threading.Thread(target=_echo_server, args=(echo,), daemon=True).start()
+    tunnel = socket.create_server(("127.0.0.1", 0))
+    threading.Thread(target=_tunnel_server, args=(tunnel, echo.getsockname(), buffer_size), daemon=True).start()
+
+    total = megabytes * 1024 * 1024
+    print(f"Echoing {megabytes} MiB each way, best of {rounds} (buffer {buffer_size // 1024} KiB)")
+    direct = max(_measure(echo.getsockname(), total) for _ in range(rounds))
+    tunneled = max(_measure(tunnel.getsockname(), total) for _ in range(rounds))
+    print(f"{'direct to echo server':<28} {direct:>10.1f} MB/s")
+    print(f"{'through tunnel pump':<28} {tunneled:>10.1f} MB/s ({tunneled / direct:.0%} of direct)")
+    echo.close()
+    tunnel.close()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the CONNECT tunnel pump against a local echo server")
+    parser.add_argument("--megabytes", type=int, default=256, help="MiB streamed through each connection")
+    parser.add_argument("--buffer", type=int, default=BUFFER_SIZE, help="pump buffer size in bytes")
+    args = parser.parse_args()
+    benchmark(args.megabytes, args.buffer)
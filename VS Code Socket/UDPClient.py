@@ -13,6 +13,8 @@ Usage:
     1. Ensure the UDP server is running and listening on the specified IP and port.
     2. Run this program and input a message when prompted.
     3. The program will send the message to the server and display the server's response.
+    4. Or load-test the server instead (see LoadGen.py for all options):
+           python UDPClient.py --benchmark --host 127.0.0.1 --connections 8 [--rate N] [--sizes 64,1400]
 
 Requirements:
     - Python 3.x
@@ -21,14 +23,29 @@ Requirements:
 Notes:
     - This program uses the `socket` library for UDP communication.
     - The server IP and port can be modified in the `serverName` and `serverPort` variables.
+    - Benchmark mode reports requests/s, MB/s, lost datagrams and p50/p90/p99/p99.9 latency for
+      closed-loop or fixed-rate load from N concurrent flows. It works against UDPServer.py and
+      ServerPinger.py: each request is a "PING" with a sequence number, which both servers send
+      back, so late replies to lost requests are told apart from the current one.
 
 """
 
 # Program to send a message to a UDP server and receive a response
 from socket import *    # Import socket library
+import argparse     # Import argparse library for command-line options
+
+from LoadGen import add_benchmark_arguments, run_from_args     # Load generator for --benchmark
 
 serverName = '10.0.0.140'   # Server IP address
 serverPort = 12000  # Server port number
+
+parser = argparse.ArgumentParser(description="UDP uppercase client")
+add_benchmark_arguments(parser, serverPort)
+args = parser.parse_args()
+if args.benchmark:
+    run_from_args("udp", args)  # Drive the server with concurrent flows and report latency
+    raise SystemExit
+
 clientSocket = socket(AF_INET, SOCK_DGRAM)  # Create a UDP socket
 message = input('Input lowercase sentence:')    # Prompt user for input
 clientSocket.sendto(message.encode(), (serverName, serverPort)) # Send message to server
@@ -0,0 +1,167 @@
+"""
+Program Name: UDPEngine.py
+Description: This module implements the high-rate datagram loop shared by UDPServer.py and
+             ServerPinger.py. Each pass drains every datagram already queued on the socket into a
+             preallocated ring of receive buffers (the closest Python gets to recvmmsg), then builds
+             and sends all the replies, so the per-packet cost is one recvfrom_into and one sendto.
+             Replies are computed on bytes, never decoded to str, and the engine reports packets
+             per second while it runs.
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. Pick a reply function taking (buffer, length) and returning the bytes to send back, or None:
+           serve(host, port, uppercase)
+           serve(host, port, pong, processes=4)
+    2. With processes > 1, a prefork supervisor (see Prefork.py) runs that many copies of the loop.
+       Where SO_REUSEPORT exists each has its own socket and the kernel spreads clients across them;
+       otherwise they share one inherited socket.
+    3. Every `report_interval` seconds each process prints its packets/s and throughput.
+
+Requirements:
+    - Python 3.x
+    - The `socket`, `select`, `time` and `threading` libraries.
+
+Notes:
+    - `uppercase` uses bytes.upper(), which changes ASCII letters only; other bytes (including
+      UTF-8 encoded non-ASCII text) are echoed unchanged.
+    - A reply sendto() fails for (e.g. no route to that client) is counted and skipped; the
+      count appears in the summary printed on shutdown.
+    - The kernel receive buffer is enlarged (SO_RCVBUF) so bursts that arrive while a batch is
+      being answered wait in the kernel instead of being dropped.
+"""
+
+import os
+import time
+import select
+import socket
+import threading
+
+from Prefork import Supervisor
+
+BATCH = 64                  # Datagrams received per pass before the replies are sent
+SLOT_SIZE = 65536           # Receive buffer per ring slot (largest UDP payload)
+RECV_BUFFER = 4 * 1024 * 1024   # Requested SO_RCVBUF in bytes
+REPORT_INTERVAL = 1.0       # Seconds between packets/s reports (0 disables)
+
+# Reply functions
+
+def uppercase(buffer, length):
+    """Echo the datagram with ASCII letters converted to uppercase."""
+    return buffer[:length].upper()
+
+PONG = b"PONG"
+
+def pong(buffer, length):
+    """Answer PING datagrams with PONG followed by the rest of the probe (sequence number, timestamp)."""
+    if buffer.startswith(b"PING") and length > 4:
+        return PONG + buffer[4:length]
+    return PONG
+
+# Create and bind a UDP socket, optionally with SO_REUSEPORT
+def create_udp_socket(host, port, reuse_port=False):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER)
+    except OSError:
+        pass
+    sock.bind((host, port))
+    return sock
+
+class RateReporter:
+    """Counts packets and bytes and prints the rates every interval."""
+
+    def __init__(self, label, interval=REPORT_INTERVAL):
+        self.label = label
+        self.interval = interval
+        self.packets = 0
+        self.bytes = 0
+        self.total_packets = 0
+        self.send_errors = 0    # Replies sendto() refused (unreachable peer, EMSGSIZE, ...), since the start
+        self.started = self.last = time.monotonic()
+
+    def tick(self, now):
+        if not self.interval or now - self.last < self.interval:
+            return
+        elapsed = now - self.last
+        if self.packets:
+            print(f"{self.label}: {self.packets / elapsed:,.0f} packets/s, "
+                  f"{self.bytes / elapsed / 1e6:.1f} MB/s in")
+        self.total_packets += self.packets
+        self.packets = self.bytes = 0
+        self.last = now
+
+    def summary(self):
+        self.total_packets += self.packets
+        elapsed = time.monotonic() - self.started
+        text = f"{self.label}: {self.total_packets:,} packets in {elapsed:.1f}s ({self.total_packets / elapsed:,.0f} packets/s)"
+        if self.send_errors:
+            text += f", {self.send_errors:,} replies not sent"
+        return text
+
+def serve_socket(sock, stop_event, reply, batch=BATCH, report_interval=REPORT_INTERVAL):
+    """Answer datagrams on sock with reply(buffer, length) until stop_event is set."""
+    ring = [bytearray(SLOT_SIZE) for _ in range(batch)]
+    lengths = [0] * batch
+    addresses = [None] * batch
+    reporter = RateReporter(f"[{os.getpid()}]", report_interval)
+    sock.setblocking(False)
+    recv_into = sock.recvfrom_into
+    sendto = sock.sendto
+    try:
+        while not stop_event.is_set():
+            # Sleep until something arrives, waking up regularly for reports and shutdown
+            readable, _, _ = select.select([sock], [], [], 0.5)
+            if readable:
+                while True:
+                    # Drain up to `batch` queued datagrams into the ring...
+                    count = 0
+                    while count < batch:
+                        try:
+                            lengths[count], addresses[count] = recv_into(ring[count])
+                        except (BlockingIOError, InterruptedError):
+                            break
+                        except ConnectionRefusedError:
+                            continue    # ICMP port unreachable from an earlier reply
+                        count += 1
+                    # ...then answer them all
+                    for i in range(count):
+                        response = reply(ring[i], lengths[i])
+                        if response is not None:
+                            try:
+                                sendto(response, addresses[i])
+                            except (BlockingIOError, InterruptedError):
+                                pass    # Socket send buffer full: drop, as a router would
+                            except OSError:
+                                # A failure for one peer (no route, EMSGSIZE, a firewall's EPERM)
+                                # must not end the loop for every other client
+                                reporter.send_errors += 1
+                        reporter.bytes += lengths[i]
+                    reporter.packets += count
+                    if count < batch:
+                        break
+                    reporter.tick(time.monotonic())     # Keep reporting under sustained load
+            reporter.tick(time.monotonic())
+    finally:
+        print(reporter.summary())
+
+def serve(host, port, reply, processes=1, batch=BATCH, report_interval=REPORT_INTERVAL):
+    """Run the datagram loop in this process, or in `processes` forked workers."""
+    if processes > 1:
+        supervisor = Supervisor(lambda reuse_port: create_udp_socket(host, port, reuse_port),
+                                lambda sock, stop_event: serve_socket(sock, stop_event, reply, batch, report_interval),
+                                processes)
+        supervisor.run()
+        return
+
+    sock = create_udp_socket(host, port)
+    stop_event = threading.Event()
+    try:
+        serve_socket(sock, stop_event, reply, batch, report_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
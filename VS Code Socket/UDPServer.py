@@ -11,30 +11,41 @@ Course: COSC 370 - Computer Networks
 Instructor: Dr. Enyue Lu
 
 Usage:
-    1. Run this program to start the UDP server.
+    1. Run this program to start the UDP server:
+           python UDPServer.py [--port PORT] [--processes N] [--batch N] [--report-interval SECONDS]
     2. The server will listen on the specified port for incoming messages from clients.
     3. When a message is received, the server will process it and send the response back to the client.
 
 Requirements:
     - Python 3.x
     - The `socket` library for UDP communication.
+    - UDPEngine.py and Prefork.py (in this directory).
 
 Notes:
     - The server listens on all available network interfaces (IP address `''`) and the specified port.
-    - The port number can be modified in the `serverPort` variable.
+    - The port number can be modified in the `serverPort` variable or with --port.
+    - Datagrams are handled by the batched loop in UDPEngine.py: queued datagrams are drained into a
+      preallocated ring with recvfrom_into, uppercased as bytes (ASCII letters only) and answered,
+      and the packets/s rate is printed every --report-interval seconds.
+    - With --processes N, N worker processes share the port through SO_REUSEPORT.
     - This program runs indefinitely until manually stopped.
 
 """
 
-from socket import *    # Import socket library
+import argparse     # Import argparse library for command-line options
+
+from UDPEngine import serve, uppercase, BATCH, REPORT_INTERVAL  # Batched datagram loop
 
 serverPort = 12000  # Server port number
-serverSocket = socket(AF_INET, SOCK_DGRAM)  # Create a UDP socket
-serverSocket.bind(('', serverPort)) # Bind the socket to the server address and port
-print('The server is ready to receive') # Print a message indicating the server is ready
 
-while True:   # Infinite loop to keep the server running
-    message, clientAddress = serverSocket.recvfrom(2048)    # Receive message from client
-    modifiedMessage = message.decode().upper()  # Convert the message to uppercase
-    serverSocket.sendto(modifiedMessage.encode(), clientAddress)    # Send the modified message back to the client
+parser = argparse.ArgumentParser(description="UDP uppercase server")
+parser.add_argument("--port", type=int, default=serverPort, help="port to listen on")
+parser.add_argument("--processes", type=int, default=1, help="worker processes sharing the port")
+parser.add_argument("--batch", type=int, default=BATCH, help="datagrams received per pass before replying")
+parser.add_argument("--report-interval", type=float, default=REPORT_INTERVAL,
+                    help="seconds between packets/s reports (0 disables)")
+args = parser.parse_args()
+
+print('The server is ready to receive') # Print a message indicating the server is ready
+serve('', args.port, uppercase, args.processes, args.batch, args.report_interval)   # Receive, uppercase and reply until stopped
 
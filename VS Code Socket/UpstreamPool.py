@@ -0,0 +1,225 @@
+"""
+Program Name: UpstreamPool.py
+Description: This module implements the pool of keep-alive connections that WebProxy.py uses to talk
+             to origin servers. Instead of a TCP handshake for every forwarded request, a handler
+             checks out an idle connection to the request's origin, sends the request, relays the
+             response and returns the connection to the pool if both sides allow it to be reused.
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. Create one pool per proxy process and share it between the handler threads:
+           pool = UpstreamPool(max_per_host=8, idle_timeout=30.0)
+    2. Check out a connection, use it, then give it back:
+           conn = pool.acquire(host, port)
+           ...send the request and read the complete response on conn.sock...
+           pool.release(conn, reusable=response.keep_alive)
+       Call `pool.discard(conn)` instead if the exchange failed.
+    3. Call `stats()` to read the pool counters and `close()` on shutdown.
+
+Requirements:
+    - Python 3.x
+    - The `socket`, `time` and `threading` libraries.
+
+Notes:
+    - At most `max_per_host` connections (idle and in use) are open to each origin. A handler that
+      finds the limit reached waits up to `checkout_timeout` seconds for another handler to release
+      one, then gives up with PoolTimeout.
+    - Idle connections are closed after `idle_timeout` seconds, and after `max_requests` requests,
+      so the pool never hands out a connection the origin is likely to have dropped already.
+    - On checkout an idle connection is health-checked with a non-blocking MSG_PEEK: a connection
+      the origin has closed (EOF), reset, or sent unsolicited bytes on is discarded. The origin can
+      still close a connection right after the check, so callers should retry an idempotent request
+      once on a fresh connection if a reused one fails before any response arrives.
+    - Every send and receive on a pooled socket times out after `response_timeout` seconds of
+      silence (socket.timeout), so an origin that accepts a request and never answers frees the
+      handler instead of holding it forever. The caller must discard such a connection.
+    - With a `resolver` (see Resolver.py), origin names are looked up through its cache when a new
+      connection is opened; reusing an idle connection needs no lookup at all.
+    - Idle connections are kept per origin in last-in first-out order, so the warmest connection is
+      reused first and the rest can age out.
+"""
+
+import socket
+import time
+import threading
+
+MAX_PER_HOST = 8            # Open connections (idle + in use) allowed to one origin
+IDLE_TIMEOUT = 30.0         # Seconds an idle connection is kept before it is closed
+MAX_REQUESTS = 1000         # Requests sent on one connection before it is retired
+CONNECT_TIMEOUT = 10.0      # Seconds allowed for the TCP handshake with an origin
+CHECKOUT_TIMEOUT = 30.0     # Seconds a handler waits for a connection when an origin is at its limit
+RESPONSE_TIMEOUT = 30.0     # Seconds an origin may go silent while a request is sent or its response read
+
+class PoolTimeout(ConnectionError):
+    """No connection to an origin became available within the checkout timeout."""
+
+class PooledConnection:
+    """One upstream TCP connection and its usage bookkeeping."""
+
+    def __init__(self, sock, key):
+        self.sock = sock
+        self.key = key                  # (host, port) of the origin
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.requests = 0               # Requests sent on this connection so far
+        self.reused = False             # True if this checkout came from the idle list
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+class UpstreamPool:
+    """Per-origin pool of idle keep-alive connections with a limit on open connections."""
+
+    def __init__(self, max_per_host=MAX_PER_HOST, idle_timeout=IDLE_TIMEOUT, max_requests=MAX_REQUESTS,
+                 connect_timeout=CONNECT_TIMEOUT, checkout_timeout=CHECKOUT_TIMEOUT, resolver=None,
+                 response_timeout=RESPONSE_TIMEOUT):
+        self.max_per_host = max(1, max_per_host)
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        self.connect_timeout = connect_timeout
+        self.checkout_timeout = checkout_timeout
+        self.response_timeout = response_timeout    # None lets a silent origin hold its handler forever
+        self.resolver = resolver        # Resolver.Resolver used for new connections (None: the OS directly)
+        self.idle = {}                  # (host, port) -> list of idle PooledConnections, newest last
+        self.open = {}                  # (host, port) -> connections open (idle + in use)
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+        self.last_sweep = time.monotonic()
+        self.counters = {"created": 0, "reused": 0, "released": 0, "expired": 0, "unhealthy": 0,
+                         "discarded": 0, "waits": 0, "timeouts": 0}
+
+    def acquire(self, host, port):
+        """Return a healthy connection to (host, port), reusing an idle one when possible."""
+        key = (host, port)
+        deadline = time.monotonic() + self.checkout_timeout
+        with self.lock:
+            while True:
+                conn = self._take_idle(key)
+                if conn is not None:
+                    self.counters["reused"] += 1
+                    conn.reused = True
+                    conn.requests += 1
+                    return conn
+                if self.open.get(key, 0) < self.max_per_host:
+                    self.open[key] = self.open.get(key, 0) + 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.counters["timeouts"] += 1
+                    raise PoolTimeout(f"no connection to {host}:{port} available within {self.checkout_timeout}s")
+                self.counters["waits"] += 1
+                self.available.wait(remaining)
+
+        # Resolve and connect outside the lock; the slot reserved above is given back if either fails
+        try:
+            address = host if self.resolver is None else self.resolver.gethostbyname(host, self.connect_timeout)
+            sock = socket.create_connection((address, port), timeout=self.connect_timeout)
+            sock.settimeout(self.response_timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            with self.lock:
+                self._forget(key)
+            raise
+        conn = PooledConnection(sock, key)
+        conn.requests = 1
+        with self.lock:
+            self.counters["created"] += 1
+        return conn
+
+    def release(self, conn, reusable=True):
+        """Return a connection after its response was read completely; closes it if it cannot be reused."""
+        if not reusable or conn.requests >= self.max_requests:
+            self.discard(conn)
+            return
+        with self.lock:
+            conn.last_used = time.monotonic()
+            conn.reused = False
+            self.idle.setdefault(conn.key, []).append(conn)
+            self.counters["released"] += 1
+            self.available.notify()
+            if conn.last_used - self.last_sweep > self.idle_timeout / 2:
+                self._sweep(conn.last_used)
+
+    def discard(self, conn):
+        """Close a connection that is broken or must not be reused."""
+        conn.close()
+        with self.lock:
+            self.counters["discarded"] += 1
+            self._forget(conn.key)
+
+    def close(self):
+        """Close every idle connection."""
+        with self.lock:
+            for key, conns in self.idle.items():
+                for conn in conns:
+                    conn.close()
+                    self.open[key] -= 1
+            self.idle.clear()
+
+    def stats(self):
+        """Return a snapshot of the pool counters and connection gauges."""
+        with self.lock:
+            stats = dict(self.counters)
+            idle = sum(len(conns) for conns in self.idle.values())
+            stats.update(open=sum(self.open.values()), idle=idle, in_use=sum(self.open.values()) - idle,
+                         origins=len([key for key, count in self.open.items() if count]))
+            return stats
+
+    # Callers hold self.lock
+
+    def _take_idle(self, key):
+        # Pop the most recently used idle connection that is still fresh and healthy
+        conns = self.idle.get(key)
+        now = time.monotonic()
+        while conns:
+            conn = conns.pop()
+            if now - conn.last_used > self.idle_timeout:
+                self.counters["expired"] += 1
+            elif not self._healthy(conn):
+                self.counters["unhealthy"] += 1
+            else:
+                return conn
+            conn.close()
+            self._forget(key, notify=False)
+        return None
+
+    def _sweep(self, now):
+        # Close idle connections that expired on origins nobody has asked for since
+        self.last_sweep = now
+        for key, conns in list(self.idle.items()):
+            expired = [conn for conn in conns if now - conn.last_used > self.idle_timeout]
+            if not expired:
+                continue
+            conns[:] = [conn for conn in conns if now - conn.last_used <= self.idle_timeout]
+            for conn in expired:
+                conn.close()
+                self.counters["expired"] += 1
+                self._forget(key, notify=False)
+
+    def _healthy(self, conn):
+        # An idle keep-alive connection must have nothing to read: EOF, errors or stray bytes all
+        # mean the origin no longer expects a request on it
+        try:
+            conn.sock.setblocking(False)
+            try:
+                conn.sock.recv(1, socket.MSG_PEEK)
+            finally:
+                conn.sock.settimeout(self.response_timeout)
+        except (BlockingIOError, InterruptedError):
+            return True
+        except OSError:
+            return False
+        return False
+
+    def _forget(self, key, notify=True):
+        self.open[key] -= 1
+        if not self.open[key]:
+            del self.open[key]
+            self.idle.pop(key, None)
+        if notify:
+            self.available.notify()
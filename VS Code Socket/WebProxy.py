@@ -11,7 +11,14 @@ Course: COSC 370 - Computer Networks
 Instructor: Dr. Enyue Lu
 
 Usage:
-    1. Run this program to start the proxy server.
+    1. Run this program to start the proxy server:
+           python WebProxy.py [--host HOST] [--port PORT] [--backlog N] [--processes N]
+                              [--cache-dir DIR] [--cache-memory BYTES] [--cache-disk BYTES]
+                              [--stale-while-revalidate SECONDS] [--no-cache]
+                              [--upstream-max-per-host N] [--upstream-idle-timeout SECONDS]
+                              [--upstream-timeout SECONDS] [--client-timeout SECONDS]
+                              [--workers N] [--queue-size N] [--overload reject|delay]
+                              [--stats-interval SECONDS] [--no-collapse]
     2. The proxy server will listen on the specified host and port for incoming HTTP requests.
     3. Clients can configure their browser or HTTP client to use this proxy server.
     4. The proxy server will forward client requests to the destination server and return the responses.
@@ -21,73 +28,606 @@ Requirements:
     - The `socket` and `threading` libraries for network communication and multithreading.
 
 Notes:
-    - The proxy server listens on the specified host and port defined in the `startProxyServer` function.
+    - The proxy server listens on the specified host and port defined in the `startProxyServer` function
+      unless they are overridden on the command line.
+    - With --processes N, a prefork supervisor (see Prefork.py) runs N worker processes that share the
+      port through SO_REUSEPORT, restarts crashed workers, replaces them on SIGHUP and drains them on
+      SIGTERM.
     - This program is for educational purposes and is not intended for production use.
-    - The proxy server does not support HTTPS or advanced HTTP features.
+    - Client requests are read with the incremental parser in HTTPParser.py, so requests split
+      across TCP segments and requests with bodies are forwarded intact.
+    - Responses are streamed to the client until their Content-Length, chunked framing or the
+      origin's EOF says they are complete, using one preallocated buffer per handler thread
+      (`recv_into` + memoryview), so large downloads are relayed in full without per-chunk copies.
+    - GET responses are cached according to Cache-Control, Expires and Vary (see ProxyCache.py):
+      fresh copies are answered without contacting the origin, stale ones are revalidated with
+      If-None-Match/If-Modified-Since, and stale-while-revalidate copies are served at once while
+      a background thread refreshes them. Bodies live in memory and, with --cache-dir, in a
+      content-addressed disk store whose index survives restarts.
+    - Collapsed forwarding (see CollapsedForwarding.py): while one client's cache miss or
+      revalidation of a URL is in flight, other clients asking for the same URL wait on it and
+      receive its response as it streams instead of sending their own upstream requests. Only
+      responses the cache could store and whose Vary'd headers match are shared.
+    - Each process handles clients with a fixed pool of --workers threads fed from a queue of at most
+      --queue-size accepted connections. When the queue is full the proxy sheds load: it answers
+      503 with Retry-After (--overload reject) or stops accepting until a slot frees up, leaving new
+      clients in the kernel backlog (--overload delay). Queue depth, active workers and shed clients
+      are printed every --stats-interval seconds and on shutdown.
+    - Requests are forwarded over keep-alive connections from a per-origin pool (see UpstreamPool.py)
+      instead of a new TCP connection each, with at most --upstream-max-per-host connections open to
+      one origin. Idle connections expire after --upstream-idle-timeout seconds and are health-checked
+      before reuse; the pool counters are printed on shutdown.
+    - A client that sends nothing for --client-timeout seconds while its request is read gets 408
+      Request Timeout, and an origin that sends nothing for --upstream-timeout seconds before its
+      response head gets 504 Gateway Timeout; a stall later in a response closes the connection.
+      Either way the handler thread is freed instead of being held by a silent peer.
+    - Origin names are resolved through the shared caching resolver in Resolver.py, so a slow DNS
+      server only delays the requests that need that name and repeated names skip the OS resolver.
+    - CONNECT host:port requests (how clients send HTTPS through a proxy) open a tunnel to the
+      target. The selector-driven pump in Tunnel.py relays both directions from one thread with
+      large reusable buffers and passes half-closes through. A tunnel holds its worker thread until
+      it closes. `python Tunnel.py` benchmarks the pump against a local echo server.
+    - The proxy server does not inspect tunneled traffic and does not support advanced HTTP features.
 """
 
 import socket   # Import socket library
 import sys  # Import sys library for command-line arguments
 import threading    # Import threading library for multithreading
+import signal   # Import signal library for graceful shutdown
+import argparse     # Import argparse library for command-line options
+import queue    # Import queue library for the bounded queue of accepted clients
+import time     # Import time library for the gauge reporting interval
+
+from HTTPParser import HTTPParser, HTTPParseError, BodyFramer, parse_response_head, MAX_HEADER_SIZE   # Shared HTTP parsing
+from Prefork import Supervisor, create_listener, DRAIN_TIMEOUT  # Shared prefork supervisor
+from ProxyCache import ProxyCache, FRESH, STALE_WHILE_REVALIDATE, STALE, MISS, MEMORY_BYTES, DISK_BYTES   # HTTP cache
+from UpstreamPool import UpstreamPool, MAX_PER_HOST, IDLE_TIMEOUT, RESPONSE_TIMEOUT   # Keep-alive connections to origins
+from Resolver import shared_resolver     # Cached, thread-pool DNS lookups
+from Tunnel import pump     # Full-duplex relay for CONNECT tunnels
+from CollapsedForwarding import Collapser, STREAMED, NOT_STREAMED, FAILED  # One upstream fetch for concurrent misses
+
+RELAY_BUFFER_SIZE = 256 * 1024  # Bytes moved per recv_into() while relaying a response
+WORKERS = 64        # Handler threads per proxy process
+QUEUE_SIZE = 256    # Accepted clients allowed to wait for a free handler thread
+CONNECT_TIMEOUT = 10.0  # Seconds allowed to reach the target of a CONNECT tunnel
+CLIENT_TIMEOUT = 30.0   # Seconds a client may go silent while its request is read or a response sent to it
+
+#Sent to clients that arrive while every worker is busy and the queue is full
+SHED_RESPONSE = b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 1\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+#Shared HTTP cache of this proxy process (None disables caching); set up by startProxyServer
+proxyCache = None
+
+#In-flight upstream fetches that concurrent requests for the same URL can follow (None disables
+#collapsed forwarding); set up by startProxyServer
+collapser = None
+
+#Request fields that make a response specific to one client, so such requests never share a fetch
+UNSHARED_REQUEST_FIELDS = ("authorization", "range", "if-range", "if-match", "if-none-match",
+                           "if-modified-since", "if-unmodified-since")
+
+#Idle keep-alive connections to origin servers, shared by the handler threads; set up by startProxyServer
+upstreamPool = None
+
+#Each handler thread keeps one relay buffer and reuses it for every response it relays
+threadState = threading.local()
+
+def relayBuffer():
+    buffer = getattr(threadState, "buffer", None)
+    if buffer is None:
+        buffer = threadState.buffer = bytearray(RELAY_BUFFER_SIZE)
+    return buffer
+
+#Read a response head from the origin. Returns (response, data, end) where data holds the head
+#followed by any body bytes that arrived with it and end is the length of the head.
+#Interim 1xx responses are passed to clientSocket (if any) and skipped.
+def readResponseHead(serverSocket, buffer, clientSocket=None):
+    view = memoryview(buffer)
+    head = bytearray()
+    while True:
+        #Read until the response head is complete; it may arrive with the start of the body
+        end = head.find(b"\r\n\r\n")
+        if end < 0:
+            if len(head) > MAX_HEADER_SIZE:
+                raise HTTPParseError(502, "Bad Gateway")
+            received = serverSocket.recv_into(buffer)
+            if received == 0:
+                raise ConnectionError("origin closed the connection before sending a response")
+            head += view[:received]
+            continue
+        response = parse_response_head(head[:end + 4])
+        if 100 <= response.status < 200 and response.status != 101:
+            #Interim response (e.g. 100 Continue): pass it on and read the final one
+            if clientSocket is not None:
+                clientSocket.sendall(head[:end + 4])
+            del head[:end + 4]
+            continue
+        return response, head, end + 4
+
+#Stream a response body from the origin to the client (if any) until its framing says it is complete.
+#With capture=True the relayed body is also collected and returned (None if it grew too large).
+def relayBody(serverSocket, clientSocket, framer, data, headEnd, buffer, capture=False, captureLimit=0):
+    view = memoryview(buffer)
+    body = bytearray() if capture else None
+
+    #Send the head plus whatever part of the body arrived with it
+    used = framer.consume(memoryview(data)[headEnd:])
+    if clientSocket is not None:
+        clientSocket.sendall(memoryview(data)[:headEnd + used])
+    if body is not None:
+        body += memoryview(data)[headEnd:headEnd + used]
+
+    #Pump the rest of the body through the reusable buffer without per-chunk allocations
+    while not framer.done:
+        received = serverSocket.recv_into(buffer)
+        if received == 0:
+            if framer.mode == "eof":
+                break
+            raise ConnectionError("origin closed the connection in the middle of the body")
+        used = framer.consume(view[:received])
+        if clientSocket is not None:
+            clientSocket.sendall(view[:used])
+        if body is not None:
+            body += view[:used]
+            if len(body) > captureLimit:
+                body = None     #Too large to cache; keep relaying without collecting
+    return bytes(body) if body is not None else None
+
+#Methods a reused upstream connection may safely be retried for if the origin dropped it while idle
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "TRACE", "PUT", "DELETE"}
+
+#Rebuild a request with some header fields replaced (e.g. validators for revalidation); None drops a field
+def requestWithHeaders(request, extraHeaders):
+    lines = request.head.rstrip(b"\r\n").split(b"\r\n")
+    replaced = {name.lower().encode() for name in extraHeaders}
+    kept = [line for line in lines[1:] if line.partition(b":")[0].strip().lower() not in replaced]
+    added = [f"{name}: {value}".encode('iso-8859-1') for name, value in extraHeaders.items() if value is not None]
+    head = b"\r\n".join([lines[0]] + kept + added) + b"\r\n\r\n"
+    return head + request.to_bytes()[len(request.head):]
+
+#The bytes to send upstream: the client's hop-by-hop fields are replaced so the origin keeps the
+#pooled connection open
+def upstreamRequest(request, extraHeaders=None):
+    headers = {"Connection": "keep-alive", "Proxy-Connection": None, "Keep-Alive": None}
+    headers.update(extraHeaders or {})
+    return requestWithHeaders(request, headers)
+
+#Answer a request from a cache entry; returns False if the stored body has gone missing
+def sendCached(clientSocket, request, entry):
+    body = proxyCache.read_body(entry)
+    if body is None:
+        return False
+    if entry.etag and request.headers.get("if-none-match") == entry.etag:
+        clientSocket.sendall(b"HTTP/1.1 304 Not Modified\r\nETag: " + entry.etag.encode('iso-8859-1') + b"\r\n\r\n")
+    else:
+        clientSocket.sendall(proxyCache.replay_head(entry) + body)
+    return True
+
+#Find the origin server named by a request URL
+def originOf(url):
+    #Extract the domain from the URL 
+    host = url.split("//")[1].split("/")[0]
+    port = 80 #default HTTP port
+    if ":" in host:
+        host, port = host.rsplit(":", 1)
+        port = int(port)
+    return host, port
+
+#Send a request to its origin over a pooled connection and read the response head.
+#Returns (conn, response, data, headEnd); the caller hands conn back with finishExchange.
+def exchange(request, url, requestBytes, clientSocket=None):
+    host, port = originOf(url)
+    for attempt in (1, 2):
+        conn = upstreamPool.acquire(host, port)
+        try:
+            conn.sock.sendall(requestBytes)
+            response, data, headEnd = readResponseHead(conn.sock, relayBuffer(), clientSocket)
+            return conn, response, data, headEnd
+        except Exception as e:
+            upstreamPool.discard(conn)
+            #An origin that accepted the request but stays silent is not retried: it would only stall again
+            if isinstance(e, socket.timeout):
+                raise HTTPParseError(504, "Gateway Timeout") from e
+            #The origin may close an idle connection just as we reuse it; try once more on another one
+            if not (isinstance(e, OSError) and conn.reused and request.method in IDEMPOTENT_METHODS and attempt == 1):
+                raise
+
+#Relay the rest of a response to the client (if any), then return the connection to the pool when
+#both sides allow it to carry another request. Returns the captured body like relayBody.
+def finishExchange(conn, request, response, data, headEnd, clientSocket, capture=False, captureLimit=0):
+    try:
+        framer = BodyFramer(request.method, response)   #Rejects a malformed Content-Length with 502
+        body = relayBody(conn.sock, clientSocket, framer, data, headEnd, relayBuffer(), capture, captureLimit)
+    except Exception:
+        upstreamPool.discard(conn)
+        raise
+    upstreamPool.release(conn, response.keep_alive and framer.done and framer.mode != "eof")
+    return body
+
+#Socket stand-in for the leader of a collapsed fetch: the final response relayed to its client is
+#also published to the followers
+class FanOut:
+    def __init__(self, clientSocket, flight):
+        self.clientSocket = clientSocket
+        self.flight = flight
+
+    def sendall(self, data):
+        #Interim 1xx heads come before flight.start() and answer only our client's request
+        if self.flight.response is not None:
+            self.flight.publish(data)
+        if self.clientSocket is None:
+            return
+        try:
+            self.clientSocket.sendall(data)
+        except OSError:
+            if not self.flight.has_followers():
+                raise
+            self.clientSocket = None    #our client left; keep relaying for the followers
+
+#Answer a request from another client's in-flight fetch of the same URL as its bytes arrive.
+#Returns False if that fetch cannot answer this request (nothing has been sent to the client then).
+def followFlight(clientSocket, request, flight):
+    token = flight.join()
+    if token is None:
+        return False
+    try:
+        if flight.head() is None or not flight.matches(request):
+            return False
+        while True:
+            data = flight.read(token)
+            if data is None:
+                return True
+            clientSocket.sendall(data)
+    finally:
+        flight.leave(token)
+
+#Refresh a stale cache entry in the background after the stale copy was served (RFC 5861)
+def revalidateInBackground(request, url, entry):
+    try:
+        conn, response, data, headEnd = exchange(request, url, upstreamRequest(request, proxyCache.conditional_headers(entry)))
+        if response.status == 304:
+            finishExchange(conn, request, response, data, headEnd, None)
+            proxyCache.refresh(entry, response)
+        else:
+            body = finishExchange(conn, request, response, data, headEnd, None, True, proxyCache.max_object_size)
+            proxyCache.store(request, url, response, body)
+    except Exception as e:
+        print(f"Background revalidation of {url} failed: {e}")
+    finally:
+        proxyCache.end_revalidation(entry)
+
+#Open a CONNECT tunnel (e.g. for HTTPS) and relay bytes both ways until both sides are done.
+#early holds any bytes the client sent after the CONNECT head without waiting for our answer.
+def connectTunnel(clientSocket, request, early):
+    host, sep, port = request.target.rpartition(":")
+    if not sep or not host or not port.isdigit():
+        raise HTTPParseError(400, "Bad Request")
+    host = host.strip("[]")
+    try:
+        address = shared_resolver().gethostbyname(host)
+        serverSocket = socket.create_connection((address, int(port)), timeout=CONNECT_TIMEOUT)
+    except OSError as e:
+        print(f"CONNECT to {request.target} failed: {e}")
+        clientSocket.sendall(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+        clientSocket.close()
+        return
+
+    with serverSocket:
+        serverSocket.settimeout(None)
+        clientSocket.sendall(b"HTTP/1.1 200 Connection Established\r\n\r\n")
+        if early:
+            serverSocket.sendall(early)
+        sentUp, sentDown = pump(clientSocket, serverSocket)
+    print(f"Tunnel to {request.target} closed ({len(early) + sentUp} bytes up, {sentDown} bytes down)")
+    clientSocket.close()
 
 #Function to handle the client connection
 def handleClient(clientSocket):
     try:
-        #Receive the HTTP request from the client
-        request = clientSocket.recv(1024).decode()
+        #Receive the HTTP request from the client, however many segments it arrives in
+        parser = HTTPParser()
+        request = None
+        while request is None:
+            try:
+                data = clientSocket.recv(65536)
+            except socket.timeout:
+                raise HTTPParseError(408, "Request Timeout")    #the worker is not held by an idle client
+            if not data:
+                clientSocket.close()
+                return
+            parser.feed(data)
+            request = parser.next_request()
 
         #Print the HTTP request (for debugging)
-        print(f"Request received:\n{request}")
+        print(f"Request received:\n{request.head.decode('iso-8859-1')}")
 
-        #Parse the HTTP request to extract destination host and path
-        lines = request.split("\r\n")
-        url = lines[0].split(" ")[1] #get URL from first line
+        #CONNECT host:port asks for a raw byte tunnel instead of a proxied request
+        if request.method == "CONNECT":
+            connectTunnel(clientSocket, request, parser.take_pending())
+            return
 
-        #Extract the domain from the URL 
-        host = url.split("//")[1].split("/")[0]
-        port = 80 #default HTTP port
+        #Get the URL from the request line
+        url = request.target
 
-        #Create a socket to communicate with origin server
-        serverSocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        serverSocket.connect((host, port))
+        #Answer from the cache when a usable copy is stored
+        entry, state = None, MISS
+        if proxyCache is not None and request.method == "GET":
+            entry, state = proxyCache.lookup(request, url)
+            if state in (FRESH, STALE_WHILE_REVALIDATE) and sendCached(clientSocket, request, entry):
+                if state == STALE_WHILE_REVALIDATE and proxyCache.begin_revalidation(entry):
+                    threading.Thread(target=revalidateInBackground, args=(request, url, entry), daemon=True).start()
+                clientSocket.close()
+                return
 
-        #Forward the HTTP request to the origin server
-        serverSocket.send(request.encode())
+        capture = proxyCache is not None and request.method == "GET"
+        captureLimit = proxyCache.max_object_size if capture else 0
 
-        #Receive the response from the origin server
-        response = serverSocket.recv(4096)
+        #Concurrent requests for a URL we must fetch share one upstream request (collapsed forwarding)
+        flight = None
+        if capture and collapser is not None and not any(field in request.headers for field in UNSHARED_REQUEST_FIELDS):
+            flight, leader = collapser.begin(url, request)
+            if not leader:
+                if followFlight(clientSocket, request, flight):
+                    clientSocket.close()
+                    return
+                #That fetch could not answer us; it may have refreshed the cache, else fetch ourselves
+                flight = None
+                entry, state = proxyCache.lookup(request, url)
+                if state in (FRESH, STALE_WHILE_REVALIDATE) and sendCached(clientSocket, request, entry):
+                    clientSocket.close()
+                    return
+        sink = clientSocket if flight is None else FanOut(clientSocket, flight)
 
-        #Send the response back to the client
-        clientSocket.send(response)
+        outcome = FAILED
+        try:
+            if state == STALE:
+                #Ask the origin whether our stale copy is still good
+                conn, response, data, headEnd = exchange(request, url, upstreamRequest(request, proxyCache.conditional_headers(entry)),
+                                                         sink)
+                if response.status == 304:
+                    finishExchange(conn, request, response, data, headEnd, None)
+                    proxyCache.refresh(entry, response)
+                    outcome = NOT_STREAMED
+                    if not sendCached(clientSocket, request, entry):
+                        raise ConnectionError("cached body disappeared during revalidation")
+                    body = None
+                else:
+                    if flight is not None:
+                        flight.start(response, proxyCache.storable(request, response))
+                    body = finishExchange(conn, request, response, data, headEnd, sink, capture, captureLimit)
+                    outcome = STREAMED
+            else:
+                #Forward the HTTP request to the origin server over a pooled connection
+                conn, response, data, headEnd = exchange(request, url, upstreamRequest(request), sink)
+                if flight is not None:
+                    flight.start(response, proxyCache.storable(request, response))
+
+                #Stream the complete response from the origin server back to the client
+                body = finishExchange(conn, request, response, data, headEnd, sink, capture, captureLimit)
+                outcome = STREAMED
+        finally:
+            if flight is not None:
+                collapser.end(flight, outcome)
+
+        if proxyCache is not None:
+            if capture and body is not None:
+                proxyCache.store(request, url, response, body)
+            elif request.method not in ("GET", "HEAD", "OPTIONS", "TRACE") and response.status < 400:
+                proxyCache.invalidate(url)
+
+        #close the client socket; the upstream connection went back to the pool
+        clientSocket.close()
 
-        #close the sockets
-        serverSocket.close()
+    except HTTPParseError as e:
+        print(f"Bad message: {e}")
+        try:
+            clientSocket.sendall(f"HTTP/1.1 {e.status} {e.reason}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+        except OSError:
+            pass    #the client is already gone (e.g. reset after a malformed request)
         clientSocket.close()
 
     except Exception as e:
         print(f"Error handling client: {e}")
         clientSocket.close()
 
-def startProxyServer(host = 'localhost', port = 8080):
-    #Create a TCP socket for the proxy server
-    proxySocket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    proxySocket.bind((host, port))
-    proxySocket.listen(5)
+#Fixed set of handler threads fed from a bounded queue of accepted client sockets
+class WorkerPool:
+    def __init__(self, workers = WORKERS, queueSize = QUEUE_SIZE):
+        self.queue = queue.Queue(queueSize)
+        self.lock = threading.Lock()
+        self.active = 0         #workers currently handling a client
+        self.accepted = 0       #clients queued for a worker
+        self.shed = 0           #clients turned away with 503 because the queue was full
+        self.threads = [threading.Thread(target=self.run, name=f"proxy-worker-{i}", daemon=True)
+                        for i in range(max(1, workers))]
+        for thread in self.threads:
+            thread.start()
 
-    print(f"Proxy server listening on {host}:{port}")
+    #Queue a client for the next free worker; returns False if the queue stayed full for `timeout` seconds
+    def submit(self, clientSocket, timeout = None):
+        try:
+            if timeout is None:
+                self.queue.put_nowait(clientSocket)
+            else:
+                self.queue.put(clientSocket, timeout=timeout)
+        except queue.Full:
+            return False
+        with self.lock:
+            self.accepted += 1
+        return True
+
+    #Answer a client we have no room for without blocking the accept loop
+    def reject(self, clientSocket):
+        with self.lock:
+            self.shed += 1
+        try:
+            clientSocket.setblocking(False)
+            clientSocket.send(SHED_RESPONSE)
+        except OSError:
+            pass
+        clientSocket.close()
+
+    def run(self):
+        while True:
+            clientSocket = self.queue.get()
+            if clientSocket is None:
+                return
+            with self.lock:
+                self.active += 1
+            try:
+                handleClient(clientSocket)
+            except Exception as e:
+                #A bug or unexpected error must not cost the pool this worker thread
+                print(f"Worker {threading.current_thread().name} recovered from {type(e).__name__}: {e}")
+                try:
+                    clientSocket.close()
+                except OSError:
+                    pass
+            finally:
+                with self.lock:
+                    self.active -= 1
+
+    #Snapshot of the queue depth and worker gauges
+    def gauges(self):
+        with self.lock:
+            return {"queueDepth": self.queue.qsize(), "queueSize": self.queue.maxsize,
+                    "activeWorkers": self.active, "workers": len(self.threads),
+                    "accepted": self.accepted, "shed": self.shed}
+
+    #Let the workers finish the queued clients, then stop them
+    def shutdown(self, timeout = DRAIN_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        for thread in self.threads:
+            try:
+                self.queue.put(None, timeout=max(0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for thread in self.threads:
+            thread.join(max(0, deadline - time.monotonic()))
+
+#Accept clients on a listening socket until stopEvent is set, then wait for in-flight clients.
+#Accepted clients wait in a bounded queue for one of `workers` handler threads; when the queue is
+#full, overload="reject" answers 503 at once and overload="delay" stops accepting until there is room
+#(new clients then wait in the kernel's accept queue).
+def serveProxy(proxySocket, stopEvent, workers = WORKERS, queueSize = QUEUE_SIZE, overload = "reject", statsInterval = 0,
+               clientTimeout = CLIENT_TIMEOUT):
+    proxySocket.settimeout(1.0)     #wake up regularly to check for shutdown
+    pool = WorkerPool(workers, queueSize)
+    nextStats = time.monotonic() + statsInterval
+
+    while not stopEvent.is_set():
+        if statsInterval and time.monotonic() >= nextStats:
+            print(f"Proxy gauges: {pool.gauges()}")
+            nextStats += statsInterval
 
-    while True:
         #Accept a client connection
-        clientSocket, addr = proxySocket.accept()
+        try:
+            clientSocket, addr = proxySocket.accept()
+        except socket.timeout:
+            continue
+        except InterruptedError:
+            continue
+        clientSocket.settimeout(clientTimeout)   #every blocking recv/send on the client gives up after this
         print(f"Accepted connection from {addr}")
 
-        #Handle the client connection in a separate thread
-        clientThread = threading.Thread(target=handleClient, args=(clientSocket,))
-        clientThread.start()
+        #Hand the client connection to the worker pool, or shed it when the pool is saturated
+        if pool.submit(clientSocket):
+            continue
+        if overload == "delay":
+            while not stopEvent.is_set() and not pool.submit(clientSocket, timeout=1.0):
+                pass
+            if not stopEvent.is_set():
+                continue
+        pool.reject(clientSocket)
+
+    #Drain: stop accepting and let the requests already in progress finish
+    proxySocket.close()
+    pool.shutdown(DRAIN_TIMEOUT)
+    print(f"Proxy gauges: {pool.gauges()}")
+    if proxyCache is not None:
+        proxyCache.close()    #write the cache index so the disk tier survives a restart
+    print(f"Upstream connection pool: {upstreamPool.stats()}")
+    if collapser is not None:
+        print(f"Collapsed forwarding: {collapser.stats()}")
+    if upstreamPool.resolver is not None:
+        print(f"DNS cache: {upstreamPool.resolver.stats()}")
+    upstreamPool.close()
+
+def startProxyServer(host = 'localhost', port = 8080, processes = 1, backlog = 128, cache = None, pool = None,
+                     workers = WORKERS, queueSize = QUEUE_SIZE, overload = "reject", statsInterval = 0,
+                     collapse = True, clientTimeout = CLIENT_TIMEOUT):
+    global proxyCache, upstreamPool, collapser
+    proxyCache = cache
+    collapser = Collapser() if cache is not None and collapse else None
+    upstreamPool = pool if pool is not None else UpstreamPool(resolver=shared_resolver())
+
+    def serve(proxySocket, stopEvent):
+        serveProxy(proxySocket, stopEvent, workers, queueSize, overload, statsInterval, clientTimeout)
+
+    #Several processes: a prefork supervisor runs one accept loop per worker process
+    if processes > 1:
+        print(f"Proxy server listening on {host}:{port} with {processes} worker processes")
+        supervisor = Supervisor(lambda reusePort: create_listener(host, port, backlog, reusePort),
+                                serve, processes)
+        supervisor.run()
+        return
+
+    #Create a TCP socket for the proxy server
+    proxySocket = create_listener(host, port, backlog)
+
+    print(f"Proxy server listening on {host}:{port}")
+
+    #SIGTERM and Ctrl-C stop accepting and let in-flight requests finish
+    stopEvent = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopEvent.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stopEvent.set())
+    serve(proxySocket, stopEvent)
+
+#Parse the command line options for the proxy
+def parseArgs(argv=None):
+    parser = argparse.ArgumentParser(description="Simple HTTP forward proxy")
+    parser.add_argument("--host", default="localhost", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on")
+    parser.add_argument("--backlog", type=int, default=128, help="length of the kernel accept queue")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="worker processes forked by a prefork supervisor (1 runs in-process)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="handler threads per process")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE,
+                        help="accepted clients allowed to wait for a handler thread")
+    parser.add_argument("--overload", choices=("reject", "delay"), default="reject",
+                        help="when the queue is full: answer 503 (reject) or stop accepting until there is room (delay)")
+    parser.add_argument("--stats-interval", type=float, default=0,
+                        help="seconds between printed queue/worker gauges (0 disables)")
+    parser.add_argument("--no-collapse", action="store_true",
+                        help="fetch every cache miss separately instead of sharing concurrent fetches of a URL")
+    parser.add_argument("--upstream-max-per-host", type=int, default=MAX_PER_HOST,
+                        help="open connections allowed to each origin server")
+    parser.add_argument("--upstream-idle-timeout", type=float, default=IDLE_TIMEOUT,
+                        help="seconds an idle upstream connection is kept for reuse")
+    parser.add_argument("--upstream-timeout", type=float, default=RESPONSE_TIMEOUT,
+                        help="seconds an origin may stay silent before the request fails (504 before the response head)")
+    parser.add_argument("--client-timeout", type=float, default=CLIENT_TIMEOUT,
+                        help="seconds a client may stay silent while its request is read (408) or a response is sent")
+    parser.add_argument("--no-cache", action="store_true", help="relay every request to the origin")
+    parser.add_argument("--cache-dir", default=None,
+                        help="directory for the on-disk cache tier and its index (memory only if omitted)")
+    parser.add_argument("--cache-memory", type=int, default=MEMORY_BYTES, help="bytes of responses kept in memory")
+    parser.add_argument("--cache-disk", type=int, default=DISK_BYTES, help="bytes of responses kept on disk")
+    parser.add_argument("--stale-while-revalidate", type=float, default=0,
+                        help="seconds a stale response may be served while it is refreshed, "
+                             "when the origin does not say")
+    return parser.parse_args(argv)
 
 #Entry point for the script
 if __name__ == "__main__":
-    #Start the proxy server on the default host and port
-    startProxyServer()
-
-    
\ No newline at end of file
+    #Start the proxy server on the default host and port unless overridden on the command line
+    args = parseArgs()
+    cache = None
+    if not args.no_cache:
+        cache = ProxyCache(args.cache_dir, args.cache_memory, args.cache_disk,
+                           default_stale_while_revalidate=args.stale_while_revalidate)
+    pool = UpstreamPool(args.upstream_max_per_host, args.upstream_idle_timeout, resolver=shared_resolver(),
+                        response_timeout=args.upstream_timeout)
+    startProxyServer(args.host, args.port, max(1, args.processes), args.backlog, cache, pool,
+                     args.workers, args.queue_size, args.overload, args.stats_interval, not args.no_collapse,
+                     args.client_timeout)
@@ -11,94 +11,722 @@ Course: COSC 370 - Computer Networks
 Instructor: Dr. Enyue Lu
 
 Usage:
-    1. Run this program to start the web server.
+    1. Run this program to start the web server:
+           python WebServer.py [--host HOST] [--port PORT] [--backlog N] [--workers N] [--processes N]
+                               [--keepalive-timeout SECONDS] [--max-requests N]
+                               [--cache-size BYTES] [--cache-max-file BYTES] [--cache-check-interval SECONDS]
     2. The server will listen on the specified host and port for incoming HTTP requests.
     3. Clients can connect to the server using a web browser or an HTTP client (e.g., curl).
     4. The server will serve static files from the current working directory.
 
 Requirements:
     - Python 3.x
-    - The `socket` and `os` libraries for network communication and file handling.
+    - The `socket`, `selectors` and `os` libraries for network communication and file handling.
 
 Notes:
-    - The server listens on the specified host and port defined in the `HOST` and `PORT` variables.
+    - The server listens on the specified host and port defined in the `HOST` and `PORT` variables
+      unless they are overridden on the command line.
+    - The server runs until manually stopped. Each worker thread runs its own `selectors` event loop
+      over the shared non-blocking listening socket, so one worker multiplexes many clients at once.
+    - With --processes N, a prefork supervisor (see Prefork.py) runs N worker processes that share
+      the port through SO_REUSEPORT, restarts crashed workers, replaces them gracefully on SIGHUP,
+      and drains them on SIGTERM. SIGTERM or Ctrl-C always lets queued responses finish first.
+    - Connections are persistent (HTTP/1.1 keep-alive) unless the client sends `Connection: close`
+      or speaks HTTP/1.0 without `Connection: keep-alive`. Pipelined requests are answered in order,
+      idle connections are closed after the keep-alive timeout, and a connection is closed after
+      serving the maximum number of requests.
+    - File bodies are streamed with `os.sendfile` (zero-copy) where available, falling back to
+      chunked reads into a reusable buffer. Single `Range: bytes=` requests are answered with
+      `206 Partial Content`, and unsatisfiable ranges with `416 Range Not Satisfiable`.
+    - Small files are served from an in-memory LRU cache (see StaticCache.py) that is revalidated
+      against the file's mtime and size; hit/miss/eviction counters are printed at shutdown.
+    - Responses carry a Content-Type guessed from the file extension plus ETag and Last-Modified
+      validators; `If-None-Match` / `If-Modified-Since` revalidations are answered with
+      `304 Not Modified` and no body.
+    - Text-like files are sent gzip- or deflate-encoded when the client's `Accept-Encoding` allows it.
+      A precompressed `<file>.gz` sibling is preferred; otherwise cached bodies of at least
+      COMPRESS_MIN_SIZE bytes are compressed once and the result is kept with the cache entry.
+    - Requests are read with the incremental parser in HTTPParser.py, so heads split across TCP
+      segments, request bodies and malformed input (answered with 400/413/431/501) are handled.
     - The server only serves files from the current working directory.
     - If a requested file is not found, the server returns a 404 Not Found response.
+    - HEAD requests get exactly the headers a GET would, including Content-Length, and no body.
     - This program is for educational purposes and is not intended for production use.
 """
 
 import socket
 import os
+import stat
+import time
+import argparse
+import mimetypes
+import gzip
+import zlib
+import signal
+import selectors
+import threading
+from collections import deque
+from email.utils import formatdate, parsedate_to_datetime
+
+from HTTPParser import HTTPParser, HTTPParseError
+from Prefork import Supervisor, create_listener, DRAIN_TIMEOUT
+from StaticCache import StaticCache
 
 # Define the server's host and port
 HOST = 'localhost'
 PORT = 8080
+BACKLOG = 128               # Default length of the kernel accept queue
+WORKERS = 1                 # Default number of event-loop threads
+RECV_SIZE = 65536           # Bytes read from a client socket per readiness event
+KEEPALIVE_TIMEOUT = 15.0    # Seconds an idle persistent connection is kept open
+MAX_REQUESTS = 100          # Requests served on one connection before it is closed
+MAX_PENDING_RESPONSES = 32  # Stop reading pipelined requests while this many responses are queued
+SENDFILE_CHUNK = 1 << 20    # Largest slice handed to one os.sendfile() call
+CACHE_SIZE = 64 * 1024 * 1024       # Bytes of small files kept in memory (0 disables the cache)
+CACHE_MAX_FILE = 1024 * 1024        # Files larger than this are always streamed from disk
+CACHE_CHECK_INTERVAL = 1.0          # Seconds between mtime/size checks of a cached file
+COMPRESS_MIN_SIZE = 1024    # Files smaller than this are always sent uncompressed
+COMPRESS_LEVEL = 6          # zlib/gzip compression level for on-the-fly encoding
+ENCODINGS = ("gzip", "deflate")     # Supported content codings, in order of preference
+COMPRESSIBLE_TYPES = {"application/javascript", "application/json", "application/xml", "image/svg+xml"}
+READ_CHUNK = 65536          # Buffer size of the read/send fallback when sendfile is unavailable
+MSG_MORE = getattr(socket, "MSG_MORE", 0)  # Linux: coalesce response headers with the body
 
-def handle_request(client_socket):
-    # Receive the HTTP request
-    request = client_socket.recv(1024).decode('utf-8')
+NOT_FOUND_BODY = b"<html><body><h1>404 Not Found</h1><p>The requested file could not be found.</p></body></html>"
+RANGE_NOT_SATISFIABLE_BODY = b"<html><body><h1>416 Range Not Satisfiable</h1></body></html>"
 
-    if not request:
-        client_socket.close()
-        return
+class FileBody:
+    """A byte range of an open file, streamed to the client without loading it into memory."""
+
+    def __init__(self, file, offset, length):
+        self.file = file
+        self.offset = offset        # Next file offset to send
+        self.remaining = length     # Bytes still to send
+        self.use_sendfile = hasattr(os, "sendfile")
+
+    def send(self, sock, buffer):
+        # Send as much of the range as the socket accepts; returns the number of bytes sent
+        if self.use_sendfile:
+            try:
+                sent = os.sendfile(sock.fileno(), self.file.fileno(), self.offset,
+                                   min(self.remaining, SENDFILE_CHUNK))
+            except (BlockingIOError, InterruptedError):
+                return 0
+            except OSError:
+                # Not supported for this file or socket; fall back to reading into the buffer
+                self.use_sendfile = False
+                return self.send(sock, buffer)
+        else:
+            self.file.seek(self.offset)
+            got = self.file.readinto(memoryview(buffer)[:min(self.remaining, len(buffer))])
+            if not got:
+                raise OSError("file shrank while it was being sent")
+            try:
+                sent = sock.send(memoryview(buffer)[:got])
+            except (BlockingIOError, InterruptedError):
+                return 0
+        if sent == 0 and self.use_sendfile:
+            raise OSError("file shrank while it was being sent")
+        self.offset += sent
+        self.remaining -= sent
+        return sent
+
+    def close(self):
+        self.file.close()
+
+# Parse a single "bytes=" range against the file size.
+# Returns (start, end) inclusive, None to ignore the header, or False if it cannot be satisfied.
+def parse_range(value, size):
+    unit, sep, spec = value.partition("=")
+    if not sep or unit.strip().lower() != "bytes" or "," in spec:
+        return None     # Unknown units and multi-range requests are answered with the full file
+    first, sep, last = spec.strip().partition("-")
+    try:
+        if not sep:
+            return None
+        if first == "":     # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                return False
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        return False
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+# Validator derived from the file's modification time and size (and the content coding, if any)
+def make_etag(mtime_ns, size, encoding=None):
+    if encoding:
+        return '"%x-%x-%s"' % (mtime_ns, size, encoding)
+    return '"%x-%x"' % (mtime_ns, size)
+
+# Guess the Content-Type of a file from its extension
+def content_type_of(requested_file):
+    return mimetypes.guess_type(requested_file)[0] or "application/octet-stream"
+
+# Text-like types that shrink well; already-compressed media is never re-encoded
+def compressible(content_type):
+    return content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES
+
+# Header lines shared by every response that carries (part of) a file: type, coding and validators
+def file_headers(requested_file, size, mtime_ns, encoding=None):
+    content_type = content_type_of(requested_file)
+    response_headers = "Content-Type: " + content_type + "\r\n"
+    if encoding:
+        response_headers += "Content-Encoding: " + encoding + "\r\n"
+    if compressible(content_type):
+        response_headers += "Vary: Accept-Encoding\r\n"
+    response_headers += "ETag: " + make_etag(mtime_ns, size, encoding) + "\r\n"
+    response_headers += "Last-Modified: " + formatdate(mtime_ns / 1e9, usegmt=True) + "\r\n"
+    if not encoding:
+        response_headers += "Accept-Ranges: bytes\r\n"
+    return response_headers
+
+# Prebuilt header lines of a full 200 response for a file (or an encoded variant of it)
+def file_header(requested_file, size, mtime_ns, encoding=None, length=None):
+    response_headers = "HTTP/1.1 200 OK\r\n"
+    response_headers += file_headers(requested_file, size, mtime_ns, encoding)
+    response_headers += "Content-Length: " + str(size if length is None else length) + "\r\n"
+    return response_headers.encode('utf-8')
+
+# Pick the content coding to use from the client's Accept-Encoding header, or None for identity
+def choose_encoding(headers):
+    accepted = {}
+    for item in headers.get("accept-encoding", "").split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name] = quality
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+# Compress a whole body with the given content coding
+def compress(body, encoding):
+    if encoding == "gzip":
+        return gzip.compress(body, COMPRESS_LEVEL, mtime=0)
+    return zlib.compress(body, COMPRESS_LEVEL)     # HTTP "deflate" is the zlib format
+
+# Find or build an encoded variant of a file.
+# Returns (body, header) where body is bytes or a FileBody, or None to send the identity encoding.
+def encoded_variant(requested_file, content, size, mtime_ns, encoding, entry=None, cache=None):
+    if entry is not None and encoding in entry.variants:
+        return entry.variants[encoding]
+    if size < COMPRESS_MIN_SIZE or not compressible(content_type_of(requested_file)):
+        return None
+
+    # A precompressed sibling (index.html.gz) that is at least as new as the original wins
+    sibling = None
+    if encoding == "gzip":
+        try:
+            sibling = open(requested_file + ".gz", 'rb')
+            st = os.fstat(sibling.fileno())
+            if not stat.S_ISREG(st.st_mode) or st.st_mtime_ns < mtime_ns:
+                sibling.close()
+                sibling = None
+        except OSError:
+            sibling = None
+
+    if sibling is not None:
+        if entry is None:
+            header = file_header(requested_file, size, mtime_ns, encoding, st.st_size)
+            return FileBody(sibling, 0, st.st_size), header
+        with sibling:
+            body = sibling.read()
+    elif isinstance(content, bytes):
+        # On-the-fly compression only for bodies already in memory; large files keep sendfile
+        body = compress(content, encoding)
+        if len(body) >= size:
+            return None
+    else:
+        return None
 
+    header = file_header(requested_file, size, mtime_ns, encoding, len(body))
+    if entry is not None:
+        cache.add_variant(entry, encoding, body, header)
+    return body, header
+
+# Parse an HTTP date into a POSIX timestamp, or None if it is malformed
+def parse_http_date(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+# Decide whether the client's cached copy is still current (RFC 9110 section 13.2.2 order)
+def not_modified(headers, etag, mtime_ns):
+    if "if-none-match" in headers:
+        tags = [tag.strip() for tag in headers["if-none-match"].split(",")]
+        # Weak comparison: W/"x" matches "x"
+        return "*" in tags or any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+    if "if-modified-since" in headers:
+        since = parse_http_date(headers["if-modified-since"])
+        return since is not None and mtime_ns // 1_000_000_000 <= since
+    return False
+
+# Decide whether a Range header may be honored given an If-Range precondition
+def range_applies(headers, etag, mtime_ns):
+    if "if-range" not in headers:
+        return True
+    value = headers["if-range"].strip()
+    if value.startswith('"'):
+        return value == etag
+    since = parse_http_date(value)
+    return since is not None and mtime_ns // 1_000_000_000 <= since
+
+# Open a requested file; returns (body, header, size, mtime_ns, entry) where body is bytes (cached)
+# or an open file and entry is its StaticCache entry, if any.
+# Returns None if the file does not exist or is not a regular file.
+def open_file(requested_file, cache=None):
+    entry = cache.lookup(requested_file) if cache is not None else None
+    if entry is not None:
+        return entry.body, entry.header, entry.size, entry.mtime_ns, entry
+
+    try:
+        file = open(requested_file, 'rb')
+    except (OSError, ValueError):   # ValueError: the path contains a NUL byte
+        return None
+    st = os.fstat(file.fileno())
+    if not stat.S_ISREG(st.st_mode):
+        file.close()
+        return None
+    header = file_header(requested_file, st.st_size, st.st_mtime_ns)
+    if cache is None or not cache.accepts(st.st_size):
+        return file, header, st.st_size, st.st_mtime_ns, None
+
+    # Small file: read it once and serve it from memory from now on
+    with file:
+        body = file.read()
+    if len(body) == st.st_size:
+        entry = cache.store(requested_file, body, header, st)
+    else:
+        # Changed while we read it; serve what we got, uncached
+        header = file_header(requested_file, len(body), st.st_mtime_ns)
+    return body, header, len(body), st.st_mtime_ns, entry
+
+# Build a short HTML error response for a request that could not be parsed
+def error_response(status, reason):
+    body = f"<html><body><h1>{status} {reason}</h1></body></html>".encode('utf-8')
+    response_headers = f"HTTP/1.1 {status} {reason}\r\n"
+    response_headers += "Content-Type: text/html\r\n"
+    response_headers += "Content-Length: " + str(len(body)) + "\r\n"
+    response_headers += "Connection: close\r\n\r\n"
+    return response_headers.encode('utf-8'), body
+
+# Build the HTTP response for a parsed HTTPRequest.
+# Returns the header bytes and a body that is either bytes or a FileBody to stream.
+def build_response(request, verbose=False, keep_alive=False, cache=None):
     # Print the request to see what the client requested
-    print("Request received:")
-    print(request)
-
-    # Parse the request to determine the file requested
-    lines = request.splitlines()
-    if len(lines) > 0:
-        # Extract the requested file (second element in the request line)
-        requested_file = lines[0].split()[1][1:]  # Remove leading '/' from the path
-
-        # Check if the file exists on the server
-        if os.path.exists(requested_file) and os.path.isfile(requested_file):
-            # If the file exists, open it and send it as a response
-            with open(requested_file, 'rb') as file:
-                content = file.read()
-
-            # Create the HTTP response headers and body
-            response_headers = "HTTP/1.1 200 OK\r\n"
+    if verbose:
+        print("Request received:")
+        print(request.head.decode('utf-8', 'replace'))
+
+    response_headers, body = build_get_response(request, keep_alive, cache)
+    if request.method == "HEAD":
+        # Same headers as GET, Content-Length included, but no body: on a persistent or pipelined
+        # connection the client reads the next response right after these headers
+        if isinstance(body, FileBody):
+            body.close()
+        body = b""
+    return response_headers, body
+
+# The response a GET for this request gets
+def build_get_response(request, keep_alive=False, cache=None):
+    # Determine the file requested
+    target, headers = request.target, request.headers
+    connection = ("Connection: keep-alive\r\n\r\n" if keep_alive else "Connection: close\r\n\r\n").encode('utf-8')
+    # Extract the requested file (second element in the request line)
+    requested_file = target[1:]  # Remove leading '/' from the path
+    found = open_file(requested_file, cache) if requested_file else None
+
+    if found is not None:
+        content, header, size, mtime_ns, entry = found
+        etag = make_etag(mtime_ns, size)
+
+        # Whole-file requests may be sent compressed; byte ranges always address the identity body
+        encoding = choose_encoding(headers) if "range" not in headers else None
+        variant = None
+        if encoding:
+            variant = encoded_variant(requested_file, content, size, mtime_ns, encoding, entry, cache)
+        if variant is not None:
+            if not isinstance(content, bytes):
+                content.close()
+            content, header = variant
+            etag = make_etag(mtime_ns, size, encoding)
+
+        # The client's copy is current: send only the validators
+        if not_modified(headers, etag, mtime_ns):
+            if not isinstance(content, bytes):
+                content.close()    # Open file or FileBody that will not be sent
+            response_headers = "HTTP/1.1 304 Not Modified\r\n"
+            response_headers += "ETag: " + etag + "\r\n"
+            response_headers += "Last-Modified: " + formatdate(mtime_ns / 1e9, usegmt=True) + "\r\n"
+            return response_headers.encode('utf-8') + connection, b""
+
+        if variant is not None:
+            return header + connection, content
+
+        byte_range = None
+        if "range" in headers and range_applies(headers, etag, mtime_ns):
+            byte_range = parse_range(headers["range"], size)
+
+        if byte_range is False:
+            if not isinstance(content, bytes):
+                content.close()
+            response_headers = "HTTP/1.1 416 Range Not Satisfiable\r\n"
             response_headers += "Content-Type: text/html\r\n"
-            response_headers += "Content-Length: " + str(len(content)) + "\r\n"
-            response_headers += "\r\n"  # End of headers
+            response_headers += "Content-Range: bytes */" + str(size) + "\r\n"
+            response_headers += "Content-Length: " + str(len(RANGE_NOT_SATISFIABLE_BODY)) + "\r\n"
+            return response_headers.encode('utf-8') + connection, RANGE_NOT_SATISFIABLE_BODY
 
-            # Send the response
-            client_socket.sendall(response_headers.encode('utf-8'))
-            client_socket.sendall(content)
+        # Use the prebuilt header for the whole file, or build one for the requested range
+        if byte_range is None:
+            start, end = 0, size - 1
         else:
-            # If the file doesn't exist, return a 404 Not Found response
-            response_headers = "HTTP/1.1 404 Not Found\r\n"
-            response_headers += "Content-Type: text/html\r\n"
-            response_headers += "\r\n"  # End of headers
+            start, end = byte_range
+            response_headers = "HTTP/1.1 206 Partial Content\r\n"
+            response_headers += "Content-Range: bytes %d-%d/%d\r\n" % (start, end, size)
+            response_headers += file_headers(requested_file, size, mtime_ns)
+            response_headers += "Content-Length: " + str(end - start + 1) + "\r\n"
+            header = response_headers.encode('utf-8')
+
+        if isinstance(content, bytes):
+            body = content if byte_range is None else content[start:end + 1]
+        else:
+            body = FileBody(content, start, end - start + 1)
+        return header + connection, body
+
+    # If the file doesn't exist, return a 404 Not Found response
+    response_headers = "HTTP/1.1 404 Not Found\r\n"
+    response_headers += "Content-Type: text/html\r\n"
+    response_headers += "Content-Length: " + str(len(NOT_FOUND_BODY)) + "\r\n"
+    return response_headers.encode('utf-8') + connection, NOT_FOUND_BODY
 
-            # Create a simple HTML message for 404
-            response_body = "<html><body><h1>404 Not Found</h1><p>The requested file could not be found.</p></body></html>"
+# Handle a single request on a blocking socket, then close it
+def handle_request(client_socket, verbose=True):
+    # Receive the HTTP request, however many segments it arrives in
+    parser = HTTPParser()
+    request = None
+    try:
+        while request is None:
+            data = client_socket.recv(RECV_SIZE)
+            if not data:
+                break
+            parser.feed(data)
+            request = parser.next_request()
+    except HTTPParseError as e:
+        client_socket.sendall(b"".join(error_response(e.status, e.reason)))
+
+    if request is not None:
+        # Send the response
+        response_headers, body = build_response(request, verbose)
+        client_socket.sendall(response_headers)
+        if isinstance(body, FileBody):
+            with body.file:
+                client_socket.sendfile(body.file, body.offset, body.remaining)
+        else:
+            client_socket.sendall(body)
 
-            # Send the response
-            client_socket.sendall(response_headers.encode('utf-8'))
-            client_socket.sendall(response_body.encode('utf-8'))
-    
     # Close the client connection
     client_socket.close()
 
-def start_server():
-    # Create a TCP socket
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
-        # Bind the socket to the address and port
-        server_socket.bind((HOST, PORT))
-        server_socket.listen(1)  # Listen for incoming connections (1 client at a time)
+class Connection:
+    """Per-client state kept by the event loop."""
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.parser = HTTPParser()  # Buffers received bytes until requests are complete
+        self.outq = deque()         # Response parts (bytes or FileBody) queued in request order
+        self.requests = 0           # Requests answered on this connection
+        self.closing = False        # Close once outq has been flushed
+        self.last_active = time.monotonic()
+
+    def queue(self, response_headers, body):
+        if isinstance(body, FileBody):
+            self.outq.append(memoryview(response_headers))
+            if body.remaining:
+                self.outq.append(body)
+            else:
+                body.close()
+        else:
+            # Small in-memory responses go out in a single send
+            self.outq.append(memoryview(response_headers + body))
+
+    def discard_output(self):
+        for part in self.outq:
+            if isinstance(part, FileBody):
+                part.close()
+        self.outq.clear()
+
+# True if the listener was bound with SO_REUSEPORT, i.e. by this worker process for itself (the
+# supervisor's shared, inherited listener never is)
+def owns_reuseport_listener(server_socket):
+    try:
+        return bool(server_socket.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT))
+    except (AttributeError, OSError):     # No SO_REUSEPORT on this platform
+        return False
+
+# Event loop run by each worker: accept, read, respond and recycle connections without blocking
+def serve_forever(server_socket, stop_event=None, verbose=False,
+                  keepalive_timeout=KEEPALIVE_TIMEOUT, max_requests=MAX_REQUESTS, cache=None,
+                  drain_timeout=DRAIN_TIMEOUT):
+    selector = selectors.DefaultSelector()
+    selector.register(server_socket, selectors.EVENT_READ, None)
+    connections = set()
+
+    buffer = bytearray(READ_CHUNK)  # Shared by every connection for the non-sendfile fallback
+
+    def close_connection(conn):
+        connections.discard(conn)
+        selector.unregister(conn.sock)
+        conn.discard_output()
+        conn.sock.close()
+
+    def update_interest(conn):
+        # Read while there is room for more pipelined requests, write while output is pending
+        events = 0
+        if not conn.closing and len(conn.outq) < MAX_PENDING_RESPONSES:
+            events |= selectors.EVENT_READ
+        if conn.outq:
+            events |= selectors.EVENT_WRITE
+        if events == 0:
+            close_connection(conn)
+        else:
+            selector.modify(conn.sock, events, conn)
+
+    def accept():
+        # Drain the accept queue; other workers may race us for the same socket
+        while True:
+            try:
+                client_socket, client_address = server_socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                print(f"Accept failed: {e}")
+                return
+            if verbose:
+                print(f"Connection from {client_address}")
+            client_socket.setblocking(False)
+            conn = Connection(client_socket, client_address)
+            connections.add(conn)
+            selector.register(client_socket, selectors.EVENT_READ, conn)
+
+    def process(conn):
+        # Answer every complete request in the buffer, in the order they arrived
+        while not conn.closing and len(conn.outq) < MAX_PENDING_RESPONSES:
+            try:
+                request = conn.parser.next_request()
+            except HTTPParseError as e:
+                # The stream cannot be resynchronized after a framing error: answer and close
+                conn.queue(*error_response(e.status, e.reason))
+                conn.closing = True
+                return
+            if request is None:
+                return
+            conn.requests += 1
+            keep_alive = request.keep_alive and conn.requests < max_requests
+            conn.queue(*build_response(request, verbose, keep_alive, cache))
+            if not keep_alive:
+                conn.closing = True
+
+    def read(conn):
+        try:
+            data = conn.sock.recv(RECV_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            close_connection(conn)
+            return
+        if not data:    # Client closed its side; finish any queued responses first
+            conn.closing = True
+        else:
+            conn.last_active = time.monotonic()
+            conn.parser.feed(data)
+            process(conn)
+        if conn.outq:
+            write(conn)
+        else:
+            update_interest(conn)
+
+    def write(conn):
+        # Flush queued parts in order until the socket would block
+        progressed = False
+        try:
+            while conn.outq:
+                part = conn.outq[0]
+                if isinstance(part, FileBody):
+                    sent = part.send(conn.sock, buffer)
+                    if part.remaining == 0:
+                        part.close()
+                        conn.outq.popleft()
+                else:
+                    # Hold back a header block that is followed by a file so both share packets
+                    more = len(conn.outq) > 1 and isinstance(conn.outq[1], FileBody)
+                    sent = conn.sock.send(part, MSG_MORE if more else 0)
+                    if sent == len(part):
+                        conn.outq.popleft()
+                    else:
+                        conn.outq[0] = part[sent:]
+                if sent == 0:
+                    break
+                progressed = True
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            close_connection(conn)
+            return
+        if progressed:
+            conn.last_active = time.monotonic()
+            # Draining output may unblock requests that were held back by backpressure
+            process(conn)
+        update_interest(conn)
+
+    def expire_idle():
+        deadline = time.monotonic() - keepalive_timeout
+        for conn in [conn for conn in connections if conn.last_active < deadline]:
+            close_connection(conn)
+
+    def start_draining():
+        # Stop accepting; finish responses already queued and close idle connections
+        selector.unregister(server_socket)
+        # A listener this process bound with SO_REUSEPORT stops listening at once, as WebProxy.serveProxy
+        # does by closing its listener; otherwise the kernel would keep handing new connections to this
+        # draining worker, and they would be reset when it exits. shutdown() rather than close() because
+        # the other event-loop threads of this process still hold the socket in their selectors.
+        # An inherited listener is shared with the supervisor and the next generation of workers, where
+        # shutdown() would stop it for everyone: run_workers just closes this process's descriptor.
+        if owns_reuseport_listener(server_socket):
+            try:
+                server_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass    # Another thread of this process got there first
+        for conn in list(connections):
+            conn.closing = True
+            update_interest(conn)
+
+    drain_deadline = None
+    try:
+        while True:
+            if drain_deadline is None and stop_event is not None and stop_event.is_set():
+                drain_deadline = time.monotonic() + drain_timeout
+                start_draining()
+            if drain_deadline is not None and (not connections or time.monotonic() > drain_deadline):
+                break
+            for key, mask in selector.select(timeout=1.0 if drain_deadline is None else 0.1):
+                if key.data is None:
+                    accept()
+                    continue
+                conn = key.data
+                try:
+                    if mask & selectors.EVENT_WRITE:
+                        write(conn)
+                    if mask & selectors.EVENT_READ and conn in connections:
+                        read(conn)
+                except Exception as e:
+                    # A bug or unexpected error while serving one client must not end the loop
+                    # (and every other connection with it): log it and drop just this connection
+                    print(f"Error serving {conn.address}: {type(e).__name__}: {e}")
+                    if conn in connections:
+                        close_connection(conn)
+            expire_idle()
+    finally:
+        for conn in list(connections):
+            close_connection(conn)
+        selector.close()
+
+# Run this process's event-loop threads on a listening socket until stop_event is set and drained
+def run_workers(server_socket, stop_event, workers=WORKERS, verbose=False,
+                keepalive_timeout=KEEPALIVE_TIMEOUT, max_requests=MAX_REQUESTS, cache=None):
+    server_socket.setblocking(False)
+
+    # Extra workers share the listening socket, each with its own event loop
+    loop_args = (server_socket, stop_event, verbose, keepalive_timeout, max_requests, cache)
+    threads = []
+    for _ in range(workers - 1):
+        thread = threading.Thread(target=serve_forever, args=loop_args, daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    try:
+        serve_forever(*loop_args)
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        server_socket.close()   # Every loop has unregistered it; an inherited listener stays open elsewhere
+        if cache is not None:
+            stats = ", ".join(f"{name}={value}" for name, value in cache.stats().items())
+            print(f"Cache stats (pid {os.getpid()}): {stats}")
+
+def start_server(host=HOST, port=PORT, backlog=BACKLOG, workers=WORKERS, verbose=False,
+                 keepalive_timeout=KEEPALIVE_TIMEOUT, max_requests=MAX_REQUESTS, cache=None, processes=1):
+    worker_options = (workers, verbose, keepalive_timeout, max_requests, cache)
+
+    # Several processes: a supervisor forks them and each gets its own event-loop threads
+    if processes > 1:
+        print(f"Server listening on {host}:{port} (backlog {backlog}, {processes} process(es) x {workers} worker(s))...")
+        supervisor = Supervisor(lambda reuse_port: create_listener(host, port, backlog, reuse_port),
+                                lambda sock, stop_event: run_workers(sock, stop_event, *worker_options),
+                                processes)
+        supervisor.run()
+        return
+
+    # Create a TCP socket, bind it to the address and port, and listen for incoming connections
+    with create_listener(host, port, backlog) as server_socket:
+        print(f"Server listening on {host}:{port} (backlog {backlog}, {workers} worker(s))...")
 
-        print(f"Server listening on {HOST}:{PORT}...")
+        # SIGTERM and Ctrl-C stop accepting and let in-flight responses finish
+        stop_event = threading.Event()
 
-        # Accept an incoming connection
-        client_socket, client_address = server_socket.accept()
+        def stop(signum, frame):
+            print("Shutting down...")
+            stop_event.set()
 
-        print(f"Connection from {client_address}")
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+        run_workers(server_socket, stop_event, *worker_options)
 
-        # Handle the client request
-        handle_request(client_socket)
+# Parse the command line options for the server
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simple static-file HTTP server")
+    parser.add_argument("--host", default=HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=PORT, help="port to listen on")
+    parser.add_argument("--backlog", type=int, default=BACKLOG, help="length of the kernel accept queue")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="number of event-loop threads")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="worker processes forked by a prefork supervisor (1 runs in-process)")
+    parser.add_argument("--keepalive-timeout", type=float, default=KEEPALIVE_TIMEOUT,
+                        help="seconds an idle persistent connection is kept open")
+    parser.add_argument("--max-requests", type=int, default=MAX_REQUESTS,
+                        help="requests served on one connection before it is closed")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE,
+                        help="bytes of small files kept in memory (0 disables the cache)")
+    parser.add_argument("--cache-max-file", type=int, default=CACHE_MAX_FILE,
+                        help="largest file size that is cached")
+    parser.add_argument("--cache-check-interval", type=float, default=CACHE_CHECK_INTERVAL,
+                        help="seconds between mtime/size checks of a cached file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every request")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    start_server()
+    args = parse_args()
+    cache = None
+    if args.cache_size > 0:
+        cache = StaticCache(args.cache_size, args.cache_max_file, args.cache_check_interval)
+    start_server(args.host, args.port, args.backlog, max(1, args.workers), args.verbose,
+                 args.keepalive_timeout, max(1, args.max_requests), cache, max(1, args.processes))
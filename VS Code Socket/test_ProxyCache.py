@@ -0,0 +1,107 @@
+"""
+Program Name: test_ProxyCache.py
+Description: Regression tests for ProxyCache.py: its disk tier and what it agrees to store.
+
+Course: COSC 370 - Computer Networks
+Instructor: Dr. Enyue Lu
+
+Usage:
+    1. Run from this directory:
+           python -m unittest test_ProxyCache
+       (or `python -m pytest test_ProxyCache.py`).
+
+Requirements:
+    - Python 3.x
+    - The `unittest` and `tempfile` libraries.
+
+Notes:
+    - Each test uses its own temporary cache directory.
+"""
+
+import os
+import tempfile
+import unittest
+
+from HTTPParser import HTTPParser, parse_response_head
+from ProxyCache import ProxyCache, MISS
+
+URL = "http://origin.test/page.html"
+BODY = b"<html>unchanged</html>"
+
+def make_request():
+    parser = HTTPParser()
+    parser.feed(b"GET " + URL.encode() + b" HTTP/1.1\r\nHost: origin.test\r\n\r\n")
+    return parser.next_request()
+
+def make_response(body=BODY):
+    return parse_response_head(b"HTTP/1.1 200 OK\r\nCache-Control: max-age=60\r\nETag: \"v1\"\r\n"
+                               b"Content-Length: %d\r\n\r\n" % len(body))
+
+class StoreUnchangedBodyTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_restore_same_body_keeps_disk_object(self):
+        # A memory tier too small for the body forces every read to go to disk
+        cache = ProxyCache(self.directory.name, memory_bytes=3)
+        request = make_request()
+        cache.store(request, URL, make_response(), BODY)
+        entry = cache.store(request, URL, make_response(), BODY)     # Refetch of an unchanged response
+
+        self.assertTrue(os.path.exists(cache._object_path(entry.digest)))
+        self.assertEqual(cache.refs[entry.digest], 1)
+        self.assertEqual(cache.read_body(entry), BODY)
+        self.assertIn(entry.key, cache.entries)
+
+    def test_restore_same_body_survives_restart(self):
+        cache = ProxyCache(self.directory.name, memory_bytes=3)
+        request = make_request()
+        cache.store(request, URL, make_response(), BODY)
+        cache.store(request, URL, make_response(), BODY)
+        cache.close()
+
+        reopened = ProxyCache(self.directory.name, memory_bytes=3)
+        entry, _ = reopened.lookup(request, URL)
+        self.assertIsNotNone(entry)
+        self.assertEqual(reopened.read_body(entry), BODY)
+
+    def test_restore_changed_body_removes_old_object(self):
+        cache = ProxyCache(self.directory.name, memory_bytes=3)
+        request = make_request()
+        old = cache.store(request, URL, make_response(), BODY)
+        new_body = b"<html>changed</html>"
+        new = cache.store(request, URL, make_response(new_body), new_body)
+
+        self.assertFalse(os.path.exists(cache._object_path(old.digest)))
+        self.assertEqual(cache.read_body(new), new_body)
+        self.assertEqual(cache.disk_used, len(new_body))
+
+class NotModifiedTest(unittest.TestCase):
+    def test_304_to_conditional_request_is_not_stored(self):
+        cache = ProxyCache(None)
+        parser = HTTPParser()
+        parser.feed(b"GET " + URL.encode() + b" HTTP/1.1\r\nHost: origin.test\r\nIf-None-Match: \"v1\"\r\n\r\n")
+        conditional = parser.next_request()
+        not_modified = parse_response_head(b"HTTP/1.1 304 Not Modified\r\nCache-Control: max-age=60\r\n"
+                                           b"ETag: \"v1\"\r\n\r\n")
+
+        self.assertFalse(cache.storable(conditional, not_modified))
+        self.assertIsNone(cache.store(conditional, URL, not_modified, b""))
+        entry, state = cache.lookup(make_request(), URL)
+        self.assertIsNone(entry)
+        self.assertEqual(state, MISS)
+
+    def test_revalidation_drops_client_validators_the_entry_lacks(self):
+        cache = ProxyCache(None)
+        response = parse_response_head(b"HTTP/1.1 200 OK\r\nCache-Control: max-age=60\r\n"
+                                       b"Last-Modified: Mon, 01 Jan 2024 00:00:00 GMT\r\n"
+                                       b"Content-Length: %d\r\n\r\n" % len(BODY))
+        entry = cache.store(make_request(), URL, response, BODY)
+
+        headers = cache.conditional_headers(entry)
+        self.assertIsNone(headers["If-None-Match"])
+        self.assertEqual(headers["If-Modified-Since"], "Mon, 01 Jan 2024 00:00:00 GMT")
+
+if __name__ == "__main__":
+    unittest.main()